@@ -1,15 +1,95 @@
+from datetime import date, datetime, time, timedelta
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Q
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from . import exports
 from .models import (
     SiteSettings, PatientJourneySection, PatientJourneyStep,
-    Page, Service, ServiceImage, Grade, Staff, Category, Article, ArticleImage,
+    Page, Service, ServiceImage, Grade, Staff, StaffSchedule, Category, Article, ArticleImage,
     Campaign, CampaignImage, CampaignRegistration, Partner, Appointment,
-    ContactMessage, Testimonial, DirectionMember,
+    ContactMessage, NotificationOutbox, Testimonial, DirectionMember,
     AboutPage, Award, TimelineItem, HospitalSpecialty, RecentEquipment, FormerDirector
 )
 
 
+# ========================================
+# EXPORTS CSV / XLSX (Home/exports.py)
+# ========================================
+class ExportAdminMixin:
+    """
+    Actions « Exporter en CSV / XLSX » (lignes cochées) et page « Exporter »
+    (bouton de la liste) pour une période, en flux continu
+    """
+    change_list_template = 'admin/exports/change_list.html'
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for fmt in exports.FORMATS:
+            name = f'export_{fmt}'
+            actions[name] = (self.export_action(fmt), name, f"Exporter en {fmt.upper()}")
+        return actions
+
+    def export_action(self, fmt):
+        def action(modeladmin, request, queryset):
+            name = exports.export_for_model(self.model)
+            return exports.export_response(
+                request, name, queryset, fmt, f'{name}-selection-{date.today():%Y%m%d}'
+            )
+        return action
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view),
+                 name=f'{opts.app_label}_{opts.model_name}_export'),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        name = exports.export_for_model(self.model)
+        today = date.today()
+        start = _parse_date(request.GET.get('start')) or today.replace(month=1, day=1)
+        end = _parse_date(request.GET.get('end')) or today
+        fmt = request.GET.get('format')
+
+        if fmt in exports.FORMATS and start <= end:
+            date_field = exports.EXPORTS[name]['date_field']
+            queryset = self.model.objects.filter(**{
+                f'{date_field}__gte': datetime.combine(start, time.min),
+                f'{date_field}__lt': datetime.combine(end + timedelta(days=1), time.min),
+            })
+            return exports.export_response(
+                request, name, queryset, fmt, f'{name}-{start:%Y%m%d}-{end:%Y%m%d}'
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f"Exporter : {self.model._meta.verbose_name_plural}",
+            'opts': self.model._meta,
+            'start': start,
+            'end': end,
+            'formats': exports.FORMATS,
+            'invalid_range': fmt is not None and start > end,
+        }
+        return TemplateResponse(request, 'admin/exports/export_form.html', context)
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
 # ========================================
 # PARAMÈTRES DU SITE
 # ========================================
@@ -201,6 +281,15 @@ class GradeAdmin(admin.ModelAdmin):
     )
 
 
+# ========================================
+# PLANNING DU PERSONNEL (Inline)
+# ========================================
+class StaffScheduleInline(admin.TabularInline):
+    model = StaffSchedule
+    extra = 1
+    fields = ('weekday', 'start_time', 'end_time', 'is_active')
+
+
 # ========================================
 # PERSONNEL MÉDICAL
 # ========================================
@@ -211,6 +300,7 @@ class StaffAdmin(admin.ModelAdmin):
     search_fields = ('first_name', 'last_name', 'speciality')
     filter_horizontal = ('services',)
     list_editable = ('is_visible',)
+    inlines = [StaffScheduleInline]
 
     class Media:
         js = ('admin/js/staff_admin.js',)
@@ -248,7 +338,11 @@ class StaffAdmin(admin.ModelAdmin):
         ('📅 Rendez-vous en ligne', {
             'fields': ('accepts_appointments', 'consultation_duration', 'consultation_hours'),
             'classes': ('collapse',),
-            'description': mark_safe('Activez cette option si le membre peut recevoir des demandes de rendez-vous en ligne.')
+            'description': mark_safe(
+                'Activez cette option si le membre peut recevoir des demandes de rendez-vous en ligne.<br>'
+                'Les créneaux proposés aux patients sont calculés à partir des <strong>plages de consultation</strong> '
+                '(en bas de page) et de la durée de consultation.'
+            )
         }),
         ('📝 Informations détaillées (optionnel)', {
             'fields': ('diplomas', 'experience', 'expertise', 'languages'),
@@ -353,19 +447,6 @@ class CampaignImageInline(admin.TabularInline):
     fields = ('image', 'caption', 'display_order')
 
 
-# ========================================
-# INSCRIPTIONS AUX CAMPAGNES (Inline)
-# ========================================
-class CampaignRegistrationInline(admin.TabularInline):
-    model = CampaignRegistration
-    extra = 0
-    readonly_fields = ('full_name', 'email', 'phone', 'age', 'reason', 'registered_at')
-    can_delete = False
-    
-    def has_add_permission(self, request, obj=None):
-        return False
-
-
 # ========================================
 # CAMPAGNES DE SANTÉ
 # ========================================
@@ -378,7 +459,11 @@ class CampaignAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
     date_hierarchy = 'start_date'
     list_editable = ('status', 'registration_enabled')
-    inlines = [CampaignImageInline, CampaignRegistrationInline]
+    inlines = [CampaignImageInline]
+    # Les inscriptions (parfois des milliers) ne sont pas un inline : résumé
+    # et panneau paginé chargé à la demande (registrations_view)
+    change_form_template = 'admin/campaigns/change_form.html'
+    registrations_per_page = 25
     
     fieldsets = (
         ('Contenu principal', {
@@ -403,9 +488,55 @@ class CampaignAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # Nombre d'inscriptions calculé dans la requête de la liste (pas une requête
+        # par ligne) ; ni le formulaire ni le panneau des inscriptions ne l'affichent
+        opts = self.model._meta
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.url_name == f'{opts.app_label}_{opts.model_name}_changelist':
+            queryset = queryset.annotate(registrations_total=Count('registrations'))
+        return queryset
+
     def registrations_count(self, obj):
-        return obj.registrations.count()
+        return obj.registrations_total
     registrations_count.short_description = 'Inscriptions'
+    registrations_count.admin_order_field = 'registrations_total'
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('<path:object_id>/registrations/', self.admin_site.admin_view(self.registrations_view),
+                 name=f'{opts.app_label}_{opts.model_name}_registrations'),
+        ] + super().get_urls()
+
+    def render_change_form(self, request, context, add=False, change=False, form_url='', obj=None):
+        if obj is not None and obj.pk:
+            # Résumé en une requête d'agrégation ; la liste est chargée à la demande
+            context['registrations_summary'] = obj.registrations.order_by().aggregate(
+                total=Count('id'),
+                last_week=Count('id', filter=Q(registered_at__gte=timezone.now() - timedelta(days=7))),
+                last_registered=Max('registered_at'),
+            )
+        return super().render_change_form(request, context, add, change, form_url, obj)
+
+    def registrations_view(self, request, object_id):
+        """Fragment HTML d'une page d'inscriptions (chargé en AJAX par le formulaire)"""
+        campaign = self.get_object(request, object_id)
+        if campaign is None:
+            raise Http404
+        if not self.has_view_permission(request, campaign):
+            raise PermissionDenied
+        # Pas campaign.registrations : le gestionnaire lié relit campaign_id
+        # (différé par only()) sur chaque ligne, une requête par inscription
+        registrations = CampaignRegistration.objects.filter(campaign=campaign).only(
+            'full_name', 'email', 'phone', 'age', 'reason', 'registered_at'
+        ).order_by('-registered_at', '-pk')
+        page = Paginator(registrations, self.registrations_per_page).get_page(request.GET.get('page'))
+        return TemplateResponse(request, 'admin/campaigns/registrations_panel.html', {
+            'campaign': campaign,
+            'page': page,
+        })
 
 
 # ========================================
@@ -442,7 +573,7 @@ class PartnerAdmin(admin.ModelAdmin):
 # RENDEZ-VOUS
 # ========================================
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ('patient_name', 'service', 'staff', 'appointment_date', 
                    'status', 'created_at')
     list_filter = ('status', 'service', 'staff', 'appointment_date')
@@ -487,7 +618,7 @@ class AppointmentAdmin(admin.ModelAdmin):
 # MESSAGES DE CONTACT
 # ========================================
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
+class ContactMessageAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'subject', 'email', 'status', 'created_at')
     list_filter = ('status', 'subject', 'created_at')
     search_fields = ('name', 'email', 'message')
@@ -518,6 +649,30 @@ class ContactMessageAdmin(admin.ModelAdmin):
         queryset.update(status='replied')
 
 
+# ========================================
+# NOTIFICATIONS (OUTBOX)
+# ========================================
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'event', 'channel', 'recipient', 'status', 'attempts', 'sent_at')
+    list_filter = ('status', 'channel', 'event')
+    search_fields = ('recipient', 'subject')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('event', 'channel', 'recipient', 'subject', 'body', 'status', 'attempts',
+                       'last_error', 'next_attempt_at', 'created_at', 'sent_at')
+
+    actions = ['retry_now']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Renvoyer maintenant")
+    def retry_now(self, request, queryset):
+        # Repris au prochain passage de send_notifications
+        count = queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} notification(s) remise(s) en file.")
+
+
 # ========================================
 # TÉMOIGNAGES
 # ========================================
@@ -579,7 +734,7 @@ class DirectionMemberAdmin(admin.ModelAdmin):
 # INSCRIPTIONS AUX CAMPAGNES (Vue séparée)
 # ========================================
 @admin.register(CampaignRegistration)
-class CampaignRegistrationAdmin(admin.ModelAdmin):
+class CampaignRegistrationAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ('full_name', 'campaign', 'email', 'phone', 'registered_at')
     list_filter = ('campaign', 'registered_at')
     search_fields = ('full_name', 'email', 'phone')
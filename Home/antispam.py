@@ -0,0 +1,142 @@
+"""
+Filtre anti-robots des formulaires publics (contact, rendez-vous, inscription)
+
+Vérifications faites avant la validation du formulaire, sans requête SQL ni
+écriture en base :
+
+- champ piège « website », invisible : seuls les robots le remplissent ;
+- jeton signé (django.core.signing) émis à l'affichage du formulaire, avec
+  l'heure d'affichage : absent, falsifié ou d'un autre formulaire -> rejet ;
+- vitesse : envoi moins de ANTISPAM_MIN_SECONDS après l'affichage ;
+- usage unique : le nonce du jeton est réservé (cache Redis,
+  ANTISPAM_TOKEN_MAX_AGE) ; un jeton déjà utilisé -> rejet ;
+- doublon : même contenu (empreinte SHA-256 des champs normalisés) déjà
+  envoyé depuis moins de ANTISPAM_DUPLICATE_WINDOW secondes (cache Redis).
+
+Nonce et empreinte sont réservés par cache.add (opération atomique) au
+moment de la vérification : deux envois simultanés du même jeton ou du
+même contenu ne passent pas tous les deux. Si l'envoi n'est finalement pas
+enregistré (formulaire invalide, créneau pris), release() libère les deux
+clés pour que le visiteur puisse corriger et renvoyer.
+
+Un envoi rejeté reçoit la même réponse qu'un envoi réussi : le robot n'apprend
+pas qu'il a été détecté. Un jeton expiré (page ouverte depuis plus de
+ANTISPAM_TOKEN_MAX_AGE) n'est pas un rejet : le formulaire est réaffiché avec
+une erreur et un nouveau jeton.
+"""
+
+import hashlib
+import logging
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.html import format_html
+
+from core import metrics
+from core.middleware import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+HONEYPOT_FIELD = 'website'
+TOKEN_FIELD = 'form_token'
+SALT = 'Home.antispam'
+
+EXPIRED_MESSAGE = (
+    "La page est restée ouverte trop longtemps. "
+    "Vérifiez vos informations puis renvoyez le formulaire."
+)
+
+
+def enabled():
+    return getattr(settings, 'ANTISPAM_ENABLED', True)
+
+
+def token_max_age():
+    return getattr(settings, 'ANTISPAM_TOKEN_MAX_AGE', 7200)
+
+
+def issue_token(form_name):
+    return signing.dumps(
+        {'form': form_name, 'ts': time.time(), 'nonce': secrets.token_urlsafe(12)}, salt=SALT
+    )
+
+
+def read_token(token, form_name):
+    """('ok', contenu du jeton), ('expired', None) ou ('invalid', None)"""
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=token_max_age())
+    except signing.SignatureExpired:
+        return 'expired', None
+    except signing.BadSignature:
+        return 'invalid', None
+    if not isinstance(payload, dict) or payload.get('form') != form_name:
+        return 'invalid', None
+    if not payload.get('nonce'):
+        # Jeton émis avant l'usage unique : formulaire réaffiché avec un nouveau jeton
+        return 'expired', None
+    return 'ok', payload
+
+
+def used_key(nonce):
+    return f'antispam:used:{nonce}'
+
+
+def hidden_fields(form_name):
+    """Champ piège et jeton, à placer dans le <form> (nouveau jeton à chaque affichage)"""
+    return format_html(
+        '<div style="position:absolute;left:-10000px;top:auto;width:1px;height:1px;overflow:hidden" aria-hidden="true">'
+        '<label for="id_{0}">Ne pas remplir ce champ</label>'
+        '<input type="text" name="{0}" id="id_{0}" value="" tabindex="-1" autocomplete="off">'
+        '</div>'
+        '<input type="hidden" name="{1}" value="{2}">',
+        HONEYPOT_FIELD, TOKEN_FIELD, issue_token(form_name),
+    )
+
+
+def content_key(form_name, data, fields, scope=''):
+    """Clé de cache de l'empreinte du contenu (casse et espaces ignorés)"""
+    normalized = '\x1f'.join(' '.join(str(data.get(field, '')).split()).lower() for field in fields)
+    digest = hashlib.sha256(f'{form_name}\x1e{scope}\x1e{normalized}'.encode()).hexdigest()
+    return f'antispam:seen:{digest}'
+
+
+def rejection(form_name, data, fields, scope=''):
+    """
+    Motif de rejet de l'envoi ``data`` ('honeypot', 'token', 'replayed',
+    'too_fast', 'duplicate'), 'expired' pour un jeton expiré, ou None (envoi à valider)
+    """
+    if data.get(HONEYPOT_FIELD):
+        return 'honeypot'
+    status, payload = read_token(data.get(TOKEN_FIELD, ''), form_name)
+    if status != 'ok':
+        return 'token' if status == 'invalid' else status
+    if time.time() - payload['ts'] < getattr(settings, 'ANTISPAM_MIN_SECONDS', 3):
+        return 'too_fast'
+    # Réservations atomiques : add() échoue si la clé existe déjà
+    if not cache.add(used_key(payload['nonce']), 1, token_max_age()):
+        return 'replayed'
+    if not cache.add(content_key(form_name, data, fields, scope), 1,
+                     getattr(settings, 'ANTISPAM_DUPLICATE_WINDOW', 3600)):
+        return 'duplicate'
+    return None
+
+
+def release(form_name, data, fields, scope=''):
+    """Envoi accepté par rejection() mais non enregistré : jeton et contenu réutilisables"""
+    status, payload = read_token(data.get(TOKEN_FIELD, ''), form_name)
+    keys = [content_key(form_name, data, fields, scope)]
+    if status == 'ok':
+        keys.append(used_key(payload['nonce']))
+    cache.delete_many(keys)
+
+
+def log_rejection(request, form_name, reason):
+    metrics.inc('hrae_form_submissions_total', {'form': form_name, 'result': 'spam'})
+    logger.warning(
+        "[SPAM] Submission rejected - Form: %s - Reason: %s - IP: %s",
+        form_name, reason, get_client_ip(request),
+        extra={'event': 'spam_rejected', 'form': form_name, 'reason': reason},
+    )
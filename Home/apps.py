@@ -4,4 +4,6 @@ from django.apps import AppConfig
 class HomeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Home'
-    verbose_name = "Hôpital Régional Annexe d'Edea"
\ No newline at end of file
+    verbose_name = "Hôpital Régional Annexe d'Edea"
+    def ready(self):
+        from . import signals  # noqa: F401
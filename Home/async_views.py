@@ -0,0 +1,199 @@
+"""
+Versions asynchrones des pages publiques en lecture seule (déploiement ASGI)
+
+Activées par ASYNC_VIEWS_ENABLED (cf. Home/urls.py). Les requêtes sont faites
+avec l'ORM asynchrone (aget, acount, async for...) : pendant l'attente de
+MySQL ou de Redis, le worker uvicorn sert d'autres requêtes.
+
+Le rendu du template reste synchrone (sync_to_async) : le processeur de
+contexte et certaines relations des templates (catégories, galeries...)
+interrogent encore la base.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, render
+from django.utils import timezone
+
+from . import reference_data, slots
+from .models import (
+    SiteSettings, PatientJourneySection, Page, Service, Staff, Article, Campaign
+)
+
+arender = sync_to_async(render)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _aget_page(queryset, per_page, number):
+    """
+    Paginator.get_page avec comptage et chargement asynchrones.
+    Le résultat se comporte comme une page Django classique dans les templates.
+    """
+    paginator = Paginator(queryset, per_page)
+    # count est une cached_property : on la remplit pour éviter le COUNT synchrone
+    paginator.count = await queryset.acount()
+    page = paginator.get_page(number)
+    page.object_list = await _alist(page.object_list)
+    return page
+
+
+async def index(request):
+    # Services pour page d'accueil (max 6)
+    homepage_services = await _alist(Service.objects.filter(
+        is_active=True,
+        show_on_homepage=True
+    ).order_by('display_order')[:6])
+
+    # Publications récentes (articles + campagnes)
+    recent_articles = await _alist(Article.objects.filter(
+        status='published',
+        published_at__lte=timezone.now()
+    ).order_by('-published_at')[:3])
+
+    active_campaigns = await _alist(Campaign.objects.filter(
+        status='active',
+        start_date__lte=timezone.now()
+    ).order_by('-start_date')[:3])
+
+    publications = sorted(
+        recent_articles + active_campaigns,
+        key=lambda x: getattr(x, 'published_at', None) or getattr(x, 'start_date', None),
+        reverse=True
+    )[:6]
+
+    context = {
+        'homepage_services': homepage_services,
+        'publications': publications,
+        'settings': await SiteSettings.aget_settings(),
+    }
+    return await arender(request, 'Home/index.html', context)
+
+
+async def practical_info(request):
+    """Page Espace Patient"""
+    page = await Page.objects.filter(slug='espace-patient', is_active=True).afirst()
+
+    patient_journey_sections = await _alist(PatientJourneySection.objects.filter(
+        is_active=True
+    ).prefetch_related('steps').order_by('display_order'))
+
+    context = {
+        'settings': await SiteSettings.aget_settings(),
+        'page': page,
+        'patient_journey_sections': patient_journey_sections,
+    }
+    return await arender(request, 'Home/practical_info.html', context)
+
+
+async def news(request):
+    """Liste des actualités et campagnes avec filtres et pagination"""
+    category_id = request.GET.get('category')
+    search = request.GET.get('search')
+
+    # Campagnes
+    campaigns_qs = Campaign.objects.all().order_by('-start_date')
+    if search:
+        campaigns_qs = campaigns_qs.filter(Q(title__icontains=search) | Q(full_description__icontains=search))
+
+    # Articles
+    articles_qs = Article.objects.filter(status='published').select_related('category').order_by('-published_at')
+    if category_id:
+        articles_qs = articles_qs.filter(category_id=category_id)
+    if search:
+        articles_qs = articles_qs.filter(Q(title__icontains=search) | Q(content__icontains=search))
+
+    context = {
+        'settings': await SiteSettings.aget_settings(),
+        'campaigns': await _aget_page(campaigns_qs, 9, request.GET.get('campaigns_page', 1)),
+        'articles': await _aget_page(articles_qs, 5, request.GET.get('articles_page', 1)),
+        'categories': await sync_to_async(reference_data.categories)(),
+    }
+    return await arender(request, 'news/news.html', context)
+
+
+async def health_campaigns(request):
+    """Liste des campagnes groupées par statut"""
+    today = timezone.now().date()
+
+    context = {
+        'settings': await SiteSettings.aget_settings(),
+        'campaigns_ongoing': await _alist(Campaign.objects.filter(
+            start_date__lte=today,
+            end_date__gte=today
+        ).order_by('-start_date')),
+        'campaigns_upcoming': await _alist(Campaign.objects.filter(
+            start_date__gt=today
+        ).order_by('start_date')),
+        'campaigns_completed': await _alist(Campaign.objects.filter(
+            end_date__lt=today
+        ).order_by('-end_date')),
+    }
+    return await arender(request, 'Home/health_campaigns.html', context)
+
+
+async def service_detail(request, service_slug):
+    """Détail d'un service"""
+    service = await aget_object_or_404(Service, slug=service_slug, is_active=True)
+    staff_members = await _alist(
+        service.staff_members.filter(is_visible=True).select_related('grade')
+    )
+
+    context = {
+        'settings': await SiteSettings.aget_settings(),
+        'service': service,
+        'staff_members': staff_members,
+    }
+    return await arender(request, 'services/service_detail.html', context)
+
+
+async def doctor_detail(request, doctor_id):
+    """Fiche détaillée d'un membre du personnel"""
+    staff = await aget_object_or_404(
+        Staff.objects.select_related('grade').prefetch_related('services'),
+        id=doctor_id, is_visible=True
+    )
+
+    context = {
+        'settings': await SiteSettings.aget_settings(),
+        'staff': staff,
+    }
+    return await arender(request, 'doctors/doctor_detail.html', context)
+
+
+async def get_staff_by_service(request):
+    """API pour récupérer les médecins d'un service (AJAX)"""
+    service_id = request.GET.get('service_id')
+
+    if not service_id:
+        return JsonResponse({'staff': []})
+
+    staff_members = Staff.objects.filter(
+        services__id=service_id,
+        accepts_appointments=True,
+        is_visible=True
+    ).select_related('grade').values('id', 'first_name', 'last_name', 'grade__name', 'speciality')
+
+    staff_list = []
+    async for staff in staff_members:
+        grade_display = staff['grade__name'] or ''
+        staff_list.append({
+            'id': staff['id'],
+            'name': f"{grade_display} {staff['first_name']} {staff['last_name']}".strip(),
+            'speciality': staff['speciality']
+        })
+
+    return JsonResponse({'staff': staff_list})
+
+
+async def get_available_slots(request):
+    """API des créneaux libres d'un médecin ou d'un service (AJAX, Home/slots.py)"""
+    query = slots.parse_query(request.GET)
+    if query is None:
+        return JsonResponse({'scheduled': False, 'days': {}})
+    # Calcul et cache synchrones (plusieurs requêtes, versions par médecin)
+    return JsonResponse(await sync_to_async(slots.available_slots)(**query))
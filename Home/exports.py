@@ -0,0 +1,233 @@
+"""
+Exports CSV / XLSX des rendez-vous, inscriptions aux campagnes et messages
+
+Utilisés par les actions d'administration (lignes cochées) et par la page
+« Exporter » de chaque liste (période choisie), cf. ExportAdminMixin dans
+Home/admin.py.
+
+Les lignes sont lues par paquets de EXPORT_CHUNK_SIZE, une requête par
+paquet paginée sur la clé primaire (pk > dernière clé lue, ordre des N°) :
+PyMySQL charge chaque résultat en entier, un seul paquet est donc en
+mémoire à la fois, sans instance de modèle ni OFFSET.
+
+- CSV : StreamingHttpResponse, un morceau par paquet. Sous ASGI, itérateur
+  asynchrone (chaque paquet lu dans un thread) : avec un itérateur
+  synchrone, Django chargerait tout l'export avant d'envoyer le premier
+  octet. Séparateur « ; » et BOM UTF-8 : ouverture directe dans Excel en
+  français.
+- XLSX : openpyxl en mode write_only (lignes écrites sur disque au fur et à
+  mesure), fichier temporaire envoyé par FileResponse une fois complet.
+  openpyxl est optionnel : sans lui, seul le CSV est proposé.
+
+Durée : un worker gunicorn sync est tué quand une requête l'occupe plus de
+GUNICORN_TIMEOUT (XLSX volumineux, export lent). Le déploiement (deploy/hrae.service) et le
+préréglage par défaut de gunicorn.conf.py sont donc gthread, dont les
+workers ne sont pas tués par une longue requête ; asgi de même.
+"""
+
+import csv
+import logging
+import re
+import tempfile
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+
+from .models import Appointment, CampaignRegistration, ContactMessage
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # dépendance optionnelle
+    Workbook = None
+
+logger = logging.getLogger(__name__)
+
+# Valeurs interprétées comme formules par les tableurs (injection CSV),
+# hors numéros de téléphone (+237 6XX XXX XXX)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+PHONE_LIKE = re.compile(r'[+-][\d\s().-]*')
+
+
+def is_formula(value):
+    return value.startswith(FORMULA_PREFIXES) and not PHONE_LIKE.fullmatch(value)
+
+
+def _choices(choices):
+    labels = dict(choices)
+    return lambda value: labels.get(value, value)
+
+
+# nom -> modèle, champ de date (période), colonnes (en-tête, champ, conversion)
+EXPORTS = {
+    'appointments': {
+        'model': Appointment,
+        'date_field': 'appointment_date',
+        'columns': [
+            ("N°", 'id', None),
+            ("Date du RDV", 'appointment_date', None),
+            ("Durée (min)", 'duration', None),
+            ("Statut", 'status', _choices(Appointment.STATUS_CHOICES)),
+            ("Service", 'service__name', None),
+            ("Médecin (nom)", 'staff__last_name', None),
+            ("Médecin (prénom)", 'staff__first_name', None),
+            ("Patient", 'patient_name', None),
+            ("Email", 'patient_email', None),
+            ("Téléphone", 'patient_phone', None),
+            ("Date de naissance", 'patient_birthdate', None),
+            ("Première visite", 'is_first_visit', None),
+            ("N° d'assurance", 'insurance_number', None),
+            ("Motif", 'reason', None),
+            ("Demandé le", 'created_at', None),
+        ],
+    },
+    'registrations': {
+        'model': CampaignRegistration,
+        'date_field': 'registered_at',
+        'columns': [
+            ("N°", 'id', None),
+            ("Campagne", 'campaign__title', None),
+            ("Nom complet", 'full_name', None),
+            ("Email", 'email', None),
+            ("Téléphone", 'phone', None),
+            ("Âge", 'age', None),
+            ("Raison", 'reason', None),
+            ("Inscrit le", 'registered_at', None),
+        ],
+    },
+    'messages': {
+        'model': ContactMessage,
+        'date_field': 'created_at',
+        'columns': [
+            ("N°", 'id', None),
+            ("Reçu le", 'created_at', None),
+            ("Statut", 'status', _choices(ContactMessage.STATUS_CHOICES)),
+            ("Sujet", 'subject', _choices(ContactMessage.SUBJECT_CHOICES)),
+            ("Nom", 'name', None),
+            ("Email", 'email', None),
+            ("Téléphone", 'phone', None),
+            ("Message", 'message', None),
+            ("Adresse IP", 'ip_address', None),
+        ],
+    },
+}
+
+FORMATS = ('csv', 'xlsx') if Workbook is not None else ('csv',)
+
+
+def export_for_model(model):
+    """Nom de l'export d'un modèle (None s'il n'en a pas)"""
+    for name, spec in EXPORTS.items():
+        if spec['model'] is model:
+            return name
+    return None
+
+
+def batches(name, queryset):
+    """Lignes converties (listes de tuples) par paquets de EXPORT_CHUNK_SIZE, dans l'ordre des clés"""
+    spec = EXPORTS[name]
+    fields = [field for _header, field, _convert in spec['columns']]
+    converters = [convert for _header, _field, convert in spec['columns']]
+    size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    values = queryset.order_by('pk').values_list('pk', *fields)
+    last = None
+    while True:
+        page = list((values if last is None else values.filter(pk__gt=last))[:size])
+        if not page:
+            return
+        yield [
+            tuple(convert(value) if convert else value for convert, value in zip(converters, row[1:]))
+            for row in page
+        ]
+        if len(page) < size:
+            return
+        last = page[-1][0]
+
+
+def rows(name, queryset):
+    """Lignes converties (tuples), une à une"""
+    for batch in batches(name, queryset):
+        yield from batch
+
+
+def csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Oui' if value else 'Non'
+    if isinstance(value, datetime):
+        return value.strftime('%d/%m/%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%d/%m/%Y')
+    value = str(value)
+    return "'" + value if is_formula(value) else value
+
+
+def xlsx_cell(value):
+    if isinstance(value, bool):
+        return 'Oui' if value else 'Non'
+    if isinstance(value, str) and is_formula(value):
+        return "'" + value
+    return value
+
+
+class Echo:
+    """Pseudo-fichier pour csv.writer : chaque ligne est renvoyée, pas stockée"""
+
+    def write(self, value):
+        return value
+
+
+def csv_header(name):
+    writer = csv.writer(Echo(), delimiter=';')
+    return '\ufeff' + writer.writerow([header for header, _field, _convert in EXPORTS[name]['columns']])
+
+
+def csv_lines(batch):
+    writer = csv.writer(Echo(), delimiter=';')
+    return ''.join(writer.writerow([csv_cell(value) for value in row]) for row in batch)
+
+
+def stream_csv(name, queryset):
+    yield csv_header(name)
+    for batch in batches(name, queryset):
+        yield csv_lines(batch)
+
+
+async def astream_csv(name, queryset):
+    """stream_csv pour ASGI : chaque paquet est lu (requête SQL) dans le thread des vues synchrones"""
+    yield csv_header(name)
+    pages = batches(name, queryset)
+    read = sync_to_async(next, thread_sensitive=True)
+    while (batch := await read(pages, None)) is not None:
+        yield csv_lines(batch)
+
+
+def build_xlsx(name, queryset):
+    """Classeur écrit ligne à ligne dans un fichier temporaire (supprimé à la fermeture)"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=name)
+    sheet.append([header for header, _field, _convert in EXPORTS[name]['columns']])
+    for row in rows(name, queryset):
+        sheet.append([xlsx_cell(value) for value in row])
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_response(request, name, queryset, fmt, filename):
+    """Réponse de téléchargement ; l'export (données personnelles) est journalisé"""
+    user = request.user
+    logger.info(
+        "[EXPORT] %s exported as %s - User: %s - File: %s", name, fmt, user, filename,
+        extra={'event': 'admin_export', 'export': name, 'format': fmt, 'user': str(user)},
+    )
+    if fmt == 'xlsx':
+        return FileResponse(build_xlsx(name, queryset), as_attachment=True, filename=f'{filename}.xlsx')
+    stream = astream_csv if isinstance(request, ASGIRequest) else stream_csv
+    response = StreamingHttpResponse(stream(name, queryset), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
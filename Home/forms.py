@@ -1,9 +1,44 @@
 from django import forms
 from .models import Appointment, ContactMessage, CampaignRegistration
+from . import antispam, reference_data
+from .slots import is_slot_available
 
 
-class AppointmentForm(forms.ModelForm):
+class AntiSpamFormMixin:
+    """
+    Filtre anti-robots (Home/antispam.py) : la vue appelle ``spam_reason()``
+    avant ``is_valid()`` et ``release_submission()`` si l'envoi accepté n'est
+    finalement pas enregistré ; le template affiche ``{{ form.antispam_fields }}``
+    dans le <form>.
+    """
+    antispam_form = None
+    # Jeton et contenu réservés par spam_reason()
+    antispam_claimed = False
+
+    def __init__(self, *args, antispam_scope='', **kwargs):
+        # Portée de la détection des doublons (ex. : la campagne)
+        self.antispam_scope = str(antispam_scope)
+        super().__init__(*args, **kwargs)
+
+    def antispam_fields(self):
+        return antispam.hidden_fields(self.antispam_form)
+
+    def spam_reason(self):
+        if not self.is_bound or not antispam.enabled():
+            return None
+        reason = antispam.rejection(self.antispam_form, self.data, self._meta.fields, self.antispam_scope)
+        self.antispam_claimed = reason is None
+        return reason
+
+    def release_submission(self):
+        if self.antispam_claimed:
+            antispam.release(self.antispam_form, self.data, self._meta.fields, self.antispam_scope)
+            self.antispam_claimed = False
+
+
+class AppointmentForm(AntiSpamFormMixin, forms.ModelForm):
     """Formulaire de prise de rendez-vous"""
+    antispam_form = 'appointment'
     
     class Meta:
         model = Appointment
@@ -75,6 +110,12 @@ class AppointmentForm(forms.ModelForm):
         )
         self.fields['staff'].required = False
         self.fields['staff'].empty_label = "-- Pas de préférence --"
+
+        # Options lues dans le cache (Home/reference_data.py) : pas de requête
+        # à l'affichage, les querysets ne servent qu'à valider la saisie
+        for name, options in (('service', reference_data.appointment_services()),
+                              ('staff', reference_data.appointment_staff())):
+            self.fields[name].choices = [('', self.fields[name].empty_label)] + options
         self.fields['patient_birthdate'].required = False
         self.fields['insurance_number'].required = False
 
@@ -86,11 +127,20 @@ class AppointmentForm(forms.ModelForm):
         cleaned_data = super().clean()
         # Validation supprimée : permettre de sélectionner n'importe quel médecin
         # même s'il ne travaille pas dans le service sélectionné
+
+        # Le créneau doit être libre dans le planning (Home/slots.py)
+        appointment_date = cleaned_data.get('appointment_date')
+        staff = cleaned_data.get('staff')
+        service = cleaned_data.get('service')
+        if appointment_date and (staff or service):
+            if not is_slot_available(appointment_date, staff=staff, service=service):
+                self.add_error('appointment_date', "Ce créneau n'est pas disponible. Veuillez en choisir un autre.")
         return cleaned_data
 
 
-class CampaignRegistrationForm(forms.ModelForm):
+class CampaignRegistrationForm(AntiSpamFormMixin, forms.ModelForm):
     """Formulaire d'inscription aux campagnes de santé"""
+    antispam_form = 'campaign_registration'
     
     class Meta:
         model = CampaignRegistration
@@ -139,8 +189,9 @@ class CampaignRegistrationForm(forms.ModelForm):
             self.fields[field_name].widget.attrs['required'] = 'required'
 
 
-class ContactMessageForm(forms.ModelForm):
+class ContactMessageForm(AntiSpamFormMixin, forms.ModelForm):
     """Formulaire de contact"""
+    antispam_form = 'contact'
     
     class Meta:
         model = ContactMessage
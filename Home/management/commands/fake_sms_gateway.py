@@ -0,0 +1,66 @@
+"""
+Passerelle SMS factice pour le développement et les tests
+
+    python manage.py fake_sms_gateway                       # http://127.0.0.1:8025/sms
+    python manage.py fake_sms_gateway --fail-rate 0.3       # 30 % de réponses 503
+
+Reçoit les POST JSON de HTTPSMSBackend ({"to": ..., "message": ...}) et les
+affiche. Réglages correspondants :
+
+    NOTIFICATIONS_SMS_BACKEND=Home.notifications.HTTPSMSBackend
+    NOTIFICATIONS_SMS_URL=http://127.0.0.1:8025/sms
+
+--fail-rate simule une passerelle instable (nouvelles tentatives du worker).
+"""
+
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Lance une passerelle SMS factice (HTTP) qui affiche les SMS reçus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help="Proportion de requêtes rejetées (503), entre 0 et 1")
+
+    def handle(self, *args, **options):
+        stdout = self.stdout
+        fail_rate = options['fail_rate']
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    recipient, message = payload['to'], payload['message']
+                except (ValueError, KeyError, TypeError):
+                    self.send_error(400, "JSON attendu : {\"to\": ..., \"message\": ...}")
+                    return
+                if random.random() < fail_rate:
+                    stdout.write(f"[503] {recipient}")
+                    self.send_error(503)
+                    return
+                stdout.write(f"[SMS] {recipient} : {message}")
+                body = json.dumps({'status': 'queued'}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f"Passerelle SMS factice : http://{options['host']}:{options['port']}/sms (Ctrl+C pour arrêter)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
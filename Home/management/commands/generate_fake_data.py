@@ -0,0 +1,409 @@
+"""
+Génération de données synthétiques pour les tests de montée en charge
+
+    python manage.py generate_fake_data
+    python manage.py generate_fake_data --articles 10000 --appointments 500000
+    python manage.py generate_fake_data --purge
+
+Crée des services, grades, membres du personnel (avec services M2M),
+catégories, articles (HTML CKEditor), campagnes (galeries et inscriptions),
+rendez-vous et messages de contact, par lots de bulk_create.
+
+Les objets générés sont reconnaissables (slugs « gen-... », emails en
+@example.test) et supprimés par --purge. À ne jamais lancer en production.
+
+bulk_create n'appelle ni save() ni les signaux : les slugs sont calculés
+ici, et les caches (pages, données de référence) doivent être vidés après
+coup si le serveur tourne déjà.
+"""
+
+import itertools
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from Home.models import (
+    Appointment, Article, Campaign, CampaignImage, CampaignRegistration, Category,
+    ContactMessage, Grade, Service, Staff,
+)
+
+EMAIL_DOMAIN = 'example.test'
+SLUG_PREFIX = 'gen-'
+
+FIRST_NAMES = [
+    'Jean', 'Marie', 'Paul', 'Aïcha', 'Ibrahim', 'Clarisse', 'Serge', 'Brigitte', 'Emmanuel',
+    'Hélène', 'Samuel', 'Esther', 'Alain', 'Grâce', 'Hamadou', 'Josiane', 'Patrick', 'Fadimatou',
+    'Christian', 'Sandrine', 'Roger', 'Nadège', 'Blaise', 'Carine', 'Oumarou', 'Chantal',
+]
+LAST_NAMES = [
+    'Mbarga', 'Nkoulou', 'Fotso', 'Kamga', 'Tchoupo', 'Ngono', 'Essomba', 'Abena', 'Bello',
+    'Moussa', 'Ndjock', 'Njoya', 'Atangana', 'Owona', 'Tchakounté', 'Manga', 'Ebogo', 'Djoumessi',
+    'Nana', 'Kouam', 'Mvondo', 'Ayissi', 'Hamidou', 'Ngassa', 'Biya', 'Onana',
+]
+SPECIALITIES = [
+    'Cardiologie', 'Pédiatrie', 'Gynécologie-Obstétrique', 'Chirurgie générale', 'Médecine interne',
+    'Neurologie', 'Ophtalmologie', 'ORL', 'Dermatologie', 'Radiologie', 'Anesthésie-Réanimation',
+    'Néphrologie', 'Urologie', 'Traumatologie', 'Psychiatrie', 'Oncologie', 'Endocrinologie',
+]
+GRADES = ['Professeur', 'Maître de conférences', 'Docteur', 'Médecin spécialiste', 'Infirmier', 'Sage-femme']
+CATEGORIES = ['Vie de l\'hôpital', 'Prévention', 'Recherche', 'Événements', 'Partenariats']
+ICONS = ['fa-heartbeat', 'fa-stethoscope', 'fa-baby', 'fa-brain', 'fa-eye', 'fa-bone', 'fa-x-ray']
+LOCATIONS = ['Hall principal HRAE', 'Marché central de Douala', 'Stade de la Réunification', 'Bonabéri', 'Yassa']
+WORDS = (
+    "santé patient soins hôpital consultation prévention dépistage vaccination équipe médicale "
+    "service urgence traitement diagnostic suivi accompagnement famille communauté campagne "
+    "qualité sécurité formation plateau technique chirurgie maternité enfant maladie chronique "
+    "hypertension diabète paludisme nutrition hygiène accueil information recherche innovation"
+).split()
+
+
+def sentence(words=12):
+    text = ' '.join(random.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def paragraph(sentences=4):
+    return ' '.join(sentence(random.randint(8, 18)) for _ in range(sentences))
+
+
+def ckeditor_html(blocks=6):
+    """HTML proche de ce que produit CKEditor 5 (titres, paragraphes, listes, images)"""
+    parts = []
+    for index in range(blocks):
+        kind = random.random()
+        if index and kind < 0.15:
+            parts.append(f'<h2>{sentence(5)[:-1]}</h2>')
+        elif kind < 0.3:
+            items = ''.join(f'<li>{sentence(6)}</li>' for _ in range(random.randint(3, 6)))
+            parts.append(f'<ul>{items}</ul>')
+        elif kind < 0.38:
+            parts.append(
+                '<figure class="image"><img src="/media/uploads/placeholder.jpg" alt="">'
+                f'<figcaption>{sentence(6)}</figcaption></figure>'
+            )
+        else:
+            parts.append(f'<p><strong>{sentence(4)}</strong> {paragraph()}</p>')
+    return '\n'.join(parts)
+
+
+def person():
+    return random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
+
+
+def phone():
+    return f'+237 6{random.randint(50, 99)} {random.randint(10, 99)} {random.randint(10, 99)} {random.randint(10, 99)}'
+
+
+def email(first_name, last_name, index):
+    local = f'{first_name}.{last_name}.{index}'.lower().replace("'", '')
+    return f'{local.encode("ascii", "ignore").decode()}@{EMAIL_DOMAIN}'
+
+
+class Command(BaseCommand):
+    help = "Génère des données synthétiques en masse (tests de charge, reproduction de lenteurs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=30)
+        parser.add_argument('--staff', type=int, default=300)
+        parser.add_argument('--articles', type=int, default=1000)
+        parser.add_argument('--campaigns', type=int, default=100)
+        parser.add_argument('--images-per-campaign', type=int, default=4)
+        parser.add_argument('--registrations', type=int, default=5000,
+                            help="Inscriptions aux campagnes (au total)")
+        parser.add_argument('--appointments', type=int, default=20000)
+        parser.add_argument('--messages', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, help="Graine aléatoire (données reproductibles)")
+        parser.add_argument('--purge', action='store_true',
+                            help="Supprimer les données générées au lieu d'en créer")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être positif")
+        self.batch_size = options['batch_size']
+        if options['purge']:
+            self.purge()
+            return
+
+        random.seed(options['seed'])
+        # Jeton de série : les slugs restent uniques d'une exécution à l'autre
+        self.run = uuid.uuid4().hex[:6]
+        self.now = timezone.now()
+
+        services = self.create_services(options['services'])
+        grades = self.create_grades()
+        staff_by_service = self.create_staff(options['staff'], services, grades)
+        self.create_articles(options['articles'])
+        campaigns = self.create_campaigns(options['campaigns'], options['images_per_campaign'])
+        self.create_registrations(options['registrations'], campaigns)
+        self.create_appointments(options['appointments'], services, staff_by_service)
+        self.create_messages(options['messages'])
+        self.stdout.write(self.style.SUCCESS("Données générées. Pensez à vider le cache si le serveur tourne."))
+
+    # ========================================
+    # Outils
+    # ========================================
+    def bulk(self, model, objects, total):
+        """bulk_create par lots depuis un générateur (mémoire constante)"""
+        if total <= 0:
+            return
+        started = time.perf_counter()
+        created = 0
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += len(batch)
+            self.stdout.write(f"\r{model._meta.verbose_name_plural} : {created}/{total}", ending='')
+            self.stdout.flush()
+        self.stdout.write(f" ({time.perf_counter() - started:.1f} s)")
+
+    def slug(self, kind, index):
+        return f'{SLUG_PREFIX}{kind}-{self.run}-{index}'
+
+    def past(self, days):
+        return self.now - timedelta(days=random.randint(0, days), minutes=random.randint(0, 1440))
+
+    # ========================================
+    # Générateurs
+    # ========================================
+    def create_services(self, count):
+        def objects():
+            for index in range(count):
+                name = f"{random.choice(SPECIALITIES)} {index + 1}"
+                yield Service(
+                    name=name,
+                    slug=self.slug('service', index),
+                    icon=random.choice(ICONS),
+                    short_description=sentence(10)[:255],
+                    full_description=ckeditor_html(),
+                    pathologies='\n'.join(sentence(3) for _ in range(5)),
+                    equipment='\n'.join(sentence(3) for _ in range(3)),
+                    consultation_hours="Lundi - Vendredi : 8h - 16h",
+                    contact_phone=phone(),
+                    show_on_homepage=index < 6,
+                    display_order=index,
+                )
+        self.bulk(Service, objects(), count)
+        # MySQL ne renvoie pas les clés primaires de bulk_create : relecture
+        return list(Service.objects.filter(slug__startswith=self.slug('service', '')).values_list('id', flat=True))
+
+    def create_grades(self):
+        existing = set(Grade.objects.filter(name__in=GRADES).values_list('name', flat=True))
+        Grade.objects.bulk_create([
+            Grade(name=name, display_order=index) for index, name in enumerate(GRADES) if name not in existing
+        ])
+        return list(Grade.objects.filter(name__in=GRADES).values_list('id', flat=True))
+
+    def create_staff(self, count, services, grades):
+        marker = f'.{self.run}.'
+
+        def objects():
+            for index in range(count):
+                first_name, last_name = person()
+                yield Staff(
+                    title=random.choice(['Dr', 'Dr', 'Pr', 'Mme', 'Mr']),
+                    first_name=first_name,
+                    last_name=last_name,
+                    photo='staff/placeholder.jpg',
+                    grade_id=random.choice(grades),
+                    speciality=random.choice(SPECIALITIES),
+                    diplomas='\n'.join(f'<p>{sentence(5)}</p>' for _ in range(3)),
+                    experience=ckeditor_html(3),
+                    languages="Français, Anglais",
+                    accepts_appointments=random.random() < 0.6,
+                    email=email(first_name, last_name, f'{self.run}.s{index}'),
+                    phone=phone(),
+                    display_order=index,
+                )
+
+        self.bulk(Staff, objects(), count)
+        staff_ids = list(Staff.objects.filter(email__contains=marker).values_list('id', flat=True))
+
+        # Services affectés (M2M) : 1 à 3 par membre
+        through = Staff.services.through
+        links, staff_by_service = [], {}
+        for staff_id in staff_ids:
+            for service_id in random.sample(services, min(len(services), random.randint(1, 3))):
+                links.append(through(staff_id=staff_id, service_id=service_id))
+                staff_by_service.setdefault(service_id, []).append(staff_id)
+        self.bulk(through, links, len(links))
+        return staff_by_service
+
+    def create_articles(self, count):
+        User = get_user_model()
+        authors = list(User.objects.filter(is_staff=True).values_list('id', flat=True)[:5])
+        if not authors:
+            # Base vide : les gabarits des actualités attendent un auteur
+            author, created = User.objects.get_or_create(
+                username=f'{SLUG_PREFIX}auteur',
+                defaults={'email': f'auteur@{EMAIL_DOMAIN}', 'is_staff': True},
+            )
+            if created:
+                author.set_unusable_password()
+                author.save(update_fields=['password'])
+            authors = [author.id]
+        categories = []
+        for index, name in enumerate(CATEGORIES):
+            category, _created = Category.objects.get_or_create(
+                slug=f'{SLUG_PREFIX}categorie-{index}', defaults={'name': name}
+            )
+            categories.append(category.id)
+
+        def objects():
+            for index in range(count):
+                status = random.choices(['published', 'draft', 'archived'], weights=[85, 10, 5])[0]
+                yield Article(
+                    title=sentence(random.randint(5, 10))[:-1][:255],
+                    slug=self.slug('article', index),
+                    excerpt=f'<p>{sentence(20)}</p>',
+                    content=ckeditor_html(random.randint(6, 15)),
+                    featured_image='articles/placeholder.jpg',
+                    category_id=random.choice(categories),
+                    author_id=random.choice(authors) if authors else None,
+                    status=status,
+                    published_at=self.past(1500) if status != 'draft' else None,
+                    meta_description=sentence(12)[:160],
+                    views_count=random.randint(0, 5000),
+                )
+        self.bulk(Article, objects(), count)
+
+    def create_campaigns(self, count, images_per_campaign):
+        today = self.now.date()
+
+        def objects():
+            for index in range(count):
+                start = today + timedelta(days=random.randint(-1000, 90))
+                end = start + timedelta(days=random.randint(1, 30))
+                status = 'upcoming' if start > today else ('completed' if end < today else 'ongoing')
+                yield Campaign(
+                    title=f"Campagne {sentence(4)[:-1]}"[:255],
+                    slug=self.slug('campagne', index),
+                    banner_image='campaigns/placeholder.jpg',
+                    short_description=sentence(12)[:255],
+                    full_description=ckeditor_html(),
+                    start_date=start,
+                    end_date=end,
+                    location=random.choice(LOCATIONS),
+                    schedule="8h-16h",
+                    services_offered='\n'.join(sentence(3) for _ in range(4)),
+                    target_audience="Grand public",
+                    objectives=paragraph(2),
+                    contact_name=' '.join(person()),
+                    contact_phone=phone(),
+                    registration_enabled=random.random() < 0.7,
+                    status=status,
+                )
+        self.bulk(Campaign, objects(), count)
+        campaigns = list(Campaign.objects.filter(slug__startswith=self.slug('campagne', '')).values_list('id', flat=True))
+
+        def images():
+            for campaign_id in campaigns:
+                for order in range(images_per_campaign):
+                    yield CampaignImage(
+                        campaign_id=campaign_id,
+                        image='campaigns/gallery/placeholder.jpg',
+                        caption=sentence(5)[:255],
+                        display_order=order,
+                    )
+        self.bulk(CampaignImage, images(), len(campaigns) * images_per_campaign)
+        return campaigns
+
+    def create_registrations(self, count, campaigns):
+        if not campaigns:
+            return
+        # Répartition inégale : quelques campagnes concentrent les inscriptions
+        weights = [random.paretovariate(1.2) for _ in campaigns]
+
+        def objects():
+            for index in range(count):
+                first_name, last_name = person()
+                yield CampaignRegistration(
+                    campaign_id=random.choices(campaigns, weights=weights)[0],
+                    full_name=f'{first_name} {last_name}',
+                    email=email(first_name, last_name, f'{self.run}.r{index}'),
+                    phone=phone(),
+                    age=random.randint(1, 90),
+                    reason=sentence(10) if random.random() < 0.5 else '',
+                )
+        self.bulk(CampaignRegistration, objects(), count)
+
+    def create_appointments(self, count, services, staff_by_service):
+        if not services:
+            services = list(Service.objects.values_list('id', flat=True))
+        if not services:
+            raise CommandError("Aucun service : impossible de créer des rendez-vous")
+
+        def objects():
+            for index in range(count):
+                first_name, last_name = person()
+                service_id = random.choice(services)
+                staff = staff_by_service.get(service_id)
+                # Créneaux de 30 minutes entre 8h et 16h, sur deux ans passés et trois mois à venir
+                day = self.now.replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(
+                    days=random.randint(-730, 90)
+                )
+                date = day + timedelta(minutes=30 * random.randint(0, 15))
+                status = 'pending' if date > self.now else random.choices(
+                    ['completed', 'cancelled', 'confirmed'], weights=[80, 15, 5]
+                )[0]
+                yield Appointment(
+                    patient_name=f'{first_name} {last_name}',
+                    patient_email=email(first_name, last_name, f'{self.run}.a{index}'),
+                    patient_phone=phone(),
+                    service_id=service_id,
+                    staff_id=random.choice(staff) if staff and random.random() < 0.8 else None,
+                    appointment_date=date,
+                    reason=sentence(random.randint(6, 20)),
+                    is_first_visit=random.random() < 0.4,
+                    status=status,
+                )
+        self.bulk(Appointment, objects(), count)
+
+    def create_messages(self, count):
+        subjects = [code for code, _label in ContactMessage.SUBJECT_CHOICES]
+
+        def objects():
+            for index in range(count):
+                first_name, last_name = person()
+                yield ContactMessage(
+                    name=f'{first_name} {last_name}',
+                    email=email(first_name, last_name, f'{self.run}.m{index}'),
+                    phone=phone(),
+                    subject=random.choice(subjects),
+                    message=paragraph(random.randint(1, 5)),
+                    status=random.choices(['new', 'read', 'replied', 'archived'], weights=[20, 30, 40, 10])[0],
+                    ip_address=f'41.202.{random.randint(0, 255)}.{random.randint(1, 254)}',
+                )
+        self.bulk(ContactMessage, objects(), count)
+
+    # ========================================
+    # Suppression
+    # ========================================
+    def purge(self):
+        email_suffix = f'@{EMAIL_DOMAIN}'
+        # Ordre : les dépendances d'abord (Appointment -> Service/Staff)
+        querysets = [
+            Appointment.objects.filter(patient_email__endswith=email_suffix),
+            ContactMessage.objects.filter(email__endswith=email_suffix),
+            CampaignRegistration.objects.filter(email__endswith=email_suffix),
+            Campaign.objects.filter(slug__startswith=SLUG_PREFIX),
+            Article.objects.filter(slug__startswith=SLUG_PREFIX),
+            Category.objects.filter(slug__startswith=SLUG_PREFIX),
+            Staff.objects.filter(email__endswith=email_suffix),
+            Service.objects.filter(slug__startswith=SLUG_PREFIX),
+            get_user_model().objects.filter(username=f'{SLUG_PREFIX}auteur'),
+        ]
+        for queryset in querysets:
+            _total, deleted = queryset.delete()
+            model = queryset.model._meta
+            self.stdout.write(f"{model.verbose_name_plural} : {deleted.get(model.label, 0)} supprimé(s)")
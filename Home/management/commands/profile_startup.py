@@ -0,0 +1,105 @@
+"""
+Profilage du temps de démarrage (imports) d'un worker ou d'une commande
+
+    python manage.py profile_startup
+    python manage.py profile_startup --target asgi --sort self --limit 40
+    python manage.py profile_startup --group --repeat 5
+
+Lance un interpréteur neuf avec ``python -X importtime`` (les modules de ce
+processus-ci sont déjà importés) et agrège le coût de chaque module.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Ce que fait chaque type de processus au démarrage
+TARGETS = {
+    'setup': "import django; django.setup()",
+    'wsgi': (
+        "from core.wsgi import application; "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+    'asgi': (
+        "from core.asgi import application; "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+    'manage': (
+        "import sys; from django.core.management import execute_from_command_line; "
+        "execute_from_command_line(['manage.py', 'help'])"
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """Lignes 'import time: self | cumulative | module' -> [(module, self_us, cumul_us, profondeur)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût des imports au démarrage (worker WSGI/ASGI, django.setup, manage.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(TARGETS), default='wsgi')
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative')
+        parser.add_argument('--limit', type=int, default=25)
+        parser.add_argument('--group', action='store_true',
+                            help="Regrouper par paquet de premier niveau (django, axes, PIL...)")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Nombre de démarrages chronométrés (le minimum est retenu)")
+
+    def run_target(self, target, importtime=False):
+        command = [sys.executable]
+        if importtime:
+            command += ['-X', 'importtime']
+        command += ['-c', TARGETS[target]]
+        started = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            raise CommandError(f"Le démarrage '{target}' a échoué :\n{result.stderr[-2000:]}")
+        return elapsed, result.stderr
+
+    def handle(self, *args, **options):
+        target = options['target']
+        _elapsed, stderr = self.run_target(target, importtime=True)
+        rows = parse_importtime(stderr)
+        if not rows:
+            raise CommandError("Aucune donnée -X importtime")
+
+        timings = [self.run_target(target)[0] for _ in range(max(1, options['repeat']))]
+        total_self = sum(row[1] for row in rows)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Démarrage '{target}'"))
+        self.stdout.write(
+            f"  Durée (min sur {len(timings)}) : {min(timings) * 1000:.0f} ms - "
+            f"imports : {total_self / 1000:.0f} ms pour {len(rows)} modules"
+        )
+
+        if options['group']:
+            packages = {}
+            for name, self_us, _cumulative, _depth in rows:
+                top = name.split('.')[0]
+                count, total = packages.get(top, (0, 0))
+                packages[top] = (count + 1, total + self_us)
+            ranking = sorted(packages.items(), key=lambda item: item[1][1], reverse=True)
+            self.stdout.write(f"\n  {'paquet':40} {'modules':>8} {'ms':>9}")
+            for top, (count, total) in ranking[:options['limit']]:
+                self.stdout.write(f"  {top:40} {count:8} {total / 1000:9.1f}")
+            return
+
+        index = 1 if options['sort'] == 'self' else 2
+        ranking = sorted(rows, key=lambda row: row[index], reverse=True)
+        self.stdout.write(f"\n  {'module':60} {'self ms':>9} {'cumul ms':>9}")
+        for name, self_us, cumulative_us, _depth in ranking[:options['limit']]:
+            self.stdout.write(f"  {name:60} {self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}")
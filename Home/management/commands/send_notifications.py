@@ -0,0 +1,62 @@
+"""
+Envoi des notifications en attente (outbox, Home/notifications.py)
+
+    python manage.py send_notifications                  # worker (systemd)
+    python manage.py send_notifications --once           # un passage (cron)
+    python manage.py send_notifications --batch-size 100 --interval 2
+
+Plusieurs workers peuvent tourner en parallèle : chaque lot est réservé
+(SELECT ... FOR UPDATE SKIP LOCKED). SIGTERM/SIGINT : arrêt après le lot
+en cours.
+"""
+
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from Home import notifications
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails et SMS en attente (NotificationOutbox), par lots avec nouvelles tentatives"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Vider la file une fois puis s'arrêter")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Attente (secondes) quand la file est vide")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être positif")
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        retention_days = getattr(settings, 'NOTIFICATIONS_RETENTION_DAYS', 30)
+        last_purge = 0.0
+        total = 0
+        while not self.stopping:
+            close_old_connections()
+            processed = notifications.deliver_batch(options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write(f"{processed} notification(s) traitée(s)")
+                continue
+            if options['once']:
+                break
+            # File vide : purge des anciens envois au plus une fois par heure
+            if time.monotonic() - last_purge > 3600:
+                deleted = notifications.purge_sent(retention_days)
+                if deleted:
+                    self.stdout.write(f"{deleted} notification(s) envoyée(s) supprimée(s)")
+                last_purge = time.monotonic()
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Terminé : {total} notification(s) traitée(s)"))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Home', '0023_grade_alter_staff_grade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Lundi'), (1, 'Mardi'), (2, 'Mercredi'), (3, 'Jeudi'), (4, 'Vendredi'), (5, 'Samedi'), (6, 'Dimanche')], verbose_name='Jour')),
+                ('start_time', models.TimeField(verbose_name='Début')),
+                ('end_time', models.TimeField(verbose_name='Fin')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Active')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='Home.staff', verbose_name='Membre du personnel')),
+            ],
+            options={
+                'verbose_name': 'Plage de consultation',
+                'verbose_name_plural': 'Plages de consultation',
+                'ordering': ['staff', 'weekday', 'start_time'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Home', '0024_staffschedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['staff', 'appointment_date'], name='appointment_staff_date_idx'),
+        ),
+    ]
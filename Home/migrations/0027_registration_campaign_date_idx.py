@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Home', '0026_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaignregistration',
+            index=models.Index(fields=['campaign', '-registered_at'], name='registration_campaign_date_idx'),
+        ),
+    ]
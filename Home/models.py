@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils.text import slugify
+from django.utils import timezone
 from django.core.validators import FileExtensionValidator
+from django.core.exceptions import ValidationError
 from django.db.models import JSONField
 from django_ckeditor_5.fields import CKEditor5Field
 
@@ -148,6 +150,11 @@ class SiteSettings(models.Model):
         obj, created = cls.objects.get_or_create(pk=1)
         return obj
 
+    @classmethod
+    async def aget_settings(cls):
+        obj, created = await cls.objects.aget_or_create(pk=1)
+        return obj
+
 
 # ========================================
 # PARCOURS PATIENT
@@ -377,6 +384,41 @@ class Staff(models.Model):
         return name
 
 
+# ========================================
+# PLANNING HEBDOMADAIRE DU PERSONNEL
+# ========================================
+class StaffSchedule(models.Model):
+    """Plage de consultation hebdomadaire d'un membre du personnel (créneaux en ligne, Home/slots.py)"""
+    WEEKDAY_CHOICES = [
+        (0, 'Lundi'),
+        (1, 'Mardi'),
+        (2, 'Mercredi'),
+        (3, 'Jeudi'),
+        (4, 'Vendredi'),
+        (5, 'Samedi'),
+        (6, 'Dimanche'),
+    ]
+
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE, verbose_name="Membre du personnel",
+                              related_name='schedules')
+    weekday = models.IntegerField("Jour", choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField("Début")
+    end_time = models.TimeField("Fin")
+    is_active = models.BooleanField("Active", default=True)
+
+    class Meta:
+        verbose_name = "Plage de consultation"
+        verbose_name_plural = "Plages de consultation"
+        ordering = ['staff', 'weekday', 'start_time']
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+    def clean(self):
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            raise ValidationError({'end_time': "L'heure de fin doit être après l'heure de début."})
+
+
 # ========================================
 # CATÉGORIES D'ARTICLES
 # ========================================
@@ -550,6 +592,10 @@ class CampaignRegistration(models.Model):
         verbose_name = "Inscription à une campagne"
         verbose_name_plural = "Inscriptions aux campagnes"
         ordering = ['-registered_at']
+        indexes = [
+            # Panneau paginé de l'admin des campagnes : inscriptions d'une campagne, plus récentes d'abord
+            models.Index(fields=['campaign', '-registered_at'], name='registration_campaign_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.full_name} - {self.campaign.title}"
@@ -629,6 +675,10 @@ class Appointment(models.Model):
         verbose_name = "Rendez-vous"
         verbose_name_plural = "Rendez-vous"
         ordering = ['-appointment_date']
+        indexes = [
+            # Créneaux et conflits d'un médecin (Home/slots.py) : parcours d'une plage de dates
+            models.Index(fields=['staff', 'appointment_date'], name='appointment_staff_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.patient_name} - {self.appointment_date.strftime('%d/%m/%Y %H:%M')}"
@@ -674,6 +724,51 @@ class ContactMessage(models.Model):
         return f"{self.name} - {self.get_subject_display()}"
 
 
+# ========================================
+# NOTIFICATIONS (OUTBOX)
+# ========================================
+class NotificationOutbox(models.Model):
+    """
+    Email ou SMS à envoyer, écrit dans la transaction du formulaire et
+    envoyé par la commande send_notifications (Home/notifications.py)
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échec'),
+    ]
+
+    event = models.CharField("Événement", max_length=50)
+    channel = models.CharField("Canal", max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField("Destinataire", max_length=255)
+    subject = models.CharField("Sujet", max_length=255, blank=True)
+    body = models.TextField("Message")
+
+    status = models.CharField("Statut", max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField("Tentatives", default=0)
+    last_error = models.TextField("Dernière erreur", blank=True)
+    next_attempt_at = models.DateTimeField("Prochaine tentative", default=timezone.now)
+    created_at = models.DateTimeField("Créé le", auto_now_add=True)
+    sent_at = models.DateTimeField("Envoyé le", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Notification"
+        verbose_name_plural = "Notifications (envois)"
+        ordering = ['-created_at']
+        indexes = [
+            # Lot suivant du worker : notifications en attente dont l'heure est venue
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} {self.event} → {self.recipient}"
+
+
 # ========================================
 # TÉMOIGNAGES
 # ========================================
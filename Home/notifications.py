@@ -0,0 +1,233 @@
+"""
+Notifications par email et SMS (outbox transactionnelle)
+
+Les vues n'envoient rien : elles écrivent des lignes NotificationOutbox dans
+la même transaction que le rendez-vous, le message ou l'inscription (pas de
+notification pour une demande annulée, pas de demande perdue si l'envoi
+échoue). La commande send_notifications les envoie par lots :
+
+    python manage.py send_notifications            # worker (boucle)
+    python manage.py send_notifications --once     # un passage (cron)
+
+- emails : backend Django (EMAIL_*), une connexion SMTP par lot ;
+- SMS : NOTIFICATIONS_SMS_BACKEND (HTTPSMSBackend : POST JSON vers
+  NOTIFICATIONS_SMS_URL). Vide : aucun SMS n'est mis en file.
+
+Un envoi en échec est retenté avec un délai croissant, jusqu'à
+NOTIFICATIONS_MAX_ATTEMPTS tentatives (statut « Échec » ensuite, visible et
+relançable dans l'admin).
+
+En local : serveur SMTP de test (python -m aiosmtpd -n -l 127.0.0.1:1025,
+MailHog...) avec EMAIL_HOST=127.0.0.1 EMAIL_PORT=1025, et passerelle SMS
+factice (python manage.py fake_sms_gateway).
+"""
+
+import json
+import logging
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core import metrics
+from .models import NotificationOutbox, SiteSettings
+
+logger = logging.getLogger(__name__)
+
+
+# ========================================
+# Passerelles SMS
+# ========================================
+class ConsoleSMSBackend:
+    """SMS écrits dans les logs (développement)"""
+
+    def send(self, recipient, body):
+        logger.info("[NOTIFY] SMS to %s: %s", recipient, body, extra={'event': 'sms_console'})
+
+
+class HTTPSMSBackend:
+    """
+    POST {"to": ..., "message": ...} vers NOTIFICATIONS_SMS_URL, jeton
+    NOTIFICATIONS_SMS_TOKEN en en-tête Authorization. Réponse non 2xx :
+    échec (nouvelle tentative).
+    """
+
+    def __init__(self):
+        self.url = settings.NOTIFICATIONS_SMS_URL
+        self.token = getattr(settings, 'NOTIFICATIONS_SMS_TOKEN', '')
+        self.timeout = getattr(settings, 'NOTIFICATIONS_SMS_TIMEOUT', 10)
+
+    def send(self, recipient, body):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({'to': recipient, 'message': body}).encode(),
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {self.token}'},
+            method='POST',
+        )
+        # HTTPError (4xx/5xx) et URLError remontent : échec de l'envoi
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def sms_enabled():
+    return bool(getattr(settings, 'NOTIFICATIONS_SMS_BACKEND', ''))
+
+
+# ========================================
+# Mise en file (dans la transaction de la vue)
+# ========================================
+def enqueue(event, channel, recipient, context, subject=''):
+    """Ligne d'outbox ; corps rendu depuis templates/notifications/<event>.txt (ou _sms.txt)"""
+    if not getattr(settings, 'NOTIFICATIONS_ENABLED', True) or not recipient:
+        return None
+    if channel == 'sms' and not sms_enabled():
+        return None
+    template = f'notifications/{event}_sms.txt' if channel == 'sms' else f'notifications/{event}.txt'
+    return NotificationOutbox.objects.create(
+        event=event,
+        channel=channel,
+        recipient=recipient,
+        subject=subject,
+        body=render_to_string(template, context).strip(),
+    )
+
+
+def staff_recipients(site):
+    """Adresses des alertes internes : NOTIFICATIONS_STAFF_EMAILS, sinon l'email du site"""
+    recipients = [email for email in getattr(settings, 'NOTIFICATIONS_STAFF_EMAILS', []) if email]
+    return recipients or ([site.email] if site.email else [])
+
+
+def appointment_requested(appointment):
+    site = SiteSettings.get_settings()
+    context = {'appointment': appointment, 'site': site}
+    enqueue('appointment_patient', 'email', appointment.patient_email, context,
+            subject=f"{site.site_name} - Demande de rendez-vous reçue")
+    enqueue('appointment_patient', 'sms', appointment.patient_phone, context)
+
+    recipients = staff_recipients(site)
+    if appointment.staff and appointment.staff.email:
+        recipients.append(appointment.staff.email)
+    for recipient in dict.fromkeys(recipients):
+        enqueue('appointment_staff', 'email', recipient, context,
+                subject=f"Nouveau rendez-vous - {appointment.service.name} - "
+                        f"{appointment.appointment_date:%d/%m/%Y %H:%M}")
+
+
+def contact_received(message):
+    site = SiteSettings.get_settings()
+    context = {'message': message, 'site': site}
+    enqueue('contact_patient', 'email', message.email, context,
+            subject=f"{site.site_name} - Message bien reçu")
+    for recipient in staff_recipients(site):
+        enqueue('contact_staff', 'email', recipient, context,
+                subject=f"Nouveau message de contact - {message.get_subject_display()}")
+
+
+def campaign_registered(registration):
+    site = SiteSettings.get_settings()
+    context = {'registration': registration, 'campaign': registration.campaign, 'site': site}
+    enqueue('campaign_patient', 'email', registration.email, context,
+            subject=f"{site.site_name} - Inscription à {registration.campaign.title}")
+    enqueue('campaign_patient', 'sms', registration.phone, context)
+    for recipient in staff_recipients(site):
+        enqueue('campaign_staff', 'email', recipient, context,
+                subject=f"Nouvelle inscription - {registration.campaign.title}")
+
+
+# ========================================
+# Envoi (commande send_notifications)
+# ========================================
+def retry_delay(attempts):
+    """Délai avant la tentative suivante : 1, 2, 4, 8... minutes (NOTIFICATIONS_RETRY_BASE)"""
+    return timedelta(seconds=getattr(settings, 'NOTIFICATIONS_RETRY_BASE', 60) * 2 ** (attempts - 1))
+
+
+def claim_batch(size):
+    """
+    Réserve un lot de notifications dues : leur prochaine tentative est
+    repoussée du bail (NOTIFICATIONS_LEASE), un autre worker ne les prend pas.
+    Si ce worker s'arrête en cours d'envoi, elles redeviennent dues après le bail.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:size]
+        )
+        if batch:
+            NotificationOutbox.objects.filter(pk__in=[item.pk for item in batch]).update(
+                next_attempt_at=now + timedelta(seconds=getattr(settings, 'NOTIFICATIONS_LEASE', 300))
+            )
+    return batch
+
+
+def deliver_batch(size=50):
+    """Envoie un lot ; retourne le nombre de notifications traitées"""
+    batch = claim_batch(size)
+    if not batch:
+        return 0
+
+    email_connection = None
+    sms_backend = None
+    try:
+        for item in batch:
+            try:
+                if item.channel == 'email':
+                    if email_connection is None:
+                        email_connection = get_connection()
+                        email_connection.open()
+                    EmailMessage(item.subject, item.body, to=[item.recipient], connection=email_connection).send()
+                else:
+                    if sms_backend is None:
+                        sms_backend = import_string(settings.NOTIFICATIONS_SMS_BACKEND)()
+                    sms_backend.send(item.recipient, item.body)
+            except Exception as exc:
+                record_failure(item, exc)
+                if item.channel == 'email' and email_connection is not None:
+                    # Connexion SMTP peut-être rompue : nouvelle connexion pour la suite
+                    email_connection.close()
+                    email_connection = None
+            else:
+                item.status = 'sent'
+                item.attempts += 1
+                item.sent_at = timezone.now()
+                item.last_error = ''
+                item.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+                metrics.inc('hrae_notifications_total', {'channel': item.channel, 'result': 'sent'})
+    finally:
+        if email_connection is not None:
+            email_connection.close()
+    return len(batch)
+
+
+def record_failure(item, exc):
+    item.attempts += 1
+    item.last_error = f'{type(exc).__name__}: {exc}'[:1000]
+    if item.attempts >= getattr(settings, 'NOTIFICATIONS_MAX_ATTEMPTS', 5):
+        item.status = 'failed'
+        result = 'failed'
+    else:
+        item.next_attempt_at = timezone.now() + retry_delay(item.attempts)
+        result = 'retry'
+    item.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+    metrics.inc('hrae_notifications_total', {'channel': item.channel, 'result': result})
+    logger.warning(
+        "[NOTIFY] Delivery failed - Channel: %s - Event: %s - Attempt: %s - Error: %s",
+        item.channel, item.event, item.attempts, item.last_error,
+        extra={'event': 'notification_failed', 'channel': item.channel, 'attempts': item.attempts},
+    )
+
+
+def purge_sent(days):
+    """Supprime les notifications envoyées depuis plus de ``days`` jours"""
+    deleted, _details = NotificationOutbox.objects.filter(
+        status='sent', sent_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
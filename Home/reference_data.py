@@ -0,0 +1,69 @@
+"""
+Listes de référence en cache : services, personnel, grades, catégories
+
+Options des <select> du formulaire de rendez-vous et des filtres des pages
+Équipe et Actualités. Chaque liste est construite une fois puis lue dans le
+cache (aucune requête SQL pour afficher le formulaire ou les filtres).
+
+Les clés contiennent un numéro de version commun, changé par
+Home/signals.py à chaque modification d'un Service, Staff, Grade ou
+Category : les anciennes entrées ne sont plus lues et expirent d'elles-mêmes
+(REFERENCE_DATA_TIMEOUT).
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Category, Grade, Service, Staff
+
+VERSION_KEY = 'refdata:version'
+
+
+def version():
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        current = invalidate()
+    return current
+
+
+def invalidate():
+    """Nouvelle version : toutes les listes seront reconstruites à la prochaine lecture"""
+    current = time.time_ns()
+    cache.set(VERSION_KEY, current, None)
+    return current
+
+
+def _cached(name, build):
+    return cache.get_or_set(
+        f'refdata:{version()}:{name}', build, getattr(settings, 'REFERENCE_DATA_TIMEOUT', 3600)
+    )
+
+
+def appointment_services():
+    """Options du champ service (AppointmentForm) : [(id, nom)]"""
+    return _cached('appointment_services', lambda: list(Service.objects.values_list('id', 'name')))
+
+
+def appointment_staff():
+    """Options du champ staff (AppointmentForm) : [(id, libellé)]"""
+    return _cached('appointment_staff', lambda: [
+        (staff.pk, str(staff))
+        for staff in Staff.objects.filter(accepts_appointments=True).only('id', 'title', 'first_name', 'last_name')
+    ])
+
+
+def team_services():
+    """Filtre de la page Équipe : services actifs hors Direction"""
+    return _cached('team_services', lambda: list(
+        Service.objects.filter(is_active=True).exclude(slug='direction').values('id', 'name')
+    ))
+
+
+def grades():
+    return _cached('grades', lambda: list(Grade.objects.filter(is_active=True).values('id', 'name')))
+
+
+def categories():
+    return _cached('categories', lambda: list(Category.objects.values('id', 'name', 'slug')))
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core import error_pages
+from . import reference_data, slots
+from .models import Appointment, Category, Grade, Service, SiteSettings, Staff, StaffSchedule
+
+
+@receiver(post_save, sender=SiteSettings)
+def refresh_error_pages(sender, instance, **kwargs):
+    """Les pages d'erreur pré-rendues affichent des SiteSettings : on les régénère"""
+    error_pages.invalidate()
+    transaction.on_commit(error_pages.warm_up)
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=StaffSchedule)
+def refresh_staff_slots(sender, instance, **kwargs):
+    """Créneaux en cache du médecin périmés (Home/slots.py), après la transaction"""
+    if instance.staff_id:
+        transaction.on_commit(lambda: slots.invalidate_slots(instance.staff_id))
+
+
+@receiver(post_save, sender=Staff)
+def refresh_staff_slots_settings(sender, instance, **kwargs):
+    """Durée de consultation ou prise de RDV en ligne modifiée"""
+    transaction.on_commit(lambda: slots.invalidate_slots(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Staff)
+@receiver([post_save, post_delete], sender=Grade)
+@receiver([post_save, post_delete], sender=Category)
+@receiver(m2m_changed, sender=Staff.services.through)
+def refresh_reference_data(sender, **kwargs):
+    """Listes de choix en cache périmées (Home/reference_data.py), après la transaction"""
+    transaction.on_commit(reference_data.invalidate)
@@ -0,0 +1,279 @@
+"""
+Créneaux de rendez-vous disponibles
+
+Les créneaux d'un médecin sont ses plages hebdomadaires (StaffSchedule)
+découpées selon sa durée de consultation, moins les rendez-vous déjà pris
+(en attente ou confirmés) et les créneaux trop proches (SLOTS_MIN_NOTICE).
+
+Les rendez-vous de la période sont chargés en une requête et fusionnés en
+intervalles disjoints triés (BusyIntervals) : chaque créneau est testé par
+recherche dichotomique, sans parcourir tous les rendez-vous.
+
+Le résultat est mis en cache par médecin (SLOTS_CACHE_TIMEOUT). La clé
+contient un numéro de version du médecin, changé par Home/signals.py à
+chaque rendez-vous ou plage modifié : pas de créneau périmé après une
+réservation.
+
+La réservation (book_appointment) est atomique : la ligne Staff du médecin
+est verrouillée (SELECT ... FOR UPDATE) pendant la vérification et
+l'enregistrement, deux demandes simultanées ne peuvent pas obtenir le même
+créneau.
+"""
+
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Appointment, Staff, StaffSchedule
+
+# Rendez-vous qui occupent le créneau
+BUSY_STATUSES = ('pending', 'confirmed')
+
+
+class SlotUnavailable(Exception):
+    """Le créneau demandé est pris (ou hors planning) au moment de la réservation"""
+
+
+def merge_intervals(intervals):
+    """Intervalles [début, fin) triés et fusionnés (chevauchants ou contigus)"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class BusyIntervals:
+    """Périodes occupées d'un médecin, interrogeables en O(log n)"""
+
+    def __init__(self, intervals):
+        self.intervals = merge_intervals(intervals)
+        self.starts = [start for start, _end in self.intervals]
+
+    def overlaps(self, start, end):
+        # Dernier intervalle commençant avant ``end`` : les intervalles étant
+        # disjoints et triés, c'est le seul qui puisse encore chevaucher
+        index = bisect_left(self.starts, end) - 1
+        return index >= 0 and self.intervals[index][1] > start
+
+
+def compute_slots(staff, start_date, days, now=None):
+    """
+    Créneaux libres de ``staff`` du ``start_date`` inclus sur ``days`` jours :
+    {'AAAA-MM-JJ': ['HH:MM', ...]} (jours sans créneau omis)
+    """
+    now = now or datetime.now()
+    earliest = now + timedelta(minutes=getattr(settings, 'SLOTS_MIN_NOTICE', 60))
+    period_start = datetime.combine(start_date, datetime.min.time())
+    period_end = period_start + timedelta(days=days)
+    duration = timedelta(minutes=staff.consultation_duration or 30)
+
+    windows = {}
+    for schedule in StaffSchedule.objects.filter(staff=staff, is_active=True):
+        windows.setdefault(schedule.weekday, []).append((schedule.start_time, schedule.end_time))
+
+    # Rendez-vous commençant avant la période mais débordant dessus : marge d'une journée
+    appointments = Appointment.objects.filter(
+        staff=staff,
+        status__in=BUSY_STATUSES,
+        appointment_date__gte=period_start - timedelta(days=1),
+        appointment_date__lt=period_end,
+    ).values_list('appointment_date', 'duration')
+    busy = BusyIntervals(
+        (date, date + timedelta(minutes=length or 30)) for date, length in appointments
+    )
+
+    result = {}
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        day_slots = []
+        for window_start, window_end in merge_intervals(windows.get(day.weekday(), [])):
+            slot = datetime.combine(day, window_start)
+            limit = datetime.combine(day, window_end)
+            while slot + duration <= limit:
+                if slot >= earliest and not busy.overlaps(slot, slot + duration):
+                    day_slots.append(slot.strftime('%H:%M'))
+                slot += duration
+        if day_slots:
+            result[day.isoformat()] = day_slots
+    return result
+
+
+def slots_version(staff_id):
+    version = cache.get(f'slots:version:{staff_id}')
+    if version is None:
+        version = invalidate_slots(staff_id)
+    return version
+
+
+def invalidate_slots(staff_id):
+    """Nouvelle version : les créneaux en cache de ce médecin ne sont plus lus"""
+    version = time.time_ns()
+    cache.set(f'slots:version:{staff_id}', version, None)
+    return version
+
+
+def staff_slots(staff_id, start_date, days):
+    """
+    Créneaux libres d'un médecin (cf. compute_slots), mis en cache.
+    None si le médecin n'existe pas ou n'accepte pas les rendez-vous en ligne.
+    """
+    cache_key = f'slots:{staff_id}:{slots_version(staff_id)}:{start_date.isoformat()}:{days}'
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached['slots']
+
+    staff = Staff.objects.filter(pk=staff_id, accepts_appointments=True, is_visible=True).first()
+    slots = compute_slots(staff, start_date, days) if staff else None
+    cache.set(cache_key, {'slots': slots}, getattr(settings, 'SLOTS_CACHE_TIMEOUT', 300))
+    return slots
+
+
+def available_slots(start_date, days, staff_id=None, service_id=None):
+    """
+    Réponse de l'API des créneaux : ceux du médecin choisi, ou à défaut
+    l'union des créneaux des médecins du service (« pas de préférence »).
+
+    ``scheduled`` est faux quand aucun médecin concerné n'a de plage
+    hebdomadaire : le formulaire garde alors sa grille horaire générique.
+    """
+    if staff_id:
+        staff_ids = [staff_id]
+    else:
+        staff_ids = list(Staff.objects.filter(
+            services__id=service_id, accepts_appointments=True, is_visible=True
+        ).values_list('id', flat=True))
+
+    scheduled_ids = set(StaffSchedule.objects.filter(
+        staff_id__in=staff_ids, is_active=True
+    ).values_list('staff_id', flat=True))
+
+    days_slots = {}
+    for sid in staff_ids:
+        if sid not in scheduled_ids:
+            continue
+        for day, times in (staff_slots(sid, start_date, days) or {}).items():
+            days_slots.setdefault(day, set()).update(times)
+
+    return {
+        'scheduled': bool(scheduled_ids),
+        'days': {day: sorted(times) for day, times in sorted(days_slots.items())},
+    }
+
+
+def parse_query(params):
+    """
+    Paramètres de l'API (GET) : staff_id ou service_id, start (AAAA-MM-JJ,
+    aujourd'hui par défaut), days (SLOTS_DAYS_AHEAD au plus).
+    None si les paramètres sont absents ou invalides.
+    """
+    max_days = getattr(settings, 'SLOTS_DAYS_AHEAD', 14)
+    try:
+        staff_id = int(params['staff_id']) if params.get('staff_id') else None
+        service_id = int(params['service_id']) if params.get('service_id') else None
+        start_date = date.fromisoformat(params['start']) if params.get('start') else date.today()
+        days = min(max(int(params.get('days') or max_days), 1), max_days)
+    except ValueError:
+        return None
+    if not (staff_id or service_id):
+        return None
+    # Pas de créneau dans le passé ni au-delà de l'horizon de réservation
+    start_date = max(start_date, date.today())
+    if start_date > date.today() + timedelta(days=max_days):
+        return None
+    return {'start_date': start_date, 'days': days, 'staff_id': staff_id, 'service_id': service_id}
+
+
+def is_slot_available(when, staff=None, service=None):
+    """
+    Vérification à l'enregistrement, sans cache : ``when`` est un créneau
+    libre du médecin choisi, ou d'au moins un médecin du service.
+    """
+    if staff is not None:
+        candidates = [staff]
+    else:
+        candidates = list(Staff.objects.filter(services=service, accepts_appointments=True, is_visible=True))
+    scheduled_ids = set(StaffSchedule.objects.filter(
+        staff__in=candidates, is_active=True
+    ).values_list('staff_id', flat=True))
+    if not scheduled_ids:
+        # Pas de planning saisi : demande libre, arbitrée par le secrétariat
+        return True
+
+    day, slot = when.date().isoformat(), when.strftime('%H:%M')
+    return any(
+        slot in compute_slots(candidate, when.date(), 1).get(day, [])
+        for candidate in candidates if candidate.pk in scheduled_ids
+    )
+
+
+def has_conflict(staff_id, start, duration):
+    """Un rendez-vous en cours du médecin chevauche [start, start + duration)"""
+    end = start + timedelta(minutes=duration)
+    # Index (staff, appointment_date) : seule la plage de dates utile est lue
+    booked = Appointment.objects.filter(
+        staff_id=staff_id,
+        status__in=BUSY_STATUSES,
+        appointment_date__gte=start - timedelta(days=1),
+        appointment_date__lt=end,
+    ).values_list('appointment_date', 'duration')
+    busy = BusyIntervals((date, date + timedelta(minutes=length or 30)) for date, length in booked)
+    return busy.overlaps(start, end)
+
+
+def book_appointment(appointment):
+    """
+    Enregistre ``appointment`` sur un créneau libre, ou lève SlotUnavailable.
+
+    Sans médecin choisi, le premier médecin libre du service (ayant un
+    planning) est attribué. Les lignes Staff concernées sont verrouillées
+    dans l'ordre des clés (pas d'interblocage) jusqu'à la fin de la
+    transaction : une autre réservation pour ces médecins attend, puis voit
+    ce rendez-vous.
+    """
+    when = appointment.appointment_date
+    with transaction.atomic():
+        if appointment.staff_id:
+            staff_ids = [appointment.staff_id]
+        else:
+            staff_ids = list(StaffSchedule.objects.filter(
+                is_active=True,
+                staff__services=appointment.service_id,
+                staff__accepts_appointments=True,
+                staff__is_visible=True,
+            ).values_list('staff_id', flat=True).distinct())
+            if not staff_ids:
+                # Pas de planning dans ce service : demande libre, attribuée par le secrétariat
+                appointment.save()
+                return appointment
+
+        # Garantie : le verrou FOR UPDATE sur les lignes Staff. Une réservation
+        # concurrente pour l'un de ces médecins attend ici la fin de cette
+        # transaction. Les rendez-vous ne sont lus qu'une fois les verrous
+        # obtenus, en READ COMMITTED (défaut du backend MySQL de Django) : chaque
+        # requête voit les réservations validées avant elle. La liste des
+        # candidats (lue sans verrou) ne fait que choisir les lignes à verrouiller.
+        candidates = list(Staff.objects.select_for_update().filter(pk__in=staff_ids).order_by('pk'))
+        scheduled_ids = set(StaffSchedule.objects.filter(
+            staff_id__in=staff_ids, is_active=True
+        ).values_list('staff_id', flat=True))
+
+        for staff in candidates:
+            duration = staff.consultation_duration or appointment.duration
+            if staff.pk in scheduled_ids:
+                free = when.strftime('%H:%M') in compute_slots(staff, when.date(), 1).get(when.date().isoformat(), [])
+            else:
+                free = not has_conflict(staff.pk, when, duration)
+            if free:
+                appointment.staff = staff
+                appointment.duration = duration
+                appointment.save()
+                return appointment
+    raise SlotUnavailable
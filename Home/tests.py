@@ -1,3 +1,493 @@
-from django.test import TestCase
+import json
+from datetime import date, datetime, time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+import fakeredis
+
+from core.metrics import get_registry
+from core.ratelimit import SlidingWindowLimiter, TokenBucketLimiter, get_token_bucket
+from core.reputation import IPReputation, get_reputation
+
+from . import antispam, async_views, exports
+from .models import (
+    Appointment, Campaign, CampaignRegistration, ContactMessage, Service, Staff, StaffSchedule,
+)
+from .slots import (
+    BusyIntervals, SlotUnavailable, book_appointment, compute_slots, has_conflict, merge_intervals,
+)
+
+
+# ========================================
+# SEAU À JETONS : IP DU CLIENT (core.middleware)
+# ========================================
+@override_settings(
+    TRUSTED_PROXY_COUNT=1,
+    IP_REPUTATION_ENABLED=False,
+    THROTTLE_ENABLED=True,
+    THROTTLE_RULES={'default': {'capacity': 3, 'rate': '3/m'}},
+)
+class ThrottleClientIPTests(TestCase):
+    """Le seau est indexé sur l'entrée ajoutée par le proxy, pas sur celles du client"""
+
+    def setUp(self):
+        cache.clear()
+        get_token_bucket().local.clear()
+
+    def get(self, forwarded_for):
+        return self.client.get('/robots.txt', HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+    def test_fixed_address_is_throttled(self):
+        codes = [self.get('198.51.100.1') for _ in range(5)]
+        self.assertEqual(codes, [200, 200, 200, 429, 429])
+
+    def test_rotating_forged_entry_does_not_escape(self):
+        codes = [self.get(f'1.2.3.{n}, 198.51.100.2') for n in range(5)]
+        self.assertEqual(codes.count(429), 2)
+
+    def test_forged_internal_ip_is_not_exempt(self):
+        codes = [self.get('127.0.0.1, 198.51.100.3') for _ in range(5)]
+        self.assertIn(429, codes)
+
+
+# ========================================
+# MOTEURS REDIS : SCRIPTS LUA ET RÉPUTATION (core.ratelimit, core.reputation)
+# ========================================
+# Alias 'redis' : django-redis sur un serveur fakeredis (scripts Lua via lupa)
+REDIS_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://fakeredis:6379/0',
+        'OPTIONS': {
+            'CONNECTION_POOL_KWARGS': {
+                'connection_class': fakeredis.FakeConnection, 'server': fakeredis.FakeServer(),
+            },
+        },
+    },
+}
+
+
+@override_settings(CACHES=REDIS_CACHES)
+class RedisTestCase(TestCase):
+    """Redis vidé à chaque test ; horloge des moteurs fixée par ``clock``"""
+
+    def setUp(self):
+        self.redis = get_redis_connection('redis')
+        self.redis.flushdb()
+
+    def clock(self, module, now):
+        patcher = mock.patch(f'{module}.time')
+        patcher.start().time.return_value = now
+        self.addCleanup(patcher.stop)
+
+
+class TokenBucketTests(RedisTestCase):
+
+    def consume(self, limiter, now):
+        self.clock('core.ratelimit', now)
+        return limiter.consume('api', '198.51.100.1', 3, '60/m')
+
+    def test_bucket_empties_then_refills(self):
+        limiter = TokenBucketLimiter('redis')
+        self.assertEqual([self.consume(limiter, 1000) for _ in range(4)], [0, 0, 0, 1.0])
+        # 1 jeton par seconde : deux jetons après deux secondes
+        self.assertEqual([self.consume(limiter, 1002) for _ in range(3)], [0, 0, 1.0])
+        self.assertTrue(self.redis.exists(caches['redis'].make_key('tb:api:198.51.100.1')))
+
+    def test_bucket_is_shared_between_workers(self):
+        # Deux processus : seaux locaux distincts, seau global commun (Lua)
+        first, second = TokenBucketLimiter('redis'), TokenBucketLimiter('redis')
+        self.assertEqual([self.consume(first, 1000), self.consume(first, 1000)], [0, 0])
+        self.assertEqual(self.consume(second, 1000), 0)
+        self.assertEqual(self.consume(second, 1000), 1.0)
+        self.assertEqual(self.consume(second, 1001), 0)
+
+    def test_redis_error_falls_back_to_local_bucket(self):
+        limiter = TokenBucketLimiter('redis')
+        self.consume(limiter, 1000)
+        with mock.patch.object(limiter, '_script', side_effect=ConnectionError):
+            self.assertEqual([self.consume(limiter, 1000) for _ in range(3)], [0, 0, 1.0])
+
+
+class SlidingWindowTests(RedisTestCase):
+    PERIOD = 60
+
+    def hit(self, limiter, now):
+        self.clock('core.ratelimit', now)
+        return limiter.hit('contact', '198.51.100.1', '2/m').limited
+
+    def test_limit_then_window_expiry(self):
+        limiter = SlidingWindowLimiter('redis')
+        start = 1000 * self.PERIOD
+        self.assertEqual([self.hit(limiter, start) for _ in range(3)], [False, False, True])
+        # Milieu de la fenêtre suivante : la précédente pèse encore 2 * 1/2
+        self.assertEqual([self.hit(limiter, start + 90) for _ in range(2)], [False, True])
+        # Deux fenêtres plus tard : compteurs oubliés
+        self.assertEqual([self.hit(limiter, start + 180) for _ in range(3)], [False, False, True])
+
+    def test_window_key_expires_after_two_periods(self):
+        limiter = SlidingWindowLimiter('redis')
+        self.hit(limiter, 1000 * self.PERIOD)
+        key = caches['redis'].make_key(f'rl:contact:198.51.100.1:{self.PERIOD}:1000')
+        self.assertEqual(self.redis.get(key), b'1')
+        self.assertEqual(self.redis.ttl(key), 2 * self.PERIOD)
+
+
+class IPReputationTests(RedisTestCase):
+
+    def reputation(self):
+        return IPReputation('redis', threshold=2, ban_steps=(60, 600))
+
+    def strike(self, reputation, now, times=2):
+        self.clock('core.reputation', now)
+        return [reputation.flag('198.51.100.1', 'ratelimit') for _ in range(times)]
+
+    def test_ban_duration_escalates(self):
+        reputation = self.reputation()
+        self.assertEqual(self.strike(reputation, 1000), [0, 1060])
+        self.assertEqual(self.strike(reputation, 2000), [0, 2600])
+        # Dernier palier atteint : il est réutilisé
+        self.assertEqual(self.strike(reputation, 5000), [0, 5600])
+
+    def test_ban_is_shared_between_workers(self):
+        self.strike(self.reputation(), 1000)
+        other = self.reputation()
+        self.assertEqual(other.banned_until('198.51.100.1'), 1060)
+        other.unban('198.51.100.1')
+        self.assertEqual(self.reputation().banned_until('198.51.100.1'), 0)
+
+
+# ========================================
+# MIDDLEWARE DE SÉCURITÉ EN ASGI (core.middleware)
+# ========================================
+@override_settings(
+    TRUSTED_PROXY_COUNT=1,
+    RATELIMIT_USE_CACHE='redis',
+    IP_REPUTATION_CACHE='redis',
+    IP_REPUTATION_ENABLED=True,
+    IP_REPUTATION_THRESHOLD=2,
+    IP_REPUTATION_WEIGHTS={'attack': 2},
+    ATTACK_DETECTION_BLOCK=True,
+    THROTTLE_ENABLED=True,
+    THROTTLE_RULES={'default': {'capacity': 2, 'rate': '2/m'}},
+)
+class AsyncSecurityMiddlewareTests(RedisTestCase):
+    """Pile asynchrone (AsyncClient) : process_view en coroutine, seaux et bans Redis"""
+
+    def setUp(self):
+        super().setUp()
+        for factory in (get_token_bucket, get_reputation):
+            factory.cache_clear()
+            self.addCleanup(factory.cache_clear)
+
+    async def get(self, path, forwarded_for):
+        return await self.async_client.get(path, headers={'x-forwarded-for': forwarded_for})
+
+    async def test_token_bucket_throttles(self):
+        codes = [(await self.get('/robots.txt', '198.51.100.1')).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        response = await self.get('/robots.txt', '198.51.100.1')
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual((await self.get('/robots.txt', '198.51.100.2')).status_code, 200)
+
+    async def test_attack_bans_the_ip(self):
+        self.assertEqual((await self.get('/.env', '198.51.100.3')).status_code, 403)
+        response = await self.get('/robots.txt', '198.51.100.3')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response['Retry-After'], '60')
+        # Ban lu dans Redis par un autre processus (LRU local vide)
+        self.assertTrue(IPReputation.from_settings().banned_until('198.51.100.3'))
+
+
+# ========================================
+# CRÉNEAUX ET RÉSERVATION (Home.slots)
+# ========================================
+MONDAY = date(2030, 1, 7)
+
+
+def at(hour, minute=0, day=MONDAY):
+    return datetime.combine(day, time(hour, minute))
+
+
+class IntervalTests(TestCase):
+
+    def test_merge_intervals(self):
+        merged = merge_intervals([(5, 7), (1, 3), (2, 4), (4, 5), (9, 10)])
+        self.assertEqual(merged, [[1, 7], [9, 10]])
+
+    def test_overlaps_is_half_open(self):
+        busy = BusyIntervals([(10, 20), (30, 40)])
+        self.assertTrue(busy.overlaps(15, 16))
+        self.assertTrue(busy.overlaps(5, 11))
+        self.assertTrue(busy.overlaps(39, 45))
+        self.assertFalse(busy.overlaps(20, 30))
+        self.assertFalse(busy.overlaps(0, 10))
+        self.assertFalse(busy.overlaps(40, 50))
+
+
+@override_settings(SLOTS_MIN_NOTICE=60)
+class SlotsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name="Cardiologie", short_description="Cœur")
+        self.first = self.create_staff("Alpha")
+        self.second = self.create_staff("Beta")
+
+    def create_staff(self, last_name, schedule=(time(9), time(11))):
+        staff = Staff.objects.create(
+            last_name=last_name, speciality="Cardiologue", photo='staff/test.jpg',
+            accepts_appointments=True, consultation_duration=30,
+        )
+        staff.services.add(self.service)
+        if schedule:
+            StaffSchedule.objects.create(staff=staff, weekday=MONDAY.weekday(),
+                                         start_time=schedule[0], end_time=schedule[1])
+        return staff
+
+    def appointment(self, when, staff=None, save=False, **fields):
+        appointment = Appointment(
+            patient_name="Patient", patient_email='patient@example.test', patient_phone='0600000000',
+            service=self.service, staff=staff, appointment_date=when, reason="Consultation", **fields
+        )
+        if save:
+            appointment.save()
+        return appointment
+
+
+class ComputeSlotsTests(SlotsTestCase):
+
+    def test_slots_follow_weekly_schedule(self):
+        slots = compute_slots(self.first, MONDAY, 2, now=at(0))
+        # Mardi sans plage : omis
+        self.assertEqual(slots, {'2030-01-07': ['09:00', '09:30', '10:00', '10:30']})
+
+    def test_busy_appointments_are_removed(self):
+        self.appointment(at(9, 30), self.first, save=True, duration=45)
+        self.appointment(at(9), self.first, save=True, status='cancelled')
+        slots = compute_slots(self.first, MONDAY, 1, now=at(0))
+        self.assertEqual(slots['2030-01-07'], ['09:00', '10:30'])
+
+    def test_min_notice(self):
+        slots = compute_slots(self.first, MONDAY, 1, now=at(8, 45))
+        self.assertEqual(slots['2030-01-07'], ['10:00', '10:30'])
+
+
+class StaffByServiceTests(SlotsTestCase):
+
+    def staff_names(self):
+        request = RequestFactory().get('/api/staff-by-service/', {'service_id': self.service.pk})
+        response = async_to_sync(async_views.get_staff_by_service)(request)
+        return [staff['name'] for staff in json.loads(response.content)['staff']]
+
+    def test_async_view_reflects_staff_changes_immediately(self):
+        self.assertEqual(sorted(self.staff_names()), ['Alpha', 'Beta'])
+        Staff.objects.filter(pk=self.second.pk).update(is_visible=False)
+        self.assertEqual(self.staff_names(), ['Alpha'])
+
+
+class BookAppointmentTests(SlotsTestCase):
+
+    def test_has_conflict(self):
+        self.appointment(at(9), self.first, save=True)
+        self.assertTrue(has_conflict(self.first.pk, at(9, 15), 30))
+        self.assertFalse(has_conflict(self.first.pk, at(9, 30), 30))
+        self.assertFalse(has_conflict(self.second.pk, at(9), 30))
+
+    def test_same_slot_cannot_be_booked_twice(self):
+        booked = book_appointment(self.appointment(at(9), self.first))
+        self.assertEqual((booked.staff, booked.duration), (self.first, 30))
+        with self.assertRaises(SlotUnavailable):
+            book_appointment(self.appointment(at(9), self.first))
+        self.assertEqual(Appointment.objects.filter(appointment_date=at(9)).count(), 1)
+
+    def test_slot_outside_schedule_is_refused(self):
+        with self.assertRaises(SlotUnavailable):
+            book_appointment(self.appointment(at(11), self.first))
+
+    def test_no_preference_assigns_a_free_doctor(self):
+        first = book_appointment(self.appointment(at(10)))
+        second = book_appointment(self.appointment(at(10)))
+        self.assertEqual({first.staff, second.staff}, {self.first, self.second})
+        with self.assertRaises(SlotUnavailable):
+            book_appointment(self.appointment(at(10)))
+
+    def test_doctor_without_schedule_only_checks_conflicts(self):
+        free = self.create_staff("Gamma", schedule=None)
+        book_appointment(self.appointment(at(15), free))
+        with self.assertRaises(SlotUnavailable):
+            book_appointment(self.appointment(at(15, 15), free))
+
+
+# ========================================
+# EXPORTS CSV (Home.exports)
+# ========================================
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+
+    def setUp(self):
+        for index in range(5):
+            ContactMessage.objects.create(
+                name=f"Expéditeur {index}", email=f'user{index}@example.test', phone='0600000000',
+                subject='info', message="=SOMME(A1:A2)" if index == 0 else "Bonjour",
+            )
+        self.queryset = ContactMessage.objects.all()
+
+    def test_batches_are_keyset_pages(self):
+        # Paquets de 2, 2 puis 1 : une requête par paquet, aucune de plus
+        with self.assertNumQueries(3):
+            sizes = [len(batch) for batch in exports.batches('messages', self.queryset)]
+        self.assertEqual(sizes, [2, 2, 1])
+        ids = [row[0] for row in exports.rows('messages', self.queryset)]
+        self.assertEqual(ids, sorted(self.queryset.values_list('pk', flat=True)))
+
+    def test_async_stream_matches_sync_stream(self):
+        sync_body = ''.join(exports.stream_csv('messages', self.queryset))
+
+        async def consume():
+            return ''.join([chunk async for chunk in exports.astream_csv('messages', self.queryset)])
+
+        self.assertEqual(async_to_sync(consume)(), sync_body)
+        lines = sync_body.splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[0].startswith('\ufeffN°;'))
+        self.assertIn(";'=SOMME(A1:A2)", lines[1])
+
+
+# ========================================
+# ADMIN DES CAMPAGNES : INSCRIPTIONS
+# ========================================
+# Sans axes : son journal d'audit est écrit par un thread hors de la transaction du test
+@override_settings(AXES_ENABLED=False)
+class CampaignAdminTests(TestCase):
+
+    def setUp(self):
+        self.campaign = Campaign.objects.create(
+            title="Dépistage", slug='depistage', banner_image='campaigns/test.jpg',
+            short_description="Dépistage", start_date=date(2030, 1, 7), end_date=date(2030, 1, 8),
+            location="HRAE",
+        )
+        CampaignRegistration.objects.bulk_create(
+            CampaignRegistration(campaign=self.campaign, full_name=f"Inscrit {index}",
+                                 email=f'inscrit{index}@example.test', phone='0600000000')
+            for index in range(30)
+        )
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.test', 'password')
+        self.client.force_login(user)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_registrations_panel_query_count_does_not_grow_with_rows(self):
+        queries = self.queries(f'/fr/admin/Home/campaign/{self.campaign.pk}/registrations/')
+        self.assertLess(len(queries), 10)
+
+    def test_registration_total_only_on_changelist(self):
+        count = 'COUNT("Home_campaignregistration"'
+        self.assertTrue(any(count in sql for sql in self.queries('/fr/admin/Home/campaign/')))
+        change = self.queries(f'/fr/admin/Home/campaign/{self.campaign.pk}/change/')
+        self.assertFalse(any(count in sql and 'GROUP BY' in sql for sql in change))
+
+
+# ========================================
+# FILTRE ANTI-ROBOTS : JETON À USAGE UNIQUE (Home.antispam)
+# ========================================
+@override_settings(
+    ANTISPAM_ENABLED=True, ANTISPAM_MIN_SECONDS=0,
+    IP_REPUTATION_ENABLED=False, THROTTLE_ENABLED=False,
+)
+class AntiSpamTokenTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, token, message):
+        return self.client.post('/fr/contact/', {
+            'name': "Visiteur", 'email': 'visiteur@example.test', 'phone': '0600000000',
+            'subject': 'info', 'message': message, antispam.TOKEN_FIELD: token,
+        })
+
+    def test_token_is_consumed_after_save(self):
+        token = antispam.issue_token('contact')
+        self.assertEqual(self.post(token, "Premier message").status_code, 302)
+        # Rejoué avec un autre contenu : même réponse, rien n'est enregistré
+        self.assertEqual(self.post(token, "Second message").status_code, 302)
+        self.assertEqual(list(ContactMessage.objects.values_list('message', flat=True)), ["Premier message"])
+        self.assertEqual(self.post(antispam.issue_token('contact'), "Second message").status_code, 302)
+        self.assertEqual(ContactMessage.objects.count(), 2)
+
+    def test_same_token_twice_is_a_replay(self):
+        # Aucun enregistrement entre les deux envois : la réservation suffit
+        token = antispam.issue_token('contact')
+        first = {antispam.TOKEN_FIELD: token, 'message': "Bonjour"}
+        second = {antispam.TOKEN_FIELD: token, 'message': "Autre contenu"}
+        self.assertIsNone(antispam.rejection('contact', first, ['message']))
+        self.assertEqual(antispam.rejection('contact', second, ['message']), 'replayed')
+
+    def test_same_content_twice_is_a_duplicate(self):
+        def data():
+            return {antispam.TOKEN_FIELD: antispam.issue_token('contact'), 'message': "Bonjour"}
+        self.assertIsNone(antispam.rejection('contact', data(), ['message']))
+        self.assertEqual(antispam.rejection('contact', data(), ['message']), 'duplicate')
+
+    def test_release_frees_token_and_content(self):
+        data = {antispam.TOKEN_FIELD: antispam.issue_token('contact'), 'message': "Bonjour"}
+        self.assertIsNone(antispam.rejection('contact', data, ['message']))
+        antispam.release('contact', data, ['message'])
+        self.assertIsNone(antispam.rejection('contact', data, ['message']))
+
+    def test_invalid_form_can_be_resent_with_same_token(self):
+        token = antispam.issue_token('contact')
+        response = self.client.post('/fr/contact/', {
+            'name': "Visiteur", 'email': 'pas-un-email', 'phone': '0600000000',
+            'subject': 'info', 'message': "Bonjour", antispam.TOKEN_FIELD: token,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.post(token, "Bonjour").status_code, 302)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+
+# ========================================
+# MÉTRIQUES PROMETHEUS (core.metrics)
+# ========================================
+@override_settings(
+    METRICS_ENABLED=True, METRICS_ALLOWED_IPS=['198.51.100.7'], TRUSTED_PROXY_COUNT=1,
+    IP_REPUTATION_ENABLED=False, THROTTLE_ENABLED=False,
+)
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        get_registry().reset()
+
+    def scrape(self, forwarded_for):
+        return self.client.get('/metrics', HTTP_X_FORWARDED_FOR=forwarded_for)
+
+    def test_unknown_methods_share_one_label(self):
+        for method in ('PROPFIND', 'FOO1', 'FOO2'):
+            self.client.generic(method, '/robots.txt')
+        self.client.get('/robots.txt')
+        body = self.scrape('198.51.100.7').content.decode()
+        self.assertIn('method="other"', body)
+        self.assertIn('method="GET"', body)
+        for method in ('PROPFIND', 'FOO1', 'FOO2'):
+            self.assertNotIn(f'method="{method}"', body)
+
+    def test_scraper_ip_is_the_trusted_proxy_hop(self):
+        self.assertEqual(self.scrape('203.0.113.1, 198.51.100.7').status_code, 200)
+        # Entrée ajoutée par le client : ignorée
+        self.assertEqual(self.scrape('198.51.100.7, 203.0.113.1').status_code, 403)
+
+    @override_settings(TRUSTED_PROXY_COUNT=2)
+    def test_scraper_ip_follows_trusted_proxy_count(self):
+        # Deux proxys (ex. : répartiteur puis Nginx) : la même IP que les seaux à jetons
+        self.assertEqual(self.scrape('198.51.100.7, 10.0.0.2').status_code, 200)
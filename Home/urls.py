@@ -1,27 +1,34 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Déploiement ASGI : pages en lecture seule servies par les vues asynchrones
+if getattr(settings, 'ASYNC_VIEWS_ENABLED', False):
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
     # Page d'accueil
-    path('', views.index, name='home'),
+    path('', read_views.index, name='home'),
 
     # À propos
     path('a-propos/', views.about_us, name='about'),
 
     # Services
     path('services/', views.our_services, name='services'),
-    path('services/<slug:service_slug>/', views.service_detail, name='service_detail'),
+    path('services/<slug:service_slug>/', read_views.service_detail, name='service_detail'),
 
     # Équipe médicale
     path('equipe/', views.our_team, name='team'),
-    path('equipe/<int:doctor_id>/', views.doctor_detail, name='doctor_detail'),
+    path('equipe/<int:doctor_id>/', read_views.doctor_detail, name='doctor_detail'),
 
     # Actualités
-    path('actualites/', views.news, name='news'),
+    path('actualites/', read_views.news, name='news'),
     path('actualites/<int:news_id>/', views.news_detail, name='news_detail'),
 
     # Campagnes de santé
-    path('campagnes/', views.health_campaigns, name='health_campaigns'),
+    path('campagnes/', read_views.health_campaigns, name='health_campaigns'),
     path('campagnes/<int:campaign_id>/', views.campaign_detail, name='campaign_detail'),
 
     # Partenaires
@@ -31,7 +38,7 @@ urlpatterns = [
     path('temoignages/', views.testimonials_list, name='testimonials'),
     
     # Informations pratiques
-    path('informations-pratiques/', views.practical_info, name='practical_info'),
+    path('informations-pratiques/', read_views.practical_info, name='practical_info'),
     
     # Contact
     path('contact/', views.contact_us, name='contact_us'),
@@ -43,5 +50,6 @@ urlpatterns = [
     path('rendez-vous/confirmation/', views.appointment_success, name='appointment_success'),
     
     # API AJAX
-    path('api/staff-by-service/', views.get_staff_by_service, name='api_staff_by_service'),
+    path('api/staff-by-service/', read_views.get_staff_by_service, name='api_staff_by_service'),
+    path('api/available-slots/', read_views.get_available_slots, name='api_available_slots'),
 ]
\ No newline at end of file
@@ -1,21 +1,35 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
 from django.http import JsonResponse
 from django.utils import timezone
-import django_ratelimit
 from .models import (
-    SiteSettings, PatientJourneySection, Page, Service, Grade, Staff, Article, Category,
-    Campaign, Partner, Appointment, ContactMessage, Testimonial, DirectionMember
+    SiteSettings, PatientJourneySection, Page, Service, Staff, Article,
+    Campaign, Partner, Testimonial, DirectionMember
 )
 from .forms import AppointmentForm, CampaignRegistrationForm, ContactMessageForm
+from . import antispam, notifications, reference_data, slots
 
-from itertools import chain
-from django_ratelimit.decorators import ratelimit
+from core import metrics
+from core.error_pages import error_response
+from core.middleware import get_client_ip
+from core.ratelimit import ratelimit
 import logging
 logger = logging.getLogger(__name__)
 
+# Messages de confirmation, aussi renvoyés aux envois rejetés par le filtre anti-robots
+CONTACT_SUCCESS_MESSAGE = (
+    'Votre message a été envoyé avec succès. '
+    'Nous vous répondrons dans les plus brefs délais.'
+)
+CAMPAIGN_SUCCESS_MESSAGE = 'Inscription confirmée ! Nous vous contacterons bientôt.'
+APPOINTMENT_SUCCESS_MESSAGE = (
+    'Votre demande de rendez-vous a été envoyée avec succès. '
+    'Nous vous contacterons bientôt pour confirmation.'
+)
+
 
 # ========================================
 # 🛡️ GESTION DES ERREURS RATE LIMIT
@@ -23,18 +37,17 @@ logger = logging.getLogger(__name__)
 def rate_limit_exceeded(request, exception=None):
     """
     Vue personnalisée appelée quand un utilisateur dépasse les limites.
-    Retourne une page 429 élégante avec informations.
+    Retourne la page 429 pré-rendue (core.error_pages, sans requête SQL).
     """
-    # Logger l'événement
+    # Logger l'événement (IP ajoutée par le proxy de confiance, celle des limites)
+    ip = get_client_ip(request)
+    user = str(request.user) if request.user.is_authenticated else 'Anonymous'
     logger.warning(
-        f"Rate limit exceeded - IP: {request.META.get('REMOTE_ADDR')} - "
-        f"Path: {request.path} - User: {request.user if request.user.is_authenticated else 'Anonymous'}"
+        "Rate limit exceeded - IP: %s - Path: %s - User: %s", ip, request.path, user,
+        extra={'event': 'rate_limit', 'ip': ip, 'path': request.path, 'user': user},
     )
-    
-    settings = SiteSettings.get_settings()
-    return render(request, 'errors/429.html', {
-        'settings': settings,
-    }, status=429)
+
+    return error_response(429)
 
 def index(request):
     # Services pour page d'accueil (max 6)
@@ -154,7 +167,6 @@ def our_services(request):
     return render(request, 'Home/services.html', context)
 
 
-from django.core.paginator import Paginator
 def our_team(request):
     """Liste du personnel médical"""
     settings = SiteSettings.get_settings()
@@ -196,14 +208,13 @@ def our_team(request):
     page_number = request.GET.get('page', 1)
     staff = paginator.get_page(page_number)
 
-    services = Service.objects.filter(is_active=True).exclude(slug='direction')
-
     context = {
         'settings': settings,
         'direction_staff': direction_staff,
         'staff': staff,
-        'services': services,
-        'grades': Grade.objects.filter(is_active=True),
+        # Listes des filtres en cache (Home/reference_data.py)
+        'services': reference_data.team_services(),
+        'grades': reference_data.grades(),
         'titles': Staff.TITLE_CHOICES,
         'qualities': Staff.QUALITY_CHOICES,
     }
@@ -240,13 +251,11 @@ def news(request):
     campaigns = campaigns_paginator.get_page(campaigns_page)
     articles = articles_paginator.get_page(articles_page)
     
-    categories = Category.objects.all()
-    
     context = {
         'settings': settings,
         'campaigns': campaigns,
         'articles': articles,
-        'categories': categories,
+        'categories': reference_data.categories(),
     }
     return render(request, 'news/news.html', context)
 
@@ -314,23 +323,32 @@ def contact_us(request):
     
     if request.method == 'POST':
         form = ContactMessageForm(request.POST)
-        if form.is_valid():
+        # Filtre anti-robots avant toute validation ou écriture (Home/antispam.py)
+        spam = form.spam_reason()
+        if spam == 'expired':
+            metrics.inc('hrae_form_submissions_total', {'form': 'contact', 'result': 'expired'})
+            form.add_error(None, antispam.EXPIRED_MESSAGE)
+            messages.error(request, antispam.EXPIRED_MESSAGE)
+        elif spam:
+            # Même réponse qu'un envoi réussi : rien n'est enregistré
+            antispam.log_rejection(request, 'contact', spam)
+            messages.success(request, CONTACT_SUCCESS_MESSAGE)
+            return redirect('contact_us')
+        elif form.is_valid():
             message = form.save(commit=False)
-            # Capturer l'adresse IP
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            if x_forwarded_for:
-                message.ip_address = x_forwarded_for.split(',')[0]
-            else:
-                message.ip_address = request.META.get('REMOTE_ADDR')
-            message.save()
+            # Capturer l'adresse IP (entrée ajoutée par le proxy de confiance)
+            message.ip_address = get_client_ip(request)
+            # Message et notifications (Home/notifications.py) dans la même transaction
+            with transaction.atomic():
+                message.save()
+                notifications.contact_received(message)
+            metrics.inc('hrae_form_submissions_total', {'form': 'contact', 'result': 'success'})
             
-            messages.success(
-                request, 
-                'Votre message a été envoyé avec succès. '
-                'Nous vous répondrons dans les plus brefs délais.'
-            )
+            messages.success(request, CONTACT_SUCCESS_MESSAGE)
             return redirect('contact_us')
         else:
+            form.release_submission()
+            metrics.inc('hrae_form_submissions_total', {'form': 'contact', 'result': 'invalid'})
             messages.error(request, 'Veuillez corriger les erreurs ci-dessous.')
     else:
         form = ContactMessageForm()
@@ -398,14 +416,28 @@ def campaign_detail(request, campaign_id):
     campaign = get_object_or_404(Campaign, id=campaign_id)
     
     if request.method == 'POST' and campaign.registration_enabled:
-        form = CampaignRegistrationForm(request.POST)
-        if form.is_valid():
+        form = CampaignRegistrationForm(request.POST, antispam_scope=campaign.id)
+        spam = form.spam_reason()
+        if spam == 'expired':
+            metrics.inc('hrae_form_submissions_total', {'form': 'campaign_registration', 'result': 'expired'})
+            form.add_error(None, antispam.EXPIRED_MESSAGE)
+            messages.error(request, antispam.EXPIRED_MESSAGE)
+        elif spam:
+            antispam.log_rejection(request, 'campaign_registration', spam)
+            messages.success(request, CAMPAIGN_SUCCESS_MESSAGE)
+            return redirect('campaign_detail', campaign_id=campaign.id)
+        elif form.is_valid():
             registration = form.save(commit=False)
             registration.campaign = campaign
-            registration.save()
-            messages.success(request, 'Inscription confirmée ! Nous vous contacterons bientôt.')
+            with transaction.atomic():
+                registration.save()
+                notifications.campaign_registered(registration)
+            metrics.inc('hrae_form_submissions_total', {'form': 'campaign_registration', 'result': 'success'})
+            messages.success(request, CAMPAIGN_SUCCESS_MESSAGE)
             return redirect('campaign_detail', campaign_id=campaign.id)
         else:
+            form.release_submission()
+            metrics.inc('hrae_form_submissions_total', {'form': 'campaign_registration', 'result': 'invalid'})
             messages.error(request, 'Veuillez corriger les erreurs ci-dessous.')
     else:
         form = CampaignRegistrationForm()
@@ -428,16 +460,34 @@ def appointment_create(request):
     
     if request.method == 'POST':
         form = AppointmentForm(request.POST)
-        if form.is_valid():
-            appointment = form.save()
-            
-            messages.success(
-                request, 
-                'Votre demande de rendez-vous a été envoyée avec succès. '
-                'Nous vous contacterons bientôt pour confirmation.'
-            )
+        spam = form.spam_reason()
+        if spam == 'expired':
+            metrics.inc('hrae_form_submissions_total', {'form': 'appointment', 'result': 'expired'})
+            form.add_error(None, antispam.EXPIRED_MESSAGE)
+            messages.error(request, antispam.EXPIRED_MESSAGE)
+        elif spam:
+            antispam.log_rejection(request, 'appointment', spam)
+            messages.success(request, APPOINTMENT_SUCCESS_MESSAGE)
             return redirect('appointment_success')
+        elif form.is_valid():
+            try:
+                # Vérification du créneau, enregistrement et notifications atomiques
+                with transaction.atomic():
+                    appointment = slots.book_appointment(form.save(commit=False))
+                    notifications.appointment_requested(appointment)
+            except slots.SlotUnavailable:
+                form.release_submission()
+                metrics.inc('hrae_form_submissions_total', {'form': 'appointment', 'result': 'conflict'})
+                form.add_error('appointment_date', "Ce créneau vient d'être réservé. Veuillez en choisir un autre.")
+                messages.error(request, 'Veuillez corriger les erreurs ci-dessous.')
+            else:
+                metrics.inc('hrae_form_submissions_total', {'form': 'appointment', 'result': 'success'})
+
+                messages.success(request, APPOINTMENT_SUCCESS_MESSAGE)
+                return redirect('appointment_success')
         else:
+            form.release_submission()
+            metrics.inc('hrae_form_submissions_total', {'form': 'appointment', 'result': 'invalid'})
             messages.error(request, 'Veuillez corriger les erreurs ci-dessous.')
     else:
         form = AppointmentForm()
@@ -479,4 +529,12 @@ def get_staff_by_service(request):
             'speciality': staff['speciality']
         })
 
-    return JsonResponse({'staff': staff_list})
\ No newline at end of file
+    return JsonResponse({'staff': staff_list})
+
+
+def get_available_slots(request):
+    """API des créneaux libres d'un médecin ou d'un service (AJAX, Home/slots.py)"""
+    query = slots.parse_query(request.GET)
+    if query is None:
+        return JsonResponse({'scheduled': False, 'days': {}})
+    return JsonResponse(slots.available_slots(**query))
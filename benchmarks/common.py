@@ -0,0 +1,175 @@
+"""
+Outils communs aux scripts de benchmark HRAE (benchmarks/*.py)
+
+Les scripts se lancent depuis la racine du projet :
+    python benchmarks/<script>.py --help
+"""
+
+import os
+import statistics
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Environnement des serveurs lancés par les benchmarks : sans les protections
+# par IP, une charge locale serait surtout servie en pages 429
+BENCHMARK_ENV = {
+    'THROTTLE_ENABLED': 'False',
+    'IP_REPUTATION_ENABLED': 'False',
+    'SECURE_SSL_REDIRECT': 'False',
+}
+
+
+def setup_django(settings_module='core.settings'):
+    """Rend le projet importable et initialise Django"""
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def percentile(sorted_values, pct):
+    """Percentile par interpolation linéaire sur une liste déjà triée"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(latencies, elapsed=None):
+    """
+    Statistiques de latence (en millisecondes) pour une liste de durées en secondes
+    """
+    values = sorted(v * 1000 for v in latencies)
+    summary = {
+        'count': len(values),
+        'mean_ms': round(statistics.fmean(values), 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3) if values else 0.0,
+    }
+    if elapsed:
+        summary['throughput_rps'] = round(len(values) / elapsed, 1)
+    return summary
+
+
+def wait_until_ready(url, timeout=30):
+    """Attend qu'un serveur lancé en sous-processus réponde (n'importe quel statut)"""
+    import time
+    import urllib.error
+    import urllib.request
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return True
+        except urllib.error.HTTPError:
+            return True
+        except OSError:
+            time.sleep(0.3)
+    return False
+
+
+def run_load(base_url, paths, concurrency=10, duration=10.0, headers=None, timeout=10.0, by_path=None):
+    """
+    Charge HTTP simple : ``concurrency`` threads appellent ``paths`` en boucle
+    pendant ``duration`` secondes. Retourne (latences en secondes, statuts, durée).
+    Toutes les requêtes viennent de la même adresse : le serveur mesuré doit
+    tourner sans seaux à jetons ni réputation IP (cf. BENCHMARK_ENV).
+    Si ``by_path`` est un dict, il reçoit pour chaque chemin ses latences et
+    ses statuts : {chemin: {'latencies': [...], 'statuses': {...}}}.
+    """
+    import http.client
+    import itertools
+    import threading
+    import time
+    from urllib.parse import urlsplit
+
+    target = urlsplit(base_url)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+        request_headers = headers or {}
+        local_latencies, local_statuses, local_paths = [], {}, {}
+        # Décalage du point de départ : tous les threads ne frappent pas la même URL
+        for path in itertools.islice(itertools.cycle(paths), index % len(paths), None):
+            if time.perf_counter() >= deadline:
+                break
+            t0 = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=request_headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+                status = 'error'
+            latency = time.perf_counter() - t0
+            local_latencies.append(latency)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if by_path is not None:
+                entry = local_paths.setdefault(path, {'latencies': [], 'statuses': {}})
+                entry['latencies'].append(latency)
+                entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            for path, entry in local_paths.items():
+                merged = by_path.setdefault(path, {'latencies': [], 'statuses': {}})
+                merged['latencies'].extend(entry['latencies'])
+                for status, count in entry['statuses'].items():
+                    merged['statuses'][status] = merged['statuses'].get(status, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def check_not_throttled(statuses):
+    """
+    Réponses 429 : le serveur applique ses limites par IP, les latences
+    mesurées seraient celles des pages d'erreur. Retourne un message ou None.
+    """
+    throttled = statuses.get(429, 0)
+    if not throttled:
+        return None
+    return (
+        f"{throttled} réponse(s) 429 : mesures invalides. Lancer le serveur avec "
+        + ' '.join(f'{key}={value}' for key, value in BENCHMARK_ENV.items())
+        + " (ou --start)."
+    )
+
+
+
+def count_server_errors(statuses):
+    """Réponses 5xx et échecs de connexion ('error' : timeout, worker tué...)"""
+    return sum(count for status, count in statuses.items() if status == 'error' or status >= 500)
+
+
+def check_server_errors(statuses):
+    """
+    Réponses 5xx ou échecs de connexion : pages en erreur (template manquant,
+    exception, worker tué...), leurs latences ne mesurent pas la page.
+    Retourne un message ou None.
+    """
+    errors = count_server_errors(statuses)
+    if not errors:
+        return None
+    return f"{errors} réponse(s) 5xx ou échec(s) de connexion : mesures invalides."
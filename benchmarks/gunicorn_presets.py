@@ -0,0 +1,91 @@
+"""
+Benchmark : comparaison des préréglages gunicorn (gunicorn.conf.py)
+
+Pour chaque préréglage (sync, gthread, asgi), lance gunicorn sur un port
+local avec le même nombre de workers, attend qu'il réponde, applique une
+charge HTTP concurrente puis arrête le serveur. Affiche latences
+(p50/p95/p99), débit et statuts.
+
+Les serveurs tournent sans seaux à jetons ni réputation IP (BENCHMARK_ENV) ;
+une réponse 429 ou 5xx invalide la mesure et fait sortir la commande en erreur.
+
+Usage (base et Redis de l'environnement courant, cf. .env) :
+    python benchmarks/gunicorn_presets.py --workers 2 --concurrency 20 --duration 15
+    python benchmarks/gunicorn_presets.py --presets sync asgi --path /fr/ --path /fr/actualites/
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+
+from common import BASE_DIR, BENCHMARK_ENV, check_not_throttled, check_server_errors, run_load, summarize, wait_until_ready
+
+PRESETS = ('sync', 'gthread', 'asgi')
+
+
+def run_preset(preset, args):
+    env = {
+        **os.environ,
+        **BENCHMARK_ENV,
+        'GUNICORN_PRESET': preset,
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+        'GUNICORN_LOG_LEVEL': 'warning',
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', str(BASE_DIR / 'gunicorn.conf.py')],
+        cwd=BASE_DIR, env=env,
+    )
+    base_url = f'http://127.0.0.1:{args.port}'
+    try:
+        if not wait_until_ready(base_url + args.paths[0]):
+            raise RuntimeError(f"gunicorn ({preset}) n'a pas démarré")
+        # Échauffement : imports paresseux, connexions, caches
+        run_load(base_url, args.paths, concurrency=args.concurrency, duration=2)
+        latencies, statuses, elapsed = run_load(
+            base_url, args.paths, concurrency=args.concurrency, duration=args.duration
+        )
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return {'preset': preset, 'statuses': statuses, **summarize(latencies, elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--presets', nargs='+', choices=PRESETS, default=list(PRESETS))
+    parser.add_argument('--path', dest='paths', action='append', help="URL(s) à appeler (défaut : /fr/)")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+    args.paths = args.paths or ['/fr/']
+
+    results = []
+    for preset in args.presets:
+        result = run_preset(preset, args)
+        results.append(result)
+        print(
+            f"{preset:8} p50={result['p50_ms']:8.2f} ms  p95={result['p95_ms']:8.2f}  "
+            f"p99={result['p99_ms']:8.2f}  {result['throughput_rps']:8.1f} req/s  "
+            f"statuts={result['statuses']}"
+        )
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({'paths': args.paths, 'workers': args.workers, 'results': results}, fp, indent=2, default=str)
+
+    errors = [f"{result['preset']} : {error}" for result in results
+              for check in (check_not_throttled, check_server_errors)
+              if (error := check(result['statuses']))]
+    if errors:
+        sys.exit('\n'.join(errors))
+
+
+if __name__ == '__main__':
+    main()
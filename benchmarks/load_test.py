@@ -0,0 +1,335 @@
+"""
+Benchmark de charge : toutes les URL publiques du site
+
+Les routes sont découvertes dans core/urls.py et Home/urls.py (résolveur
+Django), dans chaque langue de settings.LANGUAGES. Les paramètres (slug de
+service, id d'article...) sont pris dans la base. S'y ajoutent des variantes
+de recherche, de filtre et de pagination. L'admin (y compris les outils
+montés sous admin/ : profils, requêtes lentes), les vues POST et l'upload
+CKEditor sont exclus.
+
+Le résultat (latences p50/p95/p99 et débit, au global et par URL) est écrit
+en JSON avec le commit git courant, pour comparer deux branches :
+
+    python benchmarks/load_test.py --start gunicorn --output main.json
+    git checkout ma-branche
+    python benchmarks/load_test.py --start gunicorn --output ma-branche.json
+
+--start lance le serveur (runserver ou gunicorn.conf.py) sans seaux à
+jetons ni réputation IP (BENCHMARK_ENV), sur une base SQLite locale créée
+pour l'occasion : schéma, puis données de generate_fake_data (--data-args).
+--db-path conserve cette base pour les exécutions suivantes (elle n'est
+remplie qu'à la création). --db env utilise à la place la base configurée
+par l'environnement (DB_*, cf. .env) ou par --settings.
+
+Sans --start, le serveur de --base-url doit déjà tourner (sans limites par
+IP) et --settings doit désigner la même base (objets des routes à
+paramètres). Toute réponse 429 ou 5xx (ou échec de connexion) invalide la
+mesure : le rapport est écrit (routes en erreur dans 'server_errors'), la
+commande sort en erreur.
+
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --concurrency 50 --duration 60
+    python benchmarks/load_test.py --list
+"""
+
+import argparse
+import json
+import os
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import (
+    BASE_DIR, BENCHMARK_ENV, check_not_throttled, check_server_errors, count_server_errors, run_load,
+    setup_django, summarize, wait_until_ready,
+)
+
+# Routes non chargées : admin (namespace et outils sous admin/, redirigés
+# vers la connexion), POST uniquement, upload
+EXCLUDED_NAMES = {'set_language', 'ck_editor_5_upload_file'}
+EXCLUDED_NAMESPACES = {'admin'}
+EXCLUDED_PREFIXES = ('admin/',)
+
+# Variantes avec paramètres GET : {nom de route: [query strings]}
+QUERY_VARIANTS = {
+    'services': ['search=cardio', 'page=2'],
+    'team': ['search=a', 'page=2'],
+    'news': ['search=sant', 'articles_page=2', 'campaigns_page=2', 'category={category}'],
+    'api_staff_by_service': ['service_id={service}'],
+}
+
+
+def sample_kwargs():
+    """
+    Valeurs réelles pour les routes à paramètres, lues en base.
+    Une route dont l'objet n'existe pas est ignorée (signalée par --list).
+    """
+    from django.utils import timezone
+
+    from Home.models import Article, Campaign, Category, Service, Staff
+
+    samples = {}
+    service = Service.objects.filter(is_active=True).order_by('display_order').first()
+    if service:
+        samples['service_detail'] = {'service_slug': service.slug}
+    staff = Staff.objects.filter(is_visible=True).order_by('id').first()
+    if staff:
+        samples['doctor_detail'] = {'doctor_id': staff.id}
+    article = Article.objects.filter(
+        status='published', published_at__lte=timezone.now()
+    ).order_by('-published_at').first()
+    if article:
+        samples['news_detail'] = {'news_id': article.id}
+    campaign = Campaign.objects.order_by('-start_date').first()
+    if campaign:
+        samples['campaign_detail'] = {'campaign_id': campaign.id}
+
+    category = Category.objects.order_by('id').first()
+    context = {
+        'category': category.id if category else '',
+        'service': service.id if service else '',
+    }
+    return samples, context
+
+
+def walk_patterns(patterns, i18n=False):
+    """Parcourt le résolveur : (nom, motif, préfixe de langue)"""
+    from django.urls import URLResolver
+    from django.urls.resolvers import LocalePrefixPattern
+
+    for entry in patterns:
+        if isinstance(entry, URLResolver):
+            if entry.namespace in EXCLUDED_NAMESPACES:
+                continue
+            yield from walk_patterns(
+                entry.url_patterns, i18n or isinstance(entry.pattern, LocalePrefixPattern)
+            )
+        else:
+            yield entry.name, entry.pattern, i18n
+
+
+def discover_paths():
+    """
+    Liste des (libellé, chemin) à charger, et des routes ignorées (raison).
+    Le libellé regroupe les langues : 'news?search=sant [en]'.
+    """
+    from django.conf import settings
+    from django.urls import NoReverseMatch, get_resolver, reverse
+    from django.urls.resolvers import RoutePattern
+    from django.utils import translation
+
+    samples, context = sample_kwargs()
+    languages = [code for code, _name in settings.LANGUAGES]
+    paths, skipped, seen = [], [], set()
+
+    for name, pattern, i18n in walk_patterns(get_resolver().url_patterns):
+        if name in EXCLUDED_NAMES or str(pattern).startswith(EXCLUDED_PREFIXES):
+            continue
+        converters = pattern.converters
+        if name is None:
+            # Routes sans nom ni paramètre (robots.txt) ; médias en DEBUG ignorés
+            if isinstance(pattern, RoutePattern) and not converters and not i18n:
+                paths.append((str(pattern), f'/{pattern}'))
+            else:
+                skipped.append((str(pattern), 'route sans nom'))
+            continue
+        kwargs = samples.get(name, {}) if converters else {}
+        if converters and not kwargs:
+            skipped.append((name, 'aucun objet en base'))
+            continue
+
+        for language in (languages if i18n else [None]):
+            with translation.override(language):
+                try:
+                    url = reverse(name, kwargs=kwargs)
+                except NoReverseMatch:
+                    skipped.append((name, 'reverse impossible'))
+                    break
+            if url in seen:
+                # Alias (contact/contact_us, appointment/appointment_create)
+                break
+            seen.add(url)
+            suffix = f' [{language}]' if language else ''
+            paths.append((name + suffix, url))
+            for query in QUERY_VARIANTS.get(name, []):
+                query = query.format(**context)
+                if not query.endswith('='):
+                    paths.append((f'{name}?{query}{suffix}', f'{url}?{query}'))
+
+    return paths, skipped
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_local_db(args):
+    """
+    Base SQLite des benchmarks (benchmarks/settings.py) : créée et remplie si
+    elle n'existe pas encore. Retourne (chemin, répertoire temporaire à supprimer)
+    """
+    temp_dir = None
+    path = args.db_path
+    if path is None:
+        temp_dir = tempfile.mkdtemp(prefix='hrae-bench-')
+        path = os.path.join(temp_dir, 'bench.sqlite3')
+    path = os.path.abspath(path)
+    if os.path.exists(path):
+        return path, temp_dir
+
+    # Construite à côté puis renommée : une base à moitié remplie n'est jamais réutilisée
+    partial = f'{path}.partial'
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'benchmarks.settings', 'HRAE_BENCH_DB': partial}
+    manage = [sys.executable, 'manage.py']
+    print(f"Base locale {path} : schéma et données de test...", file=sys.stderr)
+    try:
+        subprocess.run(manage + ['migrate', '--run-syncdb', '--noinput', '-v', '0'],
+                       cwd=BASE_DIR, env=env, check=True)
+        subprocess.run(manage + ['generate_fake_data', *shlex.split(args.data_args)],
+                       cwd=BASE_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    except BaseException:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        elif os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, path)
+    return path, temp_dir
+
+
+def start_server(args):
+    env = {**os.environ, **BENCHMARK_ENV, 'DJANGO_SETTINGS_MODULE': args.settings}
+    host, port = '127.0.0.1', str(args.port)
+    if args.start == 'gunicorn':
+        env.update({
+            'GUNICORN_PRESET': args.preset,
+            'GUNICORN_BIND': f'{host}:{port}',
+            'GUNICORN_LOG_LEVEL': 'warning',
+        })
+        if args.workers:
+            env['GUNICORN_WORKERS'] = str(args.workers)
+        command = [sys.executable, '-m', 'gunicorn', '-c', str(BASE_DIR / 'gunicorn.conf.py')]
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'{host}:{port}']
+    return subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL if args.start == 'runserver' else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--start', choices=('runserver', 'gunicorn'),
+                        help="Lancer le serveur (sur --port) avant la charge, l'arrêter après")
+    parser.add_argument('--preset', default='gthread', help="GUNICORN_PRESET pour --start gunicorn")
+    parser.add_argument('--workers', type=int, help="GUNICORN_WORKERS pour --start gunicorn")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--settings', default=os.getenv('DJANGO_SETTINGS_MODULE', 'core.settings'))
+    parser.add_argument('--db', choices=('local', 'env'), default='local',
+                        help="Avec --start : base SQLite locale générée (défaut) ou base de --settings")
+    parser.add_argument('--db-path', help="Fichier de la base locale, conservé et réutilisé (défaut : temporaire)")
+    parser.add_argument('--data-args', default='--seed 1 --articles 500 --appointments 5000 --messages 1000',
+                        help="Arguments de generate_fake_data pour remplir la base locale")
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3, help="Secondes d'échauffement (non mesurées)")
+    parser.add_argument('--filter', help="Expression régulière sur les libellés des routes")
+    parser.add_argument('--list', action='store_true', help="Afficher les URL découvertes et quitter")
+    parser.add_argument('--output', help="Fichier JSON (défaut : sortie standard)")
+    args = parser.parse_args()
+
+    temp_dir = None
+    if args.start and args.db == 'local':
+        db_path, temp_dir = prepare_local_db(args)
+        os.environ['HRAE_BENCH_DB'] = db_path
+        args.settings = 'benchmarks.settings'
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    setup_django(args.settings)
+    paths, skipped = discover_paths()
+    if args.filter:
+        paths = [(label, url) for label, url in paths if re.search(args.filter, label)]
+
+    if args.list:
+        for label, url in paths:
+            print(f'{label:45} {url}')
+        for name, reason in skipped:
+            print(f'{name:45} ignorée : {reason}')
+        return
+    if not paths:
+        parser.error("aucune URL à charger")
+
+    server = None
+    base_url = args.base_url
+    if args.start:
+        server = start_server(args)
+        base_url = f'http://127.0.0.1:{args.port}'
+    try:
+        if not wait_until_ready(base_url + paths[0][1]):
+            raise RuntimeError(f"le serveur ne répond pas sur {base_url}")
+        urls = [url for _label, url in paths]
+        if args.warmup:
+            run_load(base_url, urls, concurrency=args.concurrency, duration=args.warmup)
+        by_path = {}
+        latencies, statuses, elapsed = run_load(
+            base_url, urls, concurrency=args.concurrency, duration=args.duration, by_path=by_path
+        )
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    routes = []
+    for label, url in paths:
+        entry = by_path.get(url, {'latencies': [], 'statuses': {}})
+        routes.append({'route': label, 'path': url, 'statuses': entry['statuses'],
+                       **summarize(entry['latencies'])})
+
+    report = {
+        'revision': git_revision(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'base_url': base_url,
+        'server': f'gunicorn ({args.preset})' if args.start == 'gunicorn' else args.start,
+        'database': 'local' if args.settings == 'benchmarks.settings' else args.settings,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'total': {'statuses': statuses, **summarize(latencies, elapsed)},
+        'throttled': statuses.get(429, 0),
+        'server_errors': {
+            route['route']: errors for route in routes
+            if (errors := count_server_errors(route['statuses']))
+        },
+        'routes': sorted(routes, key=lambda route: route['p95_ms'], reverse=True),
+        'skipped': [{'route': name, 'reason': reason} for name, reason in skipped],
+    }
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(output + '\n')
+        total = report['total']
+        print(f"{total['count']} requêtes - p50={total['p50_ms']} ms  p95={total['p95_ms']}  "
+              f"p99={total['p99_ms']}  {total['throughput_rps']} req/s  statuts={statuses}")
+    else:
+        print(output)
+
+    errors = [error for error in (check_not_throttled(statuses), check_server_errors(statuses)) if error]
+    if report['server_errors']:
+        errors.append('Routes en erreur : ' + ', '.join(sorted(report['server_errors'])))
+    if errors:
+        sys.exit('\n'.join(errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""
+Micro-benchmarks : templates, processeur de contexte, middlewares, vues
+
+Chaque élément est mesuré isolément dans le processus (RequestFactory, sans
+serveur ni pile de middlewares) :
+
+- templates   : rendu de chaque template de templates/ (render_to_string)
+- context     : Home.context_processors.site_settings
+- middleware  : chaque classe de core/middleware.py, autour d'une vue vide
+- views       : chaque vue de Home/urls.py (une URL par vue, langue fr),
+                cache chaud puis cache froid (caches vidés avant chaque appel)
+
+Les résultats (médiane, p95, moyenne en ms) sont enregistrés dans un fichier
+de référence ; le mode comparaison signale les éléments dont la médiane a
+augmenté de plus de --threshold % (code de sortie 1 en cas de régression) :
+
+    python benchmarks/micro.py --save                 # crée la référence
+    python benchmarks/micro.py --compare              # compare à la référence
+    python benchmarks/micro.py --only views --filter news --iterations 500
+
+Le cache froid vide les caches Django configurés (CACHES) : REDIS_URL doit
+désigner un Redis local, jamais celui de la production.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from common import BASE_DIR, setup_django, summarize
+
+GROUPS = ('templates', 'context', 'middleware', 'views')
+DEFAULT_BASELINE = BASE_DIR / 'benchmarks' / 'micro_baseline.json'
+
+
+def measure(func, iterations, warmup=5, before=None):
+    """Exécute func ``iterations`` fois ; ``before`` est appelé hors chronométrage"""
+    for _ in range(warmup):
+        if before:
+            before()
+        func()
+    latencies = []
+    for _ in range(iterations):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies)
+
+
+def make_request(path='/fr/', ip='127.0.0.1'):
+    """Requête GET complète pour les vues : utilisateur anonyme, session, messages"""
+    from django.contrib.auth.models import AnonymousUser
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from django.contrib.sessions.backends.cache import SessionStore
+    from django.test import RequestFactory
+
+    request = RequestFactory().get(path, REMOTE_ADDR=ip)
+    request.user = AnonymousUser()
+    request.session = SessionStore()
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def clear_caches():
+    """Cache froid : caches Django et pages d'erreur locales au processus"""
+    from django.core.cache import caches
+
+    from core import error_pages
+
+    for alias in caches:
+        caches[alias].clear()
+    error_pages.invalidate()
+
+
+# ========================================
+# Templates
+# ========================================
+def template_context():
+    """Contexte générique : un objet de chaque type (s'il existe) et ses listes"""
+    from django.core.paginator import Paginator
+
+    from Home.models import Article, Campaign, Category, Page, Service, SiteSettings, Staff
+
+    service = Service.objects.filter(is_active=True).first()
+    staff = Staff.objects.filter(is_visible=True).select_related('grade').first()
+    article = Article.objects.filter(status='published').first()
+    campaign = Campaign.objects.first()
+    services = Service.objects.filter(is_active=True)
+    articles = Article.objects.filter(status='published').select_related('category')
+    campaigns = Campaign.objects.all()
+    return {
+        'settings': SiteSettings.get_settings(),
+        'page': Page.objects.filter(is_active=True).first(),
+        'service': service,
+        'staff': staff,
+        'doctor': staff,
+        'article': article,
+        'campaign': campaign,
+        'services': Paginator(services, 12).get_page(1),
+        'homepage_services': services[:6],
+        'staff_members': Staff.objects.filter(is_visible=True).select_related('grade')[:12],
+        'articles': Paginator(articles, 5).get_page(1),
+        'campaigns': Paginator(campaigns, 9).get_page(1),
+        'publications': list(articles[:3]) + list(campaigns[:3]),
+        'categories': Category.objects.all(),
+        'status_code': 404,
+    }
+
+
+def bench_templates(args, results):
+    from django.template.loader import render_to_string
+
+    context = template_context()
+    request = make_request()
+    templates = sorted(
+        str(path.relative_to(BASE_DIR / 'templates')) for path in (BASE_DIR / 'templates').rglob('*.html')
+    )
+    for name in templates:
+        record(args, results, f'template:{name}',
+               lambda name=name: render_to_string(name, context, request=request))
+
+
+# ========================================
+# Processeur de contexte
+# ========================================
+def bench_context(args, results):
+    from Home.context_processors import site_settings
+
+    request = make_request()
+    record(args, results, 'context:site_settings', lambda: site_settings(request))
+    record(args, results, 'context:site_settings (cold)', lambda: site_settings(request), before=clear_caches)
+
+
+# ========================================
+# Middlewares
+# ========================================
+def middleware_classes():
+    import inspect
+
+    from core import middleware
+
+    return [
+        cls for _name, cls in inspect.getmembers(middleware, inspect.isclass)
+        if cls.__module__ == middleware.__name__
+        and 'get_response' in inspect.signature(cls.__init__).parameters
+    ]
+
+
+def bench_middleware(args, results):
+    from django.core.exceptions import MiddlewareNotUsed
+    from django.http import HttpResponse
+    from django.test.utils import override_settings
+    from django.urls import resolve
+
+    def view(request):
+        return HttpResponse(b'ok')
+
+    match = resolve('/fr/')
+    counter = iter(range(sys.maxsize))
+
+    def call(instance):
+        # Une IP par appel : les seaux à jetons ne se vident pas
+        i = next(counter)
+        request = make_request('/fr/', ip=f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}')
+        request.resolver_match = match
+        if hasattr(instance, 'process_view'):
+            response = instance.process_view(request, view, (), {})
+            if response is not None:
+                return response
+        return instance(request)
+
+    # Middlewares désactivables par réglage : mesurés activés
+    with override_settings(COOKIELESS_CACHE_ENABLED=True):
+        for cls in middleware_classes():
+            try:
+                instance = cls(view)
+            except MiddlewareNotUsed:
+                continue
+            record(args, results, f'middleware:{cls.__name__}', lambda instance=instance: call(instance))
+    record(args, results, 'middleware:(aucun)', lambda: view(make_request()))
+
+
+# ========================================
+# Vues
+# ========================================
+def view_paths():
+    """Une URL par vue de Home/urls.py, en français (cf. load_test.discover_paths)"""
+    from load_test import discover_paths
+
+    seen, paths = set(), []
+    for label, url in discover_paths()[0]:
+        if not url.startswith('/fr/') or '?' in url:
+            continue
+        name = label.split(' ')[0]
+        if name not in seen:
+            seen.add(name)
+            paths.append((name, url))
+    return paths
+
+
+def bench_views(args, results):
+    from asgiref.sync import async_to_sync, iscoroutinefunction
+    from django.urls import resolve
+
+    for name, url in view_paths():
+        match = resolve(url)
+        view = match.func
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+
+        def call(view=view, match=match, url=url):
+            request = make_request(url)
+            request.resolver_match = match
+            response = view(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+            return response
+
+        record(args, results, f'view:{name}', call)
+        if args.cold:
+            record(args, results, f'view:{name} (cold)', call, before=clear_caches)
+
+
+# ========================================
+# Résultats
+# ========================================
+def record(args, results, name, func, before=None):
+    if args.filter and not re.search(args.filter, name):
+        return
+    try:
+        summary = measure(func, args.iterations, warmup=args.warmup, before=before)
+    except Exception as exc:
+        results[name] = {'error': f'{type(exc).__name__}: {exc}'[:200]}
+        print(f"{name:55} ERREUR {results[name]['error']}")
+        return
+    results[name] = {key: summary[key] for key in ('p50_ms', 'p95_ms', 'mean_ms')}
+    print(f"{name:55} p50={summary['p50_ms']:9.3f} ms  p95={summary['p95_ms']:9.3f}  mean={summary['mean_ms']:9.3f}")
+
+
+def compare(results, baseline, threshold):
+    """Affiche les écarts de médiane ; retourne la liste des régressions"""
+    regressions = []
+    print(f"\nComparaison à la référence (seuil : +{threshold:g} % sur la médiane)")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or 'p50_ms' not in before or 'p50_ms' not in result:
+            print(f"{name:55} {'(nouveau)' if not before else '(erreur)'}")
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  <-- RÉGRESSION'
+            regressions.append(name)
+        print(f"{name:55} {before['p50_ms']:9.3f} -> {result['p50_ms']:9.3f} ms  {change:+7.1f} %{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--filter', help="Expression régulière sur le nom des mesures")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--no-cold', dest='cold', action='store_false',
+                        help="Ne pas mesurer les vues à cache froid (ne vide pas les caches)")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save', action='store_true', help="Enregistrer les résultats comme référence")
+    mode.add_argument('--compare', action='store_true', help="Comparer à la référence")
+    parser.add_argument('--threshold', type=float, default=20.0, help="Régression : hausse de la médiane en %%")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import translation
+
+    results = {}
+    # Langue par défaut du site (préfixe /fr/ des URL)
+    with translation.override('fr'):
+        for group in GROUPS:
+            if group in args.only:
+                globals()[f'bench_{group}'](args, results)
+
+    if args.save:
+        previous = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        # Mise à jour partielle possible (--only / --filter)
+        previous.update(results)
+        args.baseline.write_text(json.dumps(previous, indent=2, sort_keys=True) + '\n')
+        print(f"\nRéférence enregistrée : {args.baseline}")
+    elif args.compare:
+        if not args.baseline.exists():
+            parser.error(f"référence introuvable : {args.baseline} (lancer d'abord --save)")
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:g} %")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
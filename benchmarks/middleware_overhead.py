@@ -0,0 +1,180 @@
+"""
+Benchmark : coût de la pile de middlewares sous WSGI et sous ASGI
+
+Les requêtes sont injectées directement dans WSGIHandler / ASGIHandler
+(sans serveur ni réseau) afin de mesurer uniquement le coût de Django et
+des middlewares. Trois piles sont comparées :
+
+- full      : settings.MIDDLEWARE (HRAESecurityMiddleware sync + async)
+- sync-only : même pile, mais HRAESecurityMiddleware forcé synchrone
+              (équivalent des anciens middlewares : un passage de thread
+              sync/async par requête sous ASGI)
+- none      : aucun middleware (référence)
+
+Usage :
+    python benchmarks/middleware_overhead.py --requests 2000 --path /robots.txt
+    python benchmarks/middleware_overhead.py --json results.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import sys
+import time
+
+from common import setup_django, summarize
+
+SECURITY_MIDDLEWARE = 'core.middleware.HRAESecurityMiddleware'
+
+
+def build_stacks(middleware):
+    sync_only = [
+        'benchmarks_sync_only.SyncOnlySecurityMiddleware' if m == SECURITY_MIDDLEWARE else m
+        for m in middleware
+    ]
+    return {'full': list(middleware), 'sync-only': sync_only, 'none': []}
+
+
+def install_sync_only_module():
+    """Variante synchrone de HRAESecurityMiddleware, importable par Django"""
+    import types
+    from core.middleware import HRAESecurityMiddleware
+
+    class SyncOnlySecurityMiddleware(HRAESecurityMiddleware):
+        async_capable = False
+
+    module = types.ModuleType('benchmarks_sync_only')
+    module.SyncOnlySecurityMiddleware = SyncOnlySecurityMiddleware
+    sys.modules['benchmarks_sync_only'] = module
+
+
+def client_ip(i):
+    # Une IP différente par requête : les seaux à jetons ne se vident pas
+    return f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}'
+
+
+def wsgi_environ(path, host, ip):
+    path, _, query = path.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'HTTP_HOST': host,
+        'REMOTE_ADDR': ip,
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+
+def run_wsgi(path, host, count):
+    from django.core.handlers.wsgi import WSGIHandler
+    handler = WSGIHandler()
+    statuses = {}
+
+    def start_response(status, headers, exc_info=None):
+        statuses[status] = statuses.get(status, 0) + 1
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        t0 = time.perf_counter()
+        response = handler(wsgi_environ(path, host, client_ip(i)), start_response)
+        b''.join(response)
+        response.close()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started), statuses
+
+
+def run_asgi(path, host, count):
+    from django.core.handlers.asgi import ASGIHandler
+    handler = ASGIHandler()
+    statuses = {}
+    raw_path, _, query = path.partition('?')
+
+    async def one_request(ip):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': raw_path,
+            'raw_path': raw_path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', host.encode())],
+            'client': (ip, 50000),
+            'server': (host, 80),
+        }
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Pas de déconnexion client : attendre l'annulation par Django
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses[message['status']] = statuses.get(message['status'], 0) + 1
+
+        await handler(scope, receive, send)
+
+    async def main():
+        latencies = []
+        started = time.perf_counter()
+        for i in range(count):
+            t0 = time.perf_counter()
+            await one_request(client_ip(i))
+            latencies.append(time.perf_counter() - t0)
+        return summarize(latencies, time.perf_counter() - started)
+
+    return asyncio.run(main()), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default='/robots.txt', help="URL à appeler (défaut : /robots.txt, sans base de données)")
+    parser.add_argument('--host', default='127.0.0.1', help="En-tête Host (doit figurer dans ALLOWED_HOSTS)")
+    parser.add_argument('--requests', type=int, default=1000, help="Nombre de requêtes par combinaison")
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--json', help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    install_sync_only_module()
+    results = []
+    for stack_name, middleware in build_stacks(settings.MIDDLEWARE).items():
+        with override_settings(MIDDLEWARE=middleware):
+            for server, runner in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+                runner(args.path, args.host, args.warmup)
+                summary, statuses = runner(args.path, args.host, args.requests)
+                results.append({'server': server, 'stack': stack_name, 'statuses': statuses, **summary})
+                print(
+                    f"{server:5} {stack_name:10} mean={summary['mean_ms']:8.3f} ms  "
+                    f"p50={summary['p50_ms']:8.3f}  p95={summary['p95_ms']:8.3f}  "
+                    f"p99={summary['p99_ms']:8.3f}  {summary['throughput_rps']:9.1f} req/s  "
+                    f"statuts={statuses}"
+                )
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({'path': args.path, 'requests': args.requests, 'results': results}, fp, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Settings des benchmarks de charge (benchmarks/load_test.py --start, base locale)
+
+Ceux du projet, avec une base SQLite locale (HRAE_BENCH_DB) remplie par
+generate_fake_data, et sans les protections par IP (seaux à jetons,
+réputation) : la charge vient de quelques adresses locales et mesurerait
+sinon des pages 429. Redis reste celui de l'environnement (REDIS_URL).
+"""
+
+import os
+
+os.environ.setdefault('SECRET_KEY', 'hrae-benchmark-only')
+
+from core.settings import *  # noqa: E402,F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['HRAE_BENCH_DB'],
+        # Écritures concurrentes des workers (compteur de vues des articles)
+        'OPTIONS': {'timeout': 20},
+    }
+}
+# L'historique des migrations de Home ne se rejoue pas sur une base vide
+# (0012 recrée Home_campaignimage) : schéma créé par migrate --run-syncdb
+MIGRATION_MODULES = {'Home': None}
+
+THROTTLE_ENABLED = False
+IP_REPUTATION_ENABLED = False
+SECURE_SSL_REDIRECT = False
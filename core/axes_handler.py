@@ -0,0 +1,115 @@
+"""
+Handler django-axes adossé au cache Redis, avec journal d'audit asynchrone
+
+Les compteurs d'échecs et les verrouillages sont gérés par AxesCacheHandler
+(add/incr atomiques dans Redis, expiration = AXES_COOLOFF_TIME) : une rafale
+de tentatives sur /admin/ ne génère plus de lectures ni d'écritures MySQL.
+
+La base ne conserve qu'un journal d'audit (AccessFailureLog pour les échecs,
+AccessLog pour les connexions réussies), écrit par un thread dédié, par lots
+(bulk_create), en dehors de la requête. L'heure enregistrée est celle de
+l'écriture (auto_now_add), à quelques millisecondes près.
+"""
+
+from logging import getLogger
+import os
+import queue
+import threading
+
+from axes.conf import settings
+from axes.handlers.cache import AxesCacheHandler
+from axes.helpers import get_client_username
+from axes.models import AccessFailureLog, AccessLog
+from django.db import close_old_connections
+
+log = getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    File d'écriture en base traitée par un thread : les objets sont insérés
+    par lots, groupés par modèle. Si la file est pleine, l'entrée est
+    abandonnée (et loggée) plutôt que de bloquer la requête.
+    """
+
+    def __init__(self, batch_size=100, queue_size=10000):
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Nouveau processus (worker gunicorn forké) : nouvelle file et nouveau thread
+            self.queue = queue.Queue(self.queue_size)
+            threading.Thread(target=self._run, name='axes-audit', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, obj):
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(obj)
+        except queue.Full:
+            log.warning("AXES: Audit queue full, dropping %s.", obj)
+
+    def _run(self):
+        pending = self.queue
+        while True:
+            batch = [pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, batch):
+        close_old_connections()
+        by_model = {}
+        for obj in batch:
+            by_model.setdefault(type(obj), []).append(obj)
+        for model, objs in by_model.items():
+            try:
+                model.objects.bulk_create(objs)
+            except Exception:
+                log.exception("AXES: Failed to write %d %s audit records.", len(objs), model.__name__)
+
+
+class AxesCacheAuditHandler(AxesCacheHandler):
+    """
+    AxesCacheHandler + audit en base (asynchrone) des échecs et des connexions
+    """
+
+    writer = AuditWriter()
+
+    @staticmethod
+    def _audit_fields(request, username):
+        return {
+            'username': username,
+            'ip_address': request.axes_ip_address,
+            'user_agent': request.axes_user_agent,
+            'http_accept': request.axes_http_accept,
+            'path_info': request.axes_path_info,
+        }
+
+    def user_login_failed(self, sender, credentials, request=None, **kwargs):
+        super().user_login_failed(sender, credentials, request, **kwargs)
+        if request is None or not settings.AXES_ENABLE_ACCESS_FAILURE_LOG:
+            return
+        if self.is_whitelisted(request, credentials):
+            return
+        username = get_client_username(request, credentials)
+        self.writer.submit(AccessFailureLog(
+            locked_out=bool(getattr(request, 'axes_locked_out', False)),
+            **self._audit_fields(request, username),
+        ))
+
+    def user_logged_in(self, sender, request, user, **kwargs):
+        super().user_logged_in(sender, request, user, **kwargs)
+        if not settings.AXES_DISABLE_ACCESS_LOG:
+            self.writer.submit(AccessLog(**self._audit_fields(request, user.get_username())))
@@ -0,0 +1,169 @@
+"""
+Pages d'erreur pré-rendues pour HRAE (429, 404, 500)
+
+Les pages sont rendues une seule fois par langue, puis conservées sous forme
+d'octets : dans le cache partagé (Redis) et dans un petit cache mémoire par
+processus. Une requête bloquée ou en erreur est donc servie sans requête SQL
+ni rendu de template, même en pleine attaque ou quand la base est en panne.
+
+La sauvegarde de SiteSettings (téléphone d'urgence, nom du site...) invalide
+les pages (signal dans Home.signals) ; les autres workers les rechargent à
+l'expiration de leur copie locale (ERROR_PAGES_LOCAL_TTL).
+"""
+
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+ERROR_TEMPLATES = {
+    429: 'errors/429.html',
+    404: 'errors/404.html',
+    500: 'errors/500.html',
+}
+
+# Dernier recours si le rendu lui-même échoue
+FALLBACK_BODIES = {
+    429: b'<h1>429 - Too Many Requests</h1>',
+    404: b'<h1>404 - Page introuvable</h1>',
+    500: b'<h1>500 - Erreur serveur</h1>',
+}
+
+KEY_PREFIX = 'errorpage'
+
+_local = {}
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'ERROR_PAGES_CACHE', 'default')]
+
+
+def _language():
+    """Langue active ramenée à un code de settings.LANGUAGES"""
+    codes = [code for code, _name in settings.LANGUAGES]
+    language = translation.get_language() or settings.LANGUAGE_CODE
+    if language in codes:
+        return language
+    language = language.split('-')[0]
+    return language if language in codes else codes[0]
+
+
+def _key(status, language):
+    return f'{KEY_PREFIX}:{status}:{language}'
+
+
+def render_error_page(status, language):
+    """
+    Rendu complet de la page (utilisé uniquement en cas d'absence dans le cache).
+    Retourne (octets, complet) : une page dégradée n'est pas partagée.
+    """
+    # Import local : core ne dépend pas de Home au chargement
+    from Home.models import SiteSettings
+
+    try:
+        site_settings = SiteSettings.get_settings()
+    except Exception:
+        # Base indisponible : les templates ont des valeurs par défaut
+        logger.exception("[ERROR PAGES] SiteSettings unavailable")
+        site_settings = None
+
+    try:
+        with translation.override(language):
+            body = render_to_string(ERROR_TEMPLATES[status], {
+                'settings': site_settings,
+                'LANGUAGE_CODE': language,
+            }).encode('utf-8')
+    except Exception:
+        logger.exception("[ERROR PAGES] Rendering failed - Status: %s - Language: %s", status, language)
+        return FALLBACK_BODIES[status], False
+    return body, site_settings is not None
+
+
+def _local_page(status, language):
+    entry = _local.get((status, language))
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    return None
+
+
+def get_error_page(status, language=None):
+    """Octets de la page d'erreur : mémoire locale, puis cache partagé, puis rendu"""
+    language = language or _language()
+    body = _local_page(status, language)
+    if body is not None:
+        return body
+
+    key = _key(status, language)
+    try:
+        body = _cache().get(key)
+    except Exception:
+        logger.exception("[ERROR PAGES] Cache unavailable")
+        body = None
+
+    if body is None:
+        body, complete = render_error_page(status, language)
+        if complete:
+            try:
+                _cache().set(key, body, None)
+            except Exception:
+                logger.exception("[ERROR PAGES] Cache unavailable")
+
+    with _lock:
+        _local[(status, language)] = (body, time.time() + getattr(settings, 'ERROR_PAGES_LOCAL_TTL', 60))
+    return body
+
+
+def _response(status, body):
+    return HttpResponse(body, status=status, content_type='text/html; charset=utf-8')
+
+
+def error_response(status, language=None):
+    return _response(status, get_error_page(status, language))
+
+
+async def aerror_response(status, language=None):
+    """Version asynchrone : le rendu éventuel (accès base) passe par un thread"""
+    language = language or _language()
+    body = _local_page(status, language)
+    if body is None:
+        body = await sync_to_async(get_error_page)(status, language)
+    return _response(status, body)
+
+
+def invalidate():
+    """Supprime les pages pré-rendues (appelé à la sauvegarde de SiteSettings)"""
+    with _lock:
+        _local.clear()
+    try:
+        _cache().delete_many([
+            _key(status, code) for status in ERROR_TEMPLATES for code, _name in settings.LANGUAGES
+        ])
+    except Exception:
+        logger.exception("[ERROR PAGES] Cache unavailable")
+
+
+def warm_up():
+    """Pré-rend toutes les pages, pour toutes les langues"""
+    for status in ERROR_TEMPLATES:
+        for code, _name in settings.LANGUAGES:
+            get_error_page(status, code)
+
+
+# ========================================
+# Vues d'erreur (handler404 / handler500 dans core/urls.py)
+# ========================================
+def page_not_found(request, exception=None):
+    return error_response(404)
+
+
+def server_error(request):
+    return error_response(500)
@@ -0,0 +1,206 @@
+"""
+Pipeline de logs asynchrone pour HRAE
+
+Les appels ``logger.xxx()`` des vues et middlewares ne font plus d'écriture :
+l'enregistrement est déposé dans une file en mémoire, et un thread
+(QueueListener) le formate puis l'écrit (JSON dans LOGS_DIR, console en
+développement).
+
+Tous les workers gunicorn écrivent en ajout dans le même fichier : aucun ne
+le fait tourner (une rotation par processus écraserait des lignes). La
+rotation est confiée à logrotate (deploy/hrae-logrotate) ; le fichier est
+rouvert par chaque processus dès qu'il a été remplacé (WatchedFileHandler).
+
+Pendant une rafale (scan, flood), les événements de sécurité répétés pour une
+même IP sont échantillonnés : seuls les ``burst_limit`` premiers par fenêtre
+de ``burst_window`` secondes sont écrits, puis un résumé est produit
+("IP: x - Event: rate_limit - 4212 times in 60s").
+
+Pour être échantillonné, un enregistrement doit porter ``event`` et ``ip``
+dans ``extra`` :
+
+    logger.warning("[RATE LIMIT] Blocked request - IP: %s", ip,
+                   extra={'event': 'rate_limit', 'ip': ip, 'path': request.path})
+"""
+
+from datetime import datetime, timezone
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+# Attributs standards d'un LogRecord (tout le reste vient de ``extra``)
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Une ligne JSON par enregistrement, avec les champs passés dans ``extra``
+    """
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class BurstSampler:
+    """
+    Compte les événements par (logger, event, ip) sur une fenêtre fixe.
+    Au-delà de ``limit`` événements, les suivants ne sont plus écrits
+    et un résumé est produit à la fin de la fenêtre.
+    """
+
+    def __init__(self, limit=5, window=60):
+        self.limit = limit
+        self.window = window
+        self._windows = {}  # clé -> [début, total, logger, level]
+        self._pending = []
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    def allow(self, record, now):
+        key = (record.name, record.event, record.ip)
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                # Nouvelle fenêtre (l'ancienne est résumée par sweep)
+                if entry is not None and entry[1] > self.limit:
+                    self._pending.append(self._summary(key, entry))
+                self._windows[key] = [now, 1, record.name, record.levelno]
+                return True
+            entry[1] += 1
+            return entry[1] <= self.limit
+
+    def sweep(self, now, force=False):
+        """Résumés des fenêtres terminées (au plus une fois par seconde)"""
+        with self._lock:
+            summaries, self._pending = self._pending, []
+            if not force and now < self._next_sweep:
+                return summaries
+            self._next_sweep = now + 1
+            for key, entry in list(self._windows.items()):
+                if force or now - entry[0] >= self.window:
+                    del self._windows[key]
+                    if entry[1] > self.limit:
+                        summaries.append(self._summary(key, entry))
+        return summaries
+
+    def _summary(self, key, entry):
+        name, event, ip = key
+        _started, total, _logger, level = entry
+        record = logging.makeLogRecord({
+            'name': name,
+            'levelno': level,
+            'levelname': logging.getLevelName(level),
+            'msg': "[LOG SUMMARY] IP: %s - Event: %s - %d times in %ds (%d not logged)",
+            'args': (ip, event, total, self.window, total - self.limit),
+        })
+        record.event = 'summary'
+        record.summarized_event = event
+        record.ip = ip
+        record.count = total
+        record.not_logged = total - self.limit
+        return record
+
+
+class AsyncLogHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler + QueueListener : formatage et écriture dans un thread dédié.
+
+    Le listener est démarré au premier log de chaque processus (compatible
+    avec les workers gunicorn créés par fork). Si la file est pleine,
+    l'enregistrement est abandonné : une requête n'attend jamais le disque.
+    """
+
+    def __init__(self, filename, console=False, burst_limit=5, burst_window=60, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.sampler = BurstSampler(burst_limit, burst_window) if burst_limit else None
+        self.dropped = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        file_handler = logging.handlers.WatchedFileHandler(filename, encoding='utf-8', delay=True)
+        file_handler.setFormatter(JSONFormatter())
+        self.targets = [file_handler]
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter('%(levelname)s %(name)s %(message)s'))
+            self.targets.append(console_handler)
+
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Processus enfant (fork) : la file et le thread du parent
+                # ne sont pas utilisables
+                self.queue = queue.Queue(self.queue_size)
+            self.listener = logging.handlers.QueueListener(
+                self.queue, *self.targets, respect_handler_level=True
+            )
+            self.listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def prepare(self, record):
+        # File en mémoire (pas de pickle) : le message est formaté par le
+        # thread du listener, pas par la requête
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        try:
+            self._ensure_listener()
+            if self.sampler is not None:
+                now = time.time()
+                for summary in self.sampler.sweep(now):
+                    self.enqueue(summary)
+                if (getattr(record, 'event', None) is not None
+                        and getattr(record, 'ip', None) is not None
+                        and not self.sampler.allow(record, now)):
+                    return
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def stop(self):
+        """Écrit les résumés en attente et vide la file (fin de processus)"""
+        if self.listener is None or self._pid != os.getpid():
+            return
+        if self.sampler is not None:
+            for summary in self.sampler.sweep(time.time(), force=True):
+                self.enqueue(summary)
+        self.listener.stop()
+        self.listener = None
+        self._pid = None
+
+    def close(self):
+        self.stop()
+        for target in self.targets:
+            target.close()
+        super().close()
@@ -0,0 +1,409 @@
+"""
+Métriques au format d'exposition Prometheus (texte) pour HRAE
+
+- Durée des requêtes HTTP par nom d'URL (histogramme)
+- Nombre et durée des requêtes SQL par nom d'URL
+- Succès / échecs de lecture du cache « default » (MetricsCacheClient)
+- Blocages du rate limiting et attaques détectées (core.middleware)
+- Soumissions de formulaires par type (Home.views)
+
+Chaque worker additionne ses mesures en mémoire ; un thread les ajoute
+toutes les METRICS_FLUSH_INTERVAL secondes dans un hash Redis partagé
+(HINCRBYFLOAT pipelinés). /metrics lit ce hash : les valeurs sont donc
+agrégées sur tous les workers gunicorn. Sans Redis (développement), seules
+les mesures du processus courant sont exposées.
+
+/metrics n'est accessible qu'aux adresses de METRICS_ALLOWED_IPS.
+"""
+
+import atexit
+import contextvars
+from functools import lru_cache
+import logging
+import os
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis.client import DefaultClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Familles exposées : nom -> (type, description)
+METRICS = {
+    'hrae_http_request_duration_seconds': ('histogram', "Durée des requêtes HTTP par nom d'URL"),
+    'hrae_db_queries_total': ('counter', "Requêtes SQL exécutées, par nom d'URL"),
+    'hrae_db_query_duration_seconds_total': ('counter', "Temps passé en requêtes SQL, par nom d'URL"),
+    'hrae_cache_requests_total': ('counter', "Lectures du cache default (hit/miss)"),
+    'hrae_cache_hit_ratio': ('gauge', "Taux de succès des lectures du cache default"),
+    'hrae_ratelimit_blocks_total': ('counter', "Requêtes bloquées par le rate limiting"),
+    'hrae_banned_requests_total': ('counter', "Requêtes rejetées (IP bannie)"),
+    'hrae_attacks_detected_total': ('counter', "Requêtes suspectes détectées"),
+    'hrae_form_submissions_total': ('counter', "Soumissions de formulaires par type et résultat"),
+    'hrae_notifications_total': ('counter', "Envois de notifications par canal et résultat (send_notifications)"),
+}
+
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _unescape(value):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class MetricsRegistry:
+    """
+    Compteurs en mémoire, vidés périodiquement dans Redis par un thread.
+    Clé d'une série : 'nom{labels}' (labels déjà formatés).
+    """
+
+    KEY = 'metrics'
+
+    def __init__(self, cache_alias='default', flush_interval=5, buckets=DEFAULT_BUCKETS):
+        self.cache_alias = cache_alias
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._pending = {}
+        # Totaux locaux, utilisés seulement sans Redis
+        self._local = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _redis(self):
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection(self.cache_alias)
+        except (ImportError, NotImplementedError):
+            return None
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Nouveau processus (worker forké) : rien n'est hérité du master
+            self._pending = {}
+            threading.Thread(target=self._run, name='metrics-flush', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _add(self, series, value):
+        with self._lock:
+            self._pending[series] = self._pending.get(series, 0) + value
+
+    def inc(self, name, labels=None, value=1):
+        self._ensure_thread()
+        self._add(f'{name}{{{format_labels(labels or {})}}}', value)
+
+    def observe(self, name, value, labels=None):
+        """Observation d'histogramme : seaux cumulés, somme et nombre"""
+        self._ensure_thread()
+        labels = labels or {}
+        base = format_labels(labels)
+        sep = ',' if base else ''
+        with self._lock:
+            pending = self._pending
+            # Tous les seaux sont écrits (0 compris) : la série est complète dès la première mesure
+            for bound in self.buckets:
+                series = f'{name}_bucket{{{base}{sep}le="{bound}"}}'
+                pending[series] = pending.get(series, 0) + (1 if value <= bound else 0)
+            for series, amount in (
+                (f'{name}_bucket{{{base}{sep}le="+Inf"}}', 1),
+                (f'{name}_sum{{{base}}}', value),
+                (f'{name}_count{{{base}}}', 1),
+            ):
+                pending[series] = pending.get(series, 0) + amount
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                for series, value in pending.items():
+                    self._local[series] = self._local.get(series, 0) + value
+            return
+
+        key = caches[self.cache_alias].make_key(self.KEY)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for series, value in pending.items():
+                pipe.hincrbyfloat(key, series, value)
+            pipe.execute()
+        except Exception:
+            logger.exception("[METRICS] Flush to Redis failed")
+            # Remis en attente pour le prochain passage
+            with self._lock:
+                for series, value in pending.items():
+                    self._pending[series] = self._pending.get(series, 0) + value
+
+    def collect(self):
+        """Toutes les séries agrégées : {'nom{labels}': valeur}"""
+        self.flush()
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                return dict(self._local)
+        raw = client.hgetall(caches[self.cache_alias].make_key(self.KEY))
+        return {series.decode(): float(value) for series, value in raw.items()}
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._local.clear()
+        client = self._redis()
+        if client is not None:
+            client.delete(caches[self.cache_alias].make_key(self.KEY))
+
+    def render(self):
+        """Texte au format d'exposition Prometheus 0.0.4"""
+        series = self.collect()
+
+        # Gauge calculée : taux de succès du cache
+        hits = series.get('hrae_cache_requests_total{result="hit"}', 0)
+        misses = series.get('hrae_cache_requests_total{result="miss"}', 0)
+        if hits + misses:
+            series['hrae_cache_hit_ratio{}'] = hits / (hits + misses)
+
+        families = {}
+        for key, value in series.items():
+            name, _, labels = key.partition('{')
+            labels = {k: _unescape(v) for k, v in LABEL_RE.findall(labels.rstrip('}'))}
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and METRICS.get(name[:-len(suffix)], ('',))[0] == 'histogram':
+                    family = name[:-len(suffix)]
+            families.setdefault(family, []).append((name, labels, value))
+
+        lines = []
+        for family in sorted(families):
+            kind, description = METRICS.get(family, ('untyped', ''))
+            lines.append(f'# HELP {family} {description}')
+            lines.append(f'# TYPE {family} {kind}')
+            for name, labels, value in sorted(families[family], key=_sort_key):
+                formatted = format_labels(labels)
+                if 'le' in labels:
+                    # le en dernier, comme le client officiel
+                    le = labels.pop('le')
+                    formatted = format_labels(labels) + (',' if labels else '') + f'le="{le}"'
+                lines.append(f'{name}{{{formatted}}} {_format_value(value)}' if formatted
+                             else f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _sort_key(entry):
+    name, labels, _value = entry
+    other = sorted((k, v) for k, v in labels.items() if k != 'le')
+    le = labels.get('le')
+    bound = float('inf') if le in (None, '+Inf') else float(le)
+    return other, name, bound
+
+
+@lru_cache(maxsize=None)
+def get_registry():
+    registry = MetricsRegistry(
+        getattr(settings, 'METRICS_CACHE', 'default'),
+        flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 5),
+        buckets=getattr(settings, 'METRICS_BUCKETS', DEFAULT_BUCKETS),
+    )
+    atexit.register(registry.flush)
+    return registry
+
+
+def inc(name, labels=None, value=1):
+    if getattr(settings, 'METRICS_ENABLED', False):
+        get_registry().inc(name, labels, value)
+
+
+def observe(name, value, labels=None):
+    if getattr(settings, 'METRICS_ENABLED', False):
+        get_registry().observe(name, value, labels)
+
+
+# ========================================
+# Requêtes SQL : wrapper d'exécution sur chaque connexion
+# ========================================
+# [nombre, durée] de la requête HTTP en cours ; hérité par les threads de
+# sync_to_async (copie du contexte) sous ASGI
+_db_stats = contextvars.ContextVar('hrae_db_stats', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = _db_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+def install_query_counter(sender=None, connection=None, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+# ========================================
+# Cache : client django-redis qui compte les hits / miss
+# ========================================
+_MISSING = object()
+
+
+class MetricsCacheClient(DefaultClient):
+    """DefaultClient + compteurs hrae_cache_requests_total (CLIENT_CLASS)"""
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=_MISSING, version=version, client=client)
+        if value is _MISSING:
+            inc('hrae_cache_requests_total', {'result': 'miss'})
+            return default
+        inc('hrae_cache_requests_total', {'result': 'hit'})
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version, client=client)
+        if values:
+            inc('hrae_cache_requests_total', {'result': 'hit'}, len(values))
+        if len(keys) > len(values):
+            inc('hrae_cache_requests_total', {'result': 'miss'}, len(keys) - len(values))
+        return values
+
+
+# ========================================
+# Middleware : durée et SQL par requête
+# ========================================
+def url_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Non résolue : 404, IP bannie, requête bloquée avant la vue
+        return 'none'
+    if 'admin' in match.namespaces:
+        # Vues d'admin regroupées (nombre de séries borné)
+        return 'admin'
+    return match.url_name or 'none'
+
+
+# Méthode choisie par le client : hors de cette liste, un seul libellé
+# (sinon un champ Redis et une série Prometheus par verbe inventé)
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+
+def method_label(request):
+    return request.method if request.method in HTTP_METHODS else 'other'
+
+
+class MetricsMiddleware:
+    """
+    Mesure chaque requête : à placer en tête de MIDDLEWARE, pour compter
+    aussi les réponses 403/429 des middlewares de sécurité.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        connection_created.connect(install_query_counter, dispatch_uid='hrae_metrics_queries')
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection=connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _db_stats.set([0, 0.0])
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats = _db_stats.get()
+            _db_stats.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        token = _db_stats.set([0, 0.0])
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stats = _db_stats.get()
+            _db_stats.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    @staticmethod
+    def record(request, response, duration, stats):
+        registry = get_registry()
+        url_name = url_label(request)
+        registry.observe('hrae_http_request_duration_seconds', duration, {
+            'url_name': url_name,
+            'method': method_label(request),
+            'status': f'{response.status_code // 100}xx',
+        })
+        if stats[0]:
+            registry.inc('hrae_db_queries_total', {'url_name': url_name}, stats[0])
+            registry.inc('hrae_db_query_duration_seconds_total', {'url_name': url_name}, stats[1])
+
+
+# ========================================
+# Vue /metrics (core/urls.py)
+# ========================================
+def scraper_ip(request):
+    """
+    IP à autoriser : celle du client selon core.middleware.get_client_ip
+    (entrée ajoutée par le proxy de confiance, sinon REMOTE_ADDR), la même
+    que pour les seaux à jetons
+    """
+    # Import local : core.middleware importe ce module
+    from core.middleware import get_client_ip
+
+    return get_client_ip(request)
+
+
+def metrics_view(request):
+    ip = scraper_ip(request)
+    if not getattr(settings, 'METRICS_ENABLED', False) or ip not in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+        logger.warning(
+            "[METRICS] Access denied - IP: %s", ip,
+            extra={'event': 'metrics_denied', 'ip': ip},
+        )
+        return HttpResponseForbidden(b'Access Denied', content_type='text/plain')
+    return HttpResponse(get_registry().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
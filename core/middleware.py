@@ -1,48 +1,314 @@
 """
 Middleware de sécurité et rate limiting pour HRAE
 
-Fonctionnalités:
-- Gestion centralisée des erreurs Ratelimited
-- Ajout d'en-têtes de rate limiting informatifs
-- Logs détaillés des tentatives bloquées
-- Détection des patterns d'attaque
+Fonctionnalités (HRAESecurityMiddleware, compatible WSGI et ASGI):
+- Rejet immédiat des IP bannies (réputation stockée dans Redis)
+- Détection des patterns d'attaque (blocage 403 optionnel)
+- Seau à jetons global par IP et par classe de route (GET, API AJAX...)
+- Gestion centralisée des erreurs Ratelimited (page 429 pré-rendue, core.error_pages)
+- En-têtes RateLimit-* / Retry-After (moteur à fenêtre glissante core.ratelimit)
+- Logs détaillés des tentatives bloquées (champs structurés, échantillonnés par core.logs)
+
+Et CacheableAnonymousMiddleware : pages publiques sans cookie rendues
+cachables par les proxys ; AxesAsyncMiddleware : AxesMiddleware compatible ASGI.
 """
 
-from django.shortcuts import render
-from django.http import JsonResponse
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from axes.helpers import get_lockout_response
+from axes.middleware import AxesMiddleware
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse, HttpResponseForbidden
+from django.utils.cache import cc_delim_re, patch_cache_control
 from django_ratelimit.exceptions import Ratelimited
+from core import metrics
+from core.error_pages import aerror_response, error_response
+from core.ratelimit import get_token_bucket
+from core.reputation import get_reputation
 import logging
+import math
+import re
+import time
 
 logger = logging.getLogger('django_ratelimit')
+security_logger = logging.getLogger('django.security')
 
 
-class RateLimitMiddleware:
+def get_client_ip(request):
+    """
+    Récupère l'adresse IP réelle du client derrière TRUSTED_PROXY_COUNT
+    proxys (Nginx). Chaque proxy ajoute l'adresse de son interlocuteur à la
+    fin de X-Forwarded-For : seule l'entrée ajoutée par le proxy le plus
+    externe est fiable, celles qui précèdent sont fournies par le client.
+    Sans proxy de confiance (0) ou sans en-tête complet : REMOTE_ADDR.
+    Calculée une seule fois par requête puis mémorisée sur la requête.
+    """
+    ip = getattr(request, 'client_ip', None)
+    if ip is None:
+        proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 1)
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        hops = [hop.strip() for hop in x_forwarded_for.split(',')] if x_forwarded_for else []
+        if proxies and len(hops) >= proxies and hops[-proxies]:
+            ip = hops[-proxies]
+        else:
+            ip = request.META.get('REMOTE_ADDR')
+        request.client_ip = ip
+    return ip
+
+
+def compile_patterns(patterns):
+    """
+    Compile une liste de sous-chaînes en une seule regex insensible à la casse.
+    Les patterns les plus longs passent en premier dans l'alternative.
+    Retourne None si la liste est vide.
     """
-    Middleware pour gérer les exceptions de rate limiting de manière centralisée
+    patterns = sorted({p for p in patterns if p}, key=len, reverse=True)
+    if not patterns:
+        return None
+    return re.compile('|'.join(re.escape(p) for p in patterns), re.IGNORECASE)
+
+
+def _page_number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class HRAESecurityMiddleware:
+    """
+    Middleware de sécurité unique, à placer en tête de MIDDLEWARE.
+
+    Synchrone et asynchrone : sous ASGI, aucun passage sync/async (thread)
+    n'est ajouté par requête. Les appels Redis restent synchrones : sur un
+    Redis local, un aller-retour coûte moins qu'un changement de thread, et
+    le cas courant (IP saine déjà vue) est servi par le LRU en mémoire.
+
+    1. __call__ : IP bannie -> 403, requête suspecte -> log (+ 403 en mode blocage)
+    2. process_view : seau à jetons par IP/classe de route -> 429 pré-rendue
+    3. process_exception : Ratelimited (décorateur @ratelimit) -> page 429
+    4. réponse : en-têtes RateLimit-* / Retry-After
     """
-    
+
+    sync_capable = True
+    async_capable = True
+
+    # Patterns suspects dans les URLs (valeurs par défaut)
+    SUSPICIOUS_PATTERNS = [
+        'wp-admin',
+        'wp-login',
+        'phpmyadmin',
+        'admin.php',
+        '.env',
+        '.git',
+        'config.php',
+        'shell',
+        'eval(',
+        'base64_decode',
+        '../',
+        '..\\',
+    ]
+
+    # User-Agent de scanners connus (valeurs par défaut)
+    SUSPICIOUS_AGENTS = ['sqlmap', 'nikto', 'masscan', 'nmap', 'dirbuster']
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django adapte process_view selon sa nature : version coroutine
+            # pour éviter un sync_to_async par requête
+            self.process_view = self._aprocess_view
+
+        # Réputation IP (core.reputation)
+        self.reputation = (
+            get_reputation() if getattr(settings, 'IP_REPUTATION_ENABLED', False) else None
+        )
+
+        # Détection d'attaques : une regex compilée par liste
+        self.path_matcher = compile_patterns(
+            getattr(settings, 'ATTACK_DETECTION_PATTERNS', self.SUSPICIOUS_PATTERNS)
+        )
+        self.agent_matcher = compile_patterns(
+            getattr(settings, 'ATTACK_DETECTION_USER_AGENTS', self.SUSPICIOUS_AGENTS)
+        )
+        # Mode blocage : répondre 403 immédiatement au lieu de seulement logger
+        self.block = getattr(settings, 'ATTACK_DETECTION_BLOCK', False)
+
+        # Seau à jetons global (THROTTLE_RULES)
+        self.throttle = getattr(settings, 'THROTTLE_ENABLED', False)
+        self.rules = list(getattr(settings, 'THROTTLE_RULES', {}).items())
+        self.bucket = get_token_bucket() if self.throttle else None
+
     def __call__(self, request):
-        response = self.get_response(request)
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.check_request(request)
+        if response is None:
+            response = self.get_response(request)
+        self.add_ratelimit_headers(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = self.check_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        self.add_ratelimit_headers(request, response)
         return response
-    
+
+    # ------------------------------------------------------------------
+    # 1. Avant la pile : IP bannies et requêtes suspectes
+    # ------------------------------------------------------------------
+    def check_request(self, request):
+        ip = get_client_ip(request)
+
+        if self.reputation is not None:
+            banned_until = self.reputation.banned_until(ip)
+            if banned_until:
+                metrics.inc('hrae_banned_requests_total')
+                response = HttpResponseForbidden(b'Access Denied', content_type='text/plain')
+                response['Retry-After'] = str(max(1, math.ceil(banned_until - time.time())))
+                return response
+
+        if self.is_suspicious_request(request):
+            user_agent = request.META.get('HTTP_USER_AGENT', 'Unknown')
+            security_logger.error(
+                "[ATTACK DETECTED] Suspicious request - IP: %s - Path: %s - User-Agent: %s",
+                ip, request.path, user_agent,
+                extra={'event': 'attack', 'ip': ip, 'path': request.path, 'user_agent': user_agent},
+            )
+
+            metrics.inc('hrae_attacks_detected_total', {'blocked': 'true' if self.block else 'false'})
+            # Détection seulement journalisée (blocage désactivé) : pas de
+            # points de réputation, sinon elle mènerait quand même au bannissement
+            if self.block and self.reputation is not None:
+                self.reputation.flag(ip, 'attack')
+
+            if self.block:
+                # Réponse minimale : ni template, ni base de données
+                return HttpResponseForbidden(b'Access Denied', content_type='text/plain')
+
+        return None
+
+    def is_suspicious_request(self, request):
+        """
+        Vérifie si la requête contient des patterns suspects
+        """
+        if self.path_matcher and self.path_matcher.search(request.path):
+            return True
+
+        # Vérifier les User-Agent suspects (bots malveillants)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        if user_agent and self.agent_matcher and self.agent_matcher.search(user_agent):
+            return True
+
+        return False
+
+    # ------------------------------------------------------------------
+    # 2. Après résolution de l'URL, avant la vue : seau à jetons
+    # ------------------------------------------------------------------
+    def classify(self, request):
+        """
+        Retourne (classe, règle) de la première règle correspondante, ou None
+        """
+        match = request.resolver_match
+        if match is not None and 'admin' in match.namespaces:
+            # L'admin est protégé par axes et l'authentification
+            return None
+        url_name = match.url_name if match is not None else None
+
+        for route_class, rule in self.rules:
+            if 'url_names' in rule and url_name not in rule['url_names']:
+                continue
+            if 'query_params' in rule and not any(
+                request.GET.get(param) for param in rule['query_params']
+            ):
+                continue
+            if 'page_params' in rule and not any(
+                _page_number(request.GET.get(param)) >= rule.get('min_page', 1)
+                for param in rule['page_params']
+            ):
+                continue
+            return route_class, rule
+        return None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        refused = self.throttle_request(request)
+        if refused is None:
+            return None
+        return self.throttle_response(request, *refused, error_response(429))
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        refused = self.throttle_request(request)
+        if refused is None:
+            return None
+        return self.throttle_response(request, *refused, await aerror_response(429))
+
+    def throttle_request(self, request):
+        """
+        Retourne (classe, délai d'attente) si la requête est refusée, sinon None
+        """
+        if not self.throttle:
+            return None
+        classified = self.classify(request)
+        if classified is None:
+            return None
+        route_class, rule = classified
+        ip = get_client_ip(request)
+        if ip in settings.INTERNAL_IPS:
+            return None
+
+        retry_after = self.bucket.consume(route_class, ip, rule['capacity'], rule['rate'])
+        if not retry_after:
+            return None
+
+        logger.info(
+            "[THROTTLE] Blocked request - IP: %s - Class: %s - Path: %s", ip, route_class, request.path,
+            extra={'event': 'throttle', 'ip': ip, 'path': request.path, 'route_class': route_class},
+        )
+        metrics.inc('hrae_ratelimit_blocks_total', {'kind': 'throttle', 'scope': route_class})
+        return route_class, retry_after
+
+    @staticmethod
+    def throttle_response(request, route_class, retry_after, html_response):
+        if request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest' or route_class == 'api':
+            response = JsonResponse({'error': 'rate_limit_exceeded', 'status': 429}, status=429)
+        else:
+            response = html_response
+        response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    # ------------------------------------------------------------------
+    # 3. Exceptions Ratelimited levées par @ratelimit
+    # ------------------------------------------------------------------
     def process_exception(self, request, exception):
         """
         Intercepte les exceptions Ratelimited et retourne une réponse appropriée
         """
         if isinstance(exception, Ratelimited):
+            ip = get_client_ip(request)
             # Logger l'événement avec détails
+            user = str(request.user) if request.user.is_authenticated else 'Anonymous'
+            user_agent = request.META.get('HTTP_USER_AGENT', 'Unknown')
             logger.warning(
-                f"[RATE LIMIT] Blocked request - "
-                f"IP: {self.get_client_ip(request)} - "
-                f"User: {request.user if request.user.is_authenticated else 'Anonymous'} - "
-                f"Path: {request.path} - "
-                f"Method: {request.method} - "
-                f"User-Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
+                "[RATE LIMIT] Blocked request - IP: %s - User: %s - Path: %s - Method: %s - User-Agent: %s",
+                ip, user, request.path, request.method, user_agent,
+                extra={
+                    'event': 'rate_limit', 'ip': ip, 'user': user, 'path': request.path,
+                    'method': request.method, 'user_agent': user_agent,
+                },
             )
-            
+
+            match = request.resolver_match
+            metrics.inc('hrae_ratelimit_blocks_total', {
+                'kind': 'ratelimit', 'scope': match.url_name if match is not None else 'none',
+            })
+
+            # Récidive : points de réputation (bannissement au-delà du seuil)
+            if self.reputation is not None:
+                self.reputation.flag(ip, 'ratelimit')
+
             # Retourner réponse appropriée selon le type de requête
             if request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
                 # Requête AJAX: retourner JSON
@@ -52,121 +318,114 @@ class RateLimitMiddleware:
                     'status': 429
                 }, status=429)
             else:
-                # Requête normale: retourner template HTML
-                from Home.models import SiteSettings
-                settings = SiteSettings.get_settings()
-                return render(request, 'errors/429.html', {
-                    'settings': settings,
-                }, status=429)
-        
+                # Requête normale: page 429 pré-rendue (ni SQL ni template)
+                return error_response(429)
+
         return None
-    
+
+    # ------------------------------------------------------------------
+    # 4. En-têtes de réponse
+    # ------------------------------------------------------------------
     @staticmethod
-    def get_client_ip(request):
+    def add_ratelimit_headers(request, response):
         """
-        Récupère l'adresse IP réelle du client (même derrière proxy/Nginx)
+        En-têtes RateLimit-* réels, calculés par core.ratelimit
+        (uniquement pour les vues limitées par le décorateur @ratelimit)
         """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            # Prendre la première IP (la vraie IP du client)
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        result = getattr(request, 'ratelimit', None)
+        if result is not None:
+            response['RateLimit-Limit'] = str(result.limit)
+            response['RateLimit-Remaining'] = str(result.remaining)
+            response['RateLimit-Reset'] = str(result.reset)
+            response['RateLimit-Policy'] = f'{result.limit};w={result.period}'
+            if result.limited and response.status_code == 429:
+                response['Retry-After'] = str(result.reset)
 
 
-class SecurityHeadersMiddleware:
+class CacheableAnonymousMiddleware:
     """
-    Middleware pour ajouter des en-têtes de sécurité supplémentaires
-    (en complément de ceux déjà dans Nginx)
+    Rend cachables (Cache-Control: public) les GET des pages publiques
+    listées dans COOKIELESS_CACHE_URL_NAMES.
+
+    Sessions, utilisateur et messages sont résolus paresseusement par Django :
+    tant que la vue et les templates n'y touchent pas, la réponse ne porte ni
+    Set-Cookie ni Vary: Cookie. Ce middleware doit être placé au-dessus de
+    SessionMiddleware et CsrfViewMiddleware pour voir les en-têtes finaux ;
+    une réponse qui dépend malgré tout des cookies n'est jamais marquée
+    publique (et l'écart est loggé).
     """
-    
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
+        if not getattr(settings, 'COOKIELESS_CACHE_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.url_names = frozenset(getattr(settings, 'COOKIELESS_CACHE_URL_NAMES', ()))
+        self.max_age = getattr(settings, 'COOKIELESS_CACHE_MAX_AGE', 300)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
         response = self.get_response(request)
-        
-        # Ajouter des headers de rate limiting informatifs
-        if hasattr(response, 'status_code') and response.status_code != 429:
-            # Headers informatifs (optionnel, pour debugging)
-            response['X-RateLimit-Limit'] = '100'  # Limite par défaut
-            response['X-RateLimit-Remaining'] = 'variable'
-        
+        self.mark_cacheable(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.mark_cacheable(request, response)
         return response
 
+    def mark_cacheable(self, request, response):
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return
+        match = request.resolver_match
+        if match is None or match.url_name not in self.url_names:
+            return
+        if response.has_header('Cache-Control'):
+            return
+
+        vary = {v.strip().lower() for v in cc_delim_re.split(response.get('Vary', '')) if v}
+        if response.cookies or 'cookie' in vary:
+            logger.warning(
+                "[CACHE] Public page depends on cookies, not cacheable - URL name: %s - Path: %s",
+                match.url_name, request.path,
+                extra={'event': 'cache_cookie', 'url_name': match.url_name, 'path': request.path},
+            )
+            return
+
+        patch_cache_control(response, public=True, max_age=self.max_age)
+
 
-class AttackDetectionMiddleware:
+class AxesAsyncMiddleware(AxesMiddleware):
     """
-    Middleware pour détecter les patterns d'attaque suspects
+    AxesMiddleware synchrone et asynchrone : sous ASGI, la pile reste
+    entièrement async jusqu'aux vues de Home/async_views.py
     """
-    
-    # Patterns suspects dans les URLs
-    SUSPICIOUS_PATTERNS = [
-        'wp-admin',
-        'wp-login',
-        'phpmyadmin',
-        'admin.php',
-        '.env',
-        '.git',
-        'config.php',
-        'shell',
-        'eval(',
-        'base64_decode',
-        '../',
-        '..\\',
-    ]
-    
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
-        self.get_response = get_response
-        self.logger = logging.getLogger('django.security')
-        
+        super().__init__(get_response)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
     def __call__(self, request):
-        # Vérifier les patterns suspects
-        if self.is_suspicious_request(request):
-            self.logger.error(
-                f"[ATTACK DETECTED] Suspicious request - "
-                f"IP: {self.get_client_ip(request)} - "
-                f"Path: {request.path} - "
-                f"User-Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
-            )
-            
-            # Option 1: Bloquer la requête (retourner 403)
-            # from django.http import HttpResponseForbidden
-            # return HttpResponseForbidden("Access Denied")
-            
-            # Option 2: Laisser passer mais logger (pour analyse)
-            # (recommandé pour éviter les faux positifs)
-        
-        response = self.get_response(request)
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+
+        if getattr(settings, 'AXES_ENABLED', True) and getattr(request, 'axes_locked_out', None):
+            credentials = getattr(request, 'axes_credentials', None)
+            response = await sync_to_async(get_lockout_response)(request, credentials)
+
         return response
-    
-    def is_suspicious_request(self, request):
-        """
-        Vérifie si la requête contient des patterns suspects
-        """
-        path_lower = request.path.lower()
-        
-        for pattern in self.SUSPICIOUS_PATTERNS:
-            if pattern in path_lower:
-                return True
-        
-        # Vérifier les User-Agent suspects (bots malveillants)
-        user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-        suspicious_agents = ['sqlmap', 'nikto', 'masscan', 'nmap', 'dirbuster']
-        
-        for agent in suspicious_agents:
-            if agent in user_agent:
-                return True
-        
-        return False
-    
-    @staticmethod
-    def get_client_ip(request):
-        """Récupère l'IP réelle du client"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
\ No newline at end of file
@@ -0,0 +1,300 @@
+"""
+Profilage à la demande d'une requête (superutilisateurs uniquement)
+
+Activation, requête par requête :
+- paramètre ?_profile=1 (cProfile, déterministe) ou ?_profile=sampling
+  (pyinstrument, par échantillonnage, si installé), pour un superutilisateur
+  connecté ;
+- en-tête X-HRAE-Profile: <jeton signé>, pour profiler la page telle qu'un
+  visiteur anonyme la reçoit (curl, test de charge). Le jeton est affiché
+  dans l'admin (Profils de requêtes) et expire après PROFILING_TOKEN_MAX_AGE.
+
+Le résultat est enregistré dans PROFILING_DIR (LOGS_DIR/profiles) : fichier
+pstats (.prof, lisible par snakeviz) ou page HTML pyinstrument, accompagné
+d'un .json (URL, durée, statut, utilisateur). Les PROFILING_MAX_FILES plus
+récents sont conservés. L'admin liste les profils (core/urls.py).
+
+Sous ASGI, cProfile mesure le thread de la boucle d'événements : les autres
+requêtes servies pendant ce temps apparaissent aussi dans le profil.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import pstats
+import re
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.utils.text import slugify
+
+from core.middleware import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_HRAE_PROFILE'
+TOKEN_SALT = 'core.profiling'
+PROFILE_NAME = re.compile(r'^[\w.-]+$')
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+def profiles_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', settings.LOGS_DIR / 'profiles'))
+
+
+def make_token(user):
+    """Jeton signé de l'en-tête X-HRAE-Profile"""
+    return signing.dumps(user.pk, salt=TOKEN_SALT)
+
+
+def token_user(token):
+    """Superutilisateur désigné par le jeton, ou None (jeton invalide ou expiré)"""
+    try:
+        pk = signing.loads(token, salt=TOKEN_SALT, max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=pk, is_active=True, is_superuser=True).first()
+
+
+class Profiler:
+    """cProfile ou pyinstrument autour d'un appel"""
+
+    def __init__(self, mode):
+        self.sampling = False
+        if mode == 'sampling':
+            try:
+                from pyinstrument import Profiler as SamplingProfiler
+            except ImportError:
+                logger.warning("[PROFILE] pyinstrument not installed, falling back to cProfile")
+            else:
+                self.profiler = SamplingProfiler(async_mode='enabled')
+                self.sampling = True
+        if not self.sampling:
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        if self.sampling:
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.sampling:
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def save(self, base):
+        if self.sampling:
+            path = base.with_suffix('.html')
+            path.write_text(self.profiler.output_html(), encoding='utf-8')
+        else:
+            path = base.with_suffix('.prof')
+            self.profiler.dump_stats(path)
+        return path
+
+
+class ProfilingMiddleware:
+    """
+    Profile la requête (vue et middlewares placés après celui-ci) quand elle
+    le demande. À placer après AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = self.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        profiler = Profiler(mode)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        return self.finish(request, response, profiler, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        mode = self.requested_mode(request)
+        if mode is None:
+            return await self.get_response(request)
+        profiler = Profiler(mode)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+        return self.finish(request, response, profiler, time.perf_counter() - started)
+
+    @staticmethod
+    def requested_mode(request):
+        """'deterministic', 'sampling' ou None (pas de profilage)"""
+        token = request.META.get(HEADER)
+        flag = request.GET.get(QUERY_PARAM)
+        if token is None and flag is None:
+            return None
+
+        if token is not None:
+            # Résolution du jeton (une requête SQL) uniquement si l'en-tête est présent
+            user = token_user(token)
+            if user is None:
+                ip = get_client_ip(request)
+                logger.warning(
+                    "[PROFILE] Invalid or expired token - IP: %s - Path: %s", ip, request.path,
+                    extra={'event': 'profile_denied', 'ip': ip, 'path': request.path},
+                )
+                return None
+            request.profiled_by = user.get_username()
+        else:
+            user = getattr(request, 'user', None)
+            if user is None or not user.is_superuser:
+                return None
+            request.profiled_by = user.get_username()
+        return 'sampling' if flag == 'sampling' else 'deterministic'
+
+    def finish(self, request, response, profiler, duration):
+        directory = profiles_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        name = '{}-{}-{}'.format(
+            time.strftime('%Y%m%d-%H%M%S'),
+            slugify(request.path.strip('/').replace('/', '-'))[:60] or 'root',
+            int(time.time() * 1000) % 1000,
+        )
+        path = profiler.save(directory / name)
+        meta = {
+            'name': name,
+            'file': path.name,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'user': request.profiled_by,
+            'backend': 'pyinstrument' if profiler.sampling else 'cProfile',
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        (directory / f'{name}.json').write_text(json.dumps(meta), encoding='utf-8')
+        prune(directory)
+
+        ip = get_client_ip(request)
+        logger.info(
+            "[PROFILE] Request profiled - IP: %s - Path: %s - Duration: %sms - Profile: %s",
+            ip, request.path, meta['duration_ms'], name,
+            extra={'event': 'profile', 'ip': ip, 'path': request.path, 'profile': name},
+        )
+        response['X-Profile-Id'] = name
+        return response
+
+
+def list_profiles(directory=None):
+    directory = directory or profiles_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for meta_path in directory.glob('*.json'):
+        try:
+            profiles.append(json.loads(meta_path.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda meta: meta['name'], reverse=True)
+
+
+def prune(directory):
+    """Ne garde que les PROFILING_MAX_FILES profils les plus récents"""
+    for meta in list_profiles(directory)[getattr(settings, 'PROFILING_MAX_FILES', 50):]:
+        for filename in (meta['file'], f"{meta['name']}.json"):
+            (directory / filename).unlink(missing_ok=True)
+
+
+def get_profile(name):
+    if not PROFILE_NAME.match(name):
+        raise Http404
+    meta_path = profiles_dir() / f'{name}.json'
+    if not meta_path.is_file():
+        raise Http404
+    return json.loads(meta_path.read_text(encoding='utf-8'))
+
+
+# ========================================
+# Vues d'administration (core/urls.py)
+# ========================================
+def superuser_view(view):
+    def wrapped(request, *args, **kwargs):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        return view(request, *args, **kwargs)
+    return admin.site.admin_view(wrapped)
+
+
+def _profile_list(request):
+    context = {
+        **admin.site.each_context(request),
+        'title': "Profils de requêtes",
+        'profiles': list_profiles(),
+        'token': make_token(request.user),
+        'token_max_age': getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600) // 60,
+        'query_param': QUERY_PARAM,
+    }
+    return TemplateResponse(request, 'admin/profiling/profile_list.html', context)
+
+
+def _profile_detail(request, name):
+    meta = get_profile(name)
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in SORT_KEYS:
+        sort = 'cumulative'
+
+    report = None
+    if meta['file'].endswith('.prof'):
+        output = io.StringIO()
+        stats = pstats.Stats(str(profiles_dir() / meta['file']), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(getattr(settings, 'PROFILING_REPORT_LINES', 60))
+        report = output.getvalue()
+
+    context = {
+        **admin.site.each_context(request),
+        'title': f"Profil {meta['name']}",
+        'meta': meta,
+        'report': report,
+        'sort': sort,
+        'sort_keys': SORT_KEYS,
+    }
+    return TemplateResponse(request, 'admin/profiling/profile_detail.html', context)
+
+
+def _profile_download(request, name):
+    meta = get_profile(name)
+    path = profiles_dir() / meta['file']
+    if not path.is_file():
+        raise Http404
+    if path.suffix == '.html':
+        # Rapport pyinstrument : affiché dans le navigateur
+        return FileResponse(path.open('rb'), content_type='text/html; charset=utf-8')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
+
+
+profile_list = superuser_view(_profile_list)
+profile_detail = superuser_view(_profile_detail)
+profile_download = superuser_view(_profile_download)
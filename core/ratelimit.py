@@ -0,0 +1,337 @@
+"""
+Moteur de rate limiting à fenêtre glissante pour HRAE
+
+Compteur à fenêtre glissante (fenêtre courante + fenêtre précédente pondérée)
+stocké dans Redis. La vérification et l'incrément sont faits par un script
+Lua atomique : un seul aller-retour par requête, sans condition de course
+entre les workers gunicorn. Les simples lectures (sans incrément) passent
+par un pipeline Redis.
+
+Le décorateur ``ratelimit`` remplace celui de django_ratelimit (mêmes
+paramètres key/rate/method/block) et lève la même exception ``Ratelimited``,
+gérée par ``core.middleware.HRAESecurityMiddleware``. Le résultat est attaché
+à ``request.ratelimit`` pour que ``HRAESecurityMiddleware`` expose les
+en-têtes RateLimit-* et Retry-After.
+
+``TokenBucketLimiter`` est un seau à jetons par IP et par classe de route
+(API, recherche, pagination profonde...), utilisé par
+``core.middleware.HRAESecurityMiddleware`` sur toutes les requêtes. Un seau
+local (par processus) sert de pré-filtre : s'il est vide, le seau global
+l'est aussi et la requête est refusée sans appel Redis.
+"""
+
+from collections import namedtuple
+from functools import lru_cache, wraps
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django_ratelimit.exceptions import Ratelimited
+
+from core.reputation import LocalLRU
+
+ALL = None
+
+RateLimitResult = namedtuple(
+    'RateLimitResult', ['limited', 'limit', 'remaining', 'reset', 'period']
+)
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+# KEYS[1] = fenêtre courante, KEYS[2] = fenêtre précédente
+# ARGV[1] = limite, ARGV[2] = durée de la fenêtre (s),
+# ARGV[3] = secondes écoulées dans la fenêtre courante, ARGV[4] = incrément
+SLIDING_WINDOW_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local increment = tonumber(ARGV[4])
+local weighted = previous * (period - elapsed) / period + current
+if weighted + increment > limit then
+    return {0, current, previous}
+end
+if increment > 0 then
+    current = redis.call('INCRBY', KEYS[1], increment)
+    if current == increment then
+        redis.call('EXPIRE', KEYS[1], period * 2)
+    end
+end
+return {1, current, previous}
+"""
+
+# KEYS[1] = seau (hash tokens/ts)
+# ARGV[1] = capacité, ARGV[2] = jetons par seconde, ARGV[3] = maintenant, ARGV[4] = coût
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+def parse_rate(rate):
+    """
+    '5/h' -> (5, 3600), '100/15m' -> (100, 900)
+    """
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate: {rate!r}")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * _PERIODS[unit]
+
+
+class SlidingWindowLimiter:
+    """
+    Compteur à fenêtre glissante sur le cache Redis (django-redis)
+    """
+
+    KEY_PREFIX = 'rl'
+
+    def __init__(self, cache_alias='default'):
+        self.cache_alias = cache_alias
+        self._script = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _redis(self):
+        """Connexion Redis brute, ou None si le cache n'est pas django-redis"""
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection(self.cache_alias)
+        except (ImportError, NotImplementedError):
+            return None
+
+    def _keys(self, group, key, period, now):
+        window = int(now // period)
+        base = f'{self.KEY_PREFIX}:{group}:{key}:{period}'
+        return f'{base}:{window}', f'{base}:{window - 1}', now - window * period
+
+    def hit(self, group, key, rate, increment=1):
+        """
+        Vérifie la limite et compte la requête (si autorisée).
+        Un seul appel EVALSHA vers Redis.
+        """
+        limit, period = parse_rate(rate)
+        now = time.time()
+        current_key, previous_key, elapsed = self._keys(group, key, period, now)
+
+        client = self._redis()
+        if client is not None:
+            if self._script is None:
+                self._script = client.register_script(SLIDING_WINDOW_LUA)
+            allowed, current, previous = self._script(
+                keys=[self.cache.make_key(current_key), self.cache.make_key(previous_key)],
+                args=[limit, period, elapsed, increment],
+                client=client,
+            )
+        else:
+            allowed, current, previous = self._hit_fallback(
+                current_key, previous_key, limit, period, elapsed, increment
+            )
+
+        return self._result(not allowed, limit, period, elapsed, int(current), int(previous))
+
+    def peek(self, group, key, rate):
+        """Lecture seule de l'état courant (GET pipelinés, sans incrément)"""
+        limit, period = parse_rate(rate)
+        now = time.time()
+        current_key, previous_key, elapsed = self._keys(group, key, period, now)
+
+        client = self._redis()
+        if client is not None:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(self.cache.make_key(current_key))
+            pipe.get(self.cache.make_key(previous_key))
+            current, previous = (int(value or 0) for value in pipe.execute())
+        else:
+            values = self.cache.get_many([current_key, previous_key])
+            current = int(values.get(current_key) or 0)
+            previous = int(values.get(previous_key) or 0)
+
+        weighted = previous * (period - elapsed) / period + current
+        return self._result(weighted >= limit, limit, period, elapsed, current, previous)
+
+    def _result(self, limited, limit, period, elapsed, current, previous):
+        weighted = previous * (period - elapsed) / period + current
+        remaining = max(0, math.floor(limit - weighted))
+        if not limited or current >= limit or not previous:
+            # Il faut attendre la fenêtre suivante
+            reset = math.ceil(period - elapsed)
+        else:
+            # Attendre que le poids de la fenêtre précédente libère une place
+            free_at = period - (limit - 1 - current) * period / previous
+            reset = max(1, math.ceil(free_at - elapsed))
+        return RateLimitResult(limited, limit, remaining, reset, period)
+
+    def _hit_fallback(self, current_key, previous_key, limit, period, elapsed, increment):
+        """Repli sans Redis (cache local en développement, non atomique)"""
+        values = self.cache.get_many([current_key, previous_key])
+        current = int(values.get(current_key) or 0)
+        previous = int(values.get(previous_key) or 0)
+        if previous * (period - elapsed) / period + current + increment > limit:
+            return 0, current, previous
+        if increment:
+            self.cache.add(current_key, 0, period * 2)
+            current = self.cache.incr(current_key, increment)
+        return 1, current, previous
+
+
+class TokenBucketLimiter:
+    """
+    Seau à jetons partagé entre workers (Redis) avec pré-filtre local
+    """
+
+    KEY_PREFIX = 'tb'
+
+    def __init__(self, cache_alias='default', local_size=10000):
+        self.cache_alias = cache_alias
+        self.local = LocalLRU(local_size)
+        self._script = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _redis(self):
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection(self.cache_alias)
+        except (ImportError, NotImplementedError):
+            return None
+
+    @staticmethod
+    def _refill(tokens, ts, now, capacity, refill):
+        return min(capacity, tokens + max(0.0, now - ts) * refill)
+
+    def _store(self, local_key, tokens, now, capacity, refill):
+        # L'entrée locale expire quand le seau serait de nouveau plein
+        expires_at = now + (capacity - tokens) / refill + 1
+        self.local.set(local_key, (tokens, now), expires_at)
+
+    def consume(self, route_class, key, capacity, rate, cost=1):
+        """
+        Consomme ``cost`` jetons. Retourne le délai d'attente en secondes
+        (0 si la requête est autorisée).
+        """
+        count, period = parse_rate(rate)
+        refill = count / period
+        now = time.time()
+        local_key = f'{route_class}:{key}'
+
+        # Pré-filtre local : ce processus a vu une partie des requêtes du
+        # client, son seau est donc toujours plus plein que le seau global
+        state = self.local.get(local_key, now)
+        tokens, ts = state if state is not None else (capacity, now)
+        tokens = self._refill(tokens, ts, now, capacity, refill)
+        if tokens < cost:
+            self._store(local_key, tokens, now, capacity, refill)
+            return (cost - tokens) / refill
+        local_tokens = tokens - cost
+
+        client = self._redis()
+        if client is None:
+            # Sans Redis (développement) : seau local uniquement
+            self._store(local_key, local_tokens, now, capacity, refill)
+            return 0
+
+        if self._script is None:
+            self._script = client.register_script(TOKEN_BUCKET_LUA)
+        try:
+            allowed, global_tokens = self._script(
+                keys=[self.cache.make_key(f'{self.KEY_PREFIX}:{local_key}')],
+                args=[capacity, refill, now, cost],
+                client=client,
+            )
+        except Exception:
+            # Redis indisponible : on s'en tient au pré-filtre local
+            self._store(local_key, local_tokens, now, capacity, refill)
+            return 0
+
+        # Le seau local s'aligne sur le global (jamais plus plein que lui)
+        global_tokens = float(global_tokens)
+        tokens = min(local_tokens, global_tokens) if allowed else min(tokens, global_tokens)
+        self._store(local_key, tokens, now, capacity, refill)
+        if allowed:
+            return 0
+        return (cost - global_tokens) / refill
+
+
+@lru_cache(maxsize=None)
+def get_token_bucket():
+    return TokenBucketLimiter(getattr(settings, 'RATELIMIT_USE_CACHE', 'default'))
+
+
+@lru_cache(maxsize=None)
+def get_limiter():
+    """Instance unique par processus (le script Lua n'est enregistré qu'une fois)"""
+    return SlidingWindowLimiter(getattr(settings, 'RATELIMIT_USE_CACHE', 'default'))
+
+
+def _get_key(request, key):
+    if callable(key):
+        return key(request)
+    if key == 'ip':
+        # Import local : core.middleware importe ce module
+        from core.middleware import get_client_ip
+        return get_client_ip(request)
+    if key == 'user':
+        return str(request.user.pk) if request.user.is_authenticated else None
+    raise ValueError(f"Unsupported ratelimit key: {key!r}")
+
+
+def ratelimit(group=None, key='ip', rate=None, method=ALL, block=True):
+    """
+    Décorateur de vue : limite ``rate`` par ``key`` pour les méthodes ``method``.
+    Les autres méthodes ne sont pas comptées mais reçoivent l'état courant
+    (lecture pipelinée) pour les en-têtes RateLimit-*.
+    """
+    methods = None if method is ALL else {
+        m.upper() for m in ([method] if isinstance(method, str) else method)
+    }
+
+    def decorator(fn):
+        view_group = group or f'{fn.__module__}.{fn.__qualname__}'
+
+        @wraps(fn)
+        def _wrapped(request, *args, **kwargs):
+            request.limited = getattr(request, 'limited', False)
+            if getattr(settings, 'RATELIMIT_ENABLE', True):
+                client_key = _get_key(request, key)
+                if client_key is not None:
+                    limiter = get_limiter()
+                    if methods is None or request.method in methods:
+                        result = limiter.hit(view_group, client_key, rate)
+                    else:
+                        result = limiter.peek(view_group, client_key, rate)
+                        result = result._replace(limited=False)
+                    request.ratelimit = result
+                    if result.limited:
+                        request.limited = True
+                        if block:
+                            raise Ratelimited()
+            return fn(request, *args, **kwargs)
+        return _wrapped
+    return decorator
@@ -0,0 +1,167 @@
+"""
+Réputation des adresses IP pour HRAE
+
+Chaque signalement (attaque détectée, rate limit dépassé) ajoute des points
+à l'IP dans le cache Redis partagé entre les workers. Au-delà d'un seuil,
+l'IP est bannie pour une durée croissante (IP_REPUTATION_BAN_STEPS).
+
+Un petit cache LRU local (par processus) évite un aller-retour Redis pour
+les IP déjà vues : HRAESecurityMiddleware rejette les IP bannies avant
+toute session, authentification ou requête SQL.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger('django.security')
+
+
+class LocalLRU:
+    """
+    Cache LRU en mémoire, thread-safe : ip -> (banni_jusqu_a, expiration)
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class IPReputation:
+    """
+    Stockage de la réputation des IP (points, bannissements progressifs)
+    """
+
+    KEY_PREFIX = 'iprep'
+
+    def __init__(self, cache_alias='default', threshold=5, window=3600,
+                 ban_steps=(60, 600, 3600, 86400), weights=None,
+                 whitelist=(), lru_size=10000, local_ttl=5):
+        self.cache_alias = cache_alias
+        self.threshold = threshold
+        self.window = window
+        self.ban_steps = list(ban_steps)
+        self.weights = weights or {}
+        self.whitelist = frozenset(whitelist)
+        self.local_ttl = local_ttl
+        self.local = LocalLRU(lru_size)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            cache_alias=getattr(settings, 'IP_REPUTATION_CACHE', 'default'),
+            threshold=getattr(settings, 'IP_REPUTATION_THRESHOLD', 5),
+            window=getattr(settings, 'IP_REPUTATION_WINDOW', 3600),
+            ban_steps=getattr(settings, 'IP_REPUTATION_BAN_STEPS', (60, 600, 3600, 86400)),
+            weights=getattr(settings, 'IP_REPUTATION_WEIGHTS', {}),
+            whitelist=getattr(settings, 'IP_REPUTATION_WHITELIST', settings.INTERNAL_IPS),
+            lru_size=getattr(settings, 'IP_REPUTATION_LRU_SIZE', 10000),
+            local_ttl=getattr(settings, 'IP_REPUTATION_LOCAL_TTL', 5),
+        )
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, kind, ip):
+        return f'{self.KEY_PREFIX}:{kind}:{ip}'
+
+    def banned_until(self, ip):
+        """
+        Retourne le timestamp de fin de bannissement de l'IP, ou 0.
+        Consulte d'abord le LRU local, puis Redis.
+        """
+        if not ip or ip in self.whitelist:
+            return 0
+        now = time.time()
+        until = self.local.get(ip, now)
+        if until is not None:
+            return until if until > now else 0
+
+        try:
+            until = self.cache.get(self._key('ban', ip)) or 0
+        except Exception:
+            # Redis indisponible : on laisse passer (fail open)
+            logger.exception("[IP REPUTATION] Cache unavailable")
+            return 0
+
+        if until > now:
+            self.local.set(ip, until, until)
+            return until
+        self.local.set(ip, 0, now + self.local_ttl)
+        return 0
+
+    def flag(self, ip, reason):
+        """
+        Ajoute des points à l'IP. Retourne le timestamp de fin de
+        bannissement si le seuil est atteint, sinon 0.
+        """
+        if not ip or ip in self.whitelist:
+            return 0
+        weight = self.weights.get(reason, 1)
+        strikes_key = self._key('strikes', ip)
+        try:
+            cache = self.cache
+            cache.add(strikes_key, 0, self.window)
+            strikes = cache.incr(strikes_key, weight)
+            if strikes < self.threshold:
+                return 0
+
+            # Bannissement progressif : chaque nouveau ban dure plus longtemps
+            bans_key = self._key('bans', ip)
+            cache.add(bans_key, 0, max(self.ban_steps) * 2)
+            level = cache.incr(bans_key)
+            duration = self.ban_steps[min(level, len(self.ban_steps)) - 1]
+            until = time.time() + duration
+            cache.set(self._key('ban', ip), until, duration)
+            cache.delete(strikes_key)
+        except Exception:
+            logger.exception("[IP REPUTATION] Cache unavailable")
+            return 0
+
+        self.local.set(ip, until, until)
+        logger.warning(
+            "[IP BANNED] IP: %s - Reason: %s - Level: %s - Duration: %ss", ip, reason, level, duration,
+            extra={'event': 'ip_banned', 'ip': ip, 'reason': reason, 'ban_level': level, 'duration': duration},
+        )
+        return until
+
+    def unban(self, ip):
+        """Lève le bannissement d'une IP (le LRU des autres workers expire seul)"""
+        self.cache.delete_many([self._key(kind, ip) for kind in ('ban', 'strikes', 'bans')])
+        self.local.set(ip, 0, time.time() + self.local_ttl)
+
+
+@lru_cache(maxsize=None)
+def get_reputation():
+    """Instance unique par processus (le LRU local est partagé entre threads)"""
+    return IPReputation.from_settings()
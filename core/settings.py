@@ -1,13 +1,16 @@
 from pathlib import Path
 import os
-from dotenv import load_dotenv
+import sys
 from django.utils.translation import gettext_lazy as _
 
-load_dotenv()
-
-# Load environment variables
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment variables (.env à la racine du projet, s'il existe :
+# pas de recherche dans les répertoires parents à chaque démarrage)
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
@@ -35,27 +38,42 @@ INSTALLED_APPS = [
     'django.contrib.sitemaps',
 
     'django_ckeditor_5',
+    # Balise {% tailwind_css %} de base.html
     'tailwind',
-    'theme',
-    'django_ratelimit',
     'axes',
 
     'Home',
 ]
 
+# Outillage Tailwind (npm, static_src) : en développement ou pour
+# `manage.py tailwind ...` uniquement ; les fichiers compilés de
+# theme/static sont servis via STATICFILES_DIRS
+if DEBUG or sys.argv[1:2] == ['tailwind']:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index('tailwind') + 1, 'theme')
+
 MIDDLEWARE = [
+    # Tout premier : durée de chaque requête, y compris les 403/429 (core.metrics)
+    'core.metrics.MetricsMiddleware',
+    # Requêtes SQL lentes : vue, template et ligne d'origine (core.slow_queries)
+    'core.slow_queries.SlowQueryMiddleware',
+    # En premier : IP bannies, requêtes suspectes (blocage optionnel) et seau
+    # à jetons par IP/route (process_view), avant sessions, auth, CSRF et axes.
+    # Exceptions Ratelimited et en-têtes RateLimit-* (cf. core/middleware.py)
+    'core.middleware.HRAESecurityMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Au-dessus des sessions/CSRF : voit les en-têtes Vary/Set-Cookie finaux
+    'core.middleware.CacheableAnonymousMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Profilage à la demande (?_profile=1, superutilisateurs) : après l'authentification
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'axes.middleware.AxesMiddleware',
-    'core.middleware.RateLimitMiddleware',
-    'core.middleware.SecurityHeadersMiddleware', 
-    'core.middleware.AttackDetectionMiddleware',
+    # AxesMiddleware compatible async (évite un passage sync/async sous ASGI)
+    'core.middleware.AxesAsyncMiddleware',
 ]
 
 AUTHENTICATION_BACKENDS = [
@@ -65,6 +83,14 @@ AUTHENTICATION_BACKENDS = [
 
 AXES_FAILURE_LIMIT = 5
 AXES_COOLOFF_TIME = 1
+# Tentatives et verrouillages dans Redis (compteurs atomiques) ; la base ne
+# reçoit que le journal d'audit, écrit en arrière-plan (core/axes_handler.py)
+AXES_HANDLER = 'core.axes_handler.AxesCacheAuditHandler'
+AXES_CACHE = 'default'
+AXES_ENABLE_ACCESS_FAILURE_LOG = True
+# axes.W002 cherche 'axes.middleware.AxesMiddleware' dans MIDDLEWARE ;
+# core.middleware.AxesAsyncMiddleware en hérite
+SILENCED_SYSTEM_CHECKS = ['axes.W002']
 
 
 CACHES = {
@@ -72,34 +98,134 @@ CACHES = {
         'BACKEND': 'django_redis.cache.RedisCache',
         'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # DefaultClient + compteurs hit/miss exposés par /metrics
+            'CLIENT_CLASS': 'core.metrics.MetricsCacheClient',
         },
     }
 }
 
+# Rate limiting des formulaires (core.ratelimit : fenêtre glissante, script Lua Redis)
 RATELIMIT_ENABLE = True
 RATELIMIT_USE_CACHE = 'default'
 
-# === Créer le répertoire logs s'il n'existe pas ===
-from pathlib import Path
+# === IP du client (core.middleware.get_client_ip) ===
+# Nombre de proxys de confiance devant gunicorn (Nginx : 1). L'IP retenue
+# est l'entrée de X-Forwarded-For ajoutée par le proxy le plus externe ; les
+# entrées précédentes, fournies par le client, sont ignorées. 0 : REMOTE_ADDR
+# (serveur exposé directement). Sert aux bannissements, seaux à jetons et
+# limites de débit.
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '1'))
+
+# === Détection d'attaques (core.middleware.HRAESecurityMiddleware) ===
+# Sous-chaînes recherchées (insensible à la casse) dans le chemin et le User-Agent
+ATTACK_DETECTION_PATTERNS = [
+    'wp-admin', 'wp-login', 'phpmyadmin', 'admin.php', '.env', '.git',
+    'config.php', 'shell', 'eval(', 'base64_decode', '../', '..\\',
+]
+ATTACK_DETECTION_USER_AGENTS = ['sqlmap', 'nikto', 'masscan', 'nmap', 'dirbuster']
+# True : répondre 403 immédiatement ; False : logger seulement
+ATTACK_DETECTION_BLOCK = os.getenv('ATTACK_DETECTION_BLOCK', 'False') == 'True'
+
+# === Réputation IP (core.reputation) ===
+IP_REPUTATION_ENABLED = os.getenv('IP_REPUTATION_ENABLED', 'True') == 'True'
+IP_REPUTATION_CACHE = 'default'
+# Points par type de signalement ; bannissement quand le total atteint le seuil.
+# 'attack' n'est compté que si ATTACK_DETECTION_BLOCK est actif
+IP_REPUTATION_WEIGHTS = {'attack': 5, 'ratelimit': 2}
+IP_REPUTATION_THRESHOLD = 5
+IP_REPUTATION_WINDOW = 3600  # durée de vie des points (secondes)
+# Durées des bannissements successifs : 1 min, 10 min, 1 h, 24 h
+IP_REPUTATION_BAN_STEPS = [60, 600, 3600, 86400]
+IP_REPUTATION_LRU_SIZE = 10000  # entrées du cache local par processus
+IP_REPUTATION_LOCAL_TTL = 5  # secondes avant de re-consulter Redis pour une IP saine
+
+# === Seau à jetons global (core.middleware.HRAESecurityMiddleware) ===
+# Première règle correspondante : capacity = rafale max, rate = rythme de recharge
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True') == 'True'
+THROTTLE_RULES = {
+    'api': {'url_names': ['api_staff_by_service', 'api_available_slots'], 'capacity': 20, 'rate': '60/m'},
+    'search': {'query_params': ['search'], 'capacity': 10, 'rate': '30/m'},
+    'deep_page': {
+        'page_params': ['page', 'articles_page', 'campaigns_page'],
+        'min_page': 5,
+        'capacity': 10,
+        'rate': '20/m',
+    },
+    'default': {'capacity': 60, 'rate': '300/m'},
+}
 
+# === Pages publiques cachables (core.middleware.CacheableAnonymousMiddleware) ===
+# Pages sans formulaire POST ni compteur : aucune session, aucun cookie,
+# pas de Vary: Cookie -> Cache-Control: public pour Nginx et les navigateurs
+COOKIELESS_CACHE_ENABLED = os.getenv('COOKIELESS_CACHE_ENABLED', 'True') == 'True'
+COOKIELESS_CACHE_URL_NAMES = [
+    'home', 'about', 'services', 'service_detail', 'team', 'doctor_detail',
+    'news', 'health_campaigns', 'our_partners', 'testimonials', 'practical_info',
+]
+COOKIELESS_CACHE_MAX_AGE = int(os.getenv('COOKIELESS_CACHE_MAX_AGE', 300))
+
+# === Pages d'erreur pré-rendues (core.error_pages) ===
+# 429/404/500 rendues une fois par langue, servies en octets depuis le cache
+ERROR_PAGES_CACHE = 'default'
+# Durée de la copie en mémoire de chaque worker (secondes)
+ERROR_PAGES_LOCAL_TTL = 60
+
+# === Métriques Prometheus (core.metrics, exposées sur /metrics) ===
+# Agrégées entre workers dans un hash Redis, vidé toutes les N secondes
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_CACHE = 'default'
+METRICS_FLUSH_INTERVAL = 5
+# Adresses autorisées à lire /metrics (serveur Prometheus)
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# === Répertoire des logs (créé par core.logs.AsyncLogHandler) ===
 LOGS_DIR = BASE_DIR / "logs"
-LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
-# === Logging pour le rate limiting ===
+# === Logging (core.logs) ===
+# Écriture dans un thread dédié (QueueHandler/QueueListener), JSON dans
+# logs/hrae.log, partagé par tous les workers ; rotation par logrotate
+# (deploy/hrae-logrotate). Les événements de sécurité répétés par IP sont
+# échantillonnés : LOG_BURST_LIMIT par fenêtre de LOG_BURST_WINDOW secondes,
+# puis une ligne de résumé.
+LOG_BURST_LIMIT = int(os.getenv('LOG_BURST_LIMIT', 5))
+LOG_BURST_WINDOW = int(os.getenv('LOG_BURST_WINDOW', 60))
+# Copie des logs sur la console (journal systemd) : par défaut en DEBUG seulement
+LOG_CONSOLE = os.getenv('LOG_CONSOLE', str(DEBUG)) == 'True'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
+        'async': {
+            'class': 'core.logs.AsyncLogHandler',
+            'filename': LOGS_DIR / 'hrae.log',
+            'console': LOG_CONSOLE,
+            'burst_limit': LOG_BURST_LIMIT,
+            'burst_window': LOG_BURST_WINDOW,
         },
     },
     'root': {
-        'handlers': ['console'],
+        'handlers': ['async'],
         'level': 'INFO',
     },
 }
+
+# === Profilage à la demande (core.profiling) ===
+# ?_profile=1 (superutilisateur) ou en-tête X-HRAE-Profile signé ; profils
+# consultables dans l'admin (Profils de requêtes)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True') == 'True'
+PROFILING_DIR = LOGS_DIR / 'profiles'
+PROFILING_TOKEN_MAX_AGE = 3600
+PROFILING_MAX_FILES = 50
+
+# === Requêtes lentes (core.slow_queries) ===
+# Requêtes SQL au-delà du seuil, avec leur origine (vue, template, code) ;
+# tampon circulaire Redis consultable dans l'admin (Requêtes lentes)
+SLOW_QUERY_ENABLED = os.getenv('SLOW_QUERY_ENABLED', 'True') == 'True'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_BUFFER_SIZE = 1000
+SLOW_QUERY_CACHE = 'default'
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -121,6 +247,65 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
+
+# === Déploiement ASGI (uvicorn) ===
+# True : pages publiques en lecture seule servies par Home/async_views.py
+# (ORM et cache asynchrones). À activer uniquement sous ASGI : sous WSGI,
+# chaque vue async ouvrirait sa propre boucle d'événements.
+ASYNC_VIEWS_ENABLED = os.getenv('ASYNC_VIEWS_ENABLED', 'False') == 'True'
+
+# === Créneaux de rendez-vous (Home/slots.py, api/available-slots/) ===
+# Horizon de réservation (jours), délai minimal avant un créneau (minutes)
+SLOTS_DAYS_AHEAD = 14
+SLOTS_MIN_NOTICE = 60
+# Cache par médecin, invalidé à chaque rendez-vous ou plage modifié (Home/signals.py)
+SLOTS_CACHE_TIMEOUT = 300
+
+# === Listes de référence en cache (Home/reference_data.py) ===
+# Versionnées et invalidées par Home/signals.py : la durée borne seulement la mémoire
+REFERENCE_DATA_TIMEOUT = 3600
+
+# === Emails (envoyés par la commande send_notifications) ===
+# Serveur SMTP de test en local : EMAIL_HOST=127.0.0.1 EMAIL_PORT=1025
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'HRAE <no-reply@localhost>')
+
+# === Notifications (Home/notifications.py, outbox) ===
+# Confirmations aux patients et alertes internes, mises en file dans la
+# transaction du formulaire puis envoyées par send_notifications
+NOTIFICATIONS_ENABLED = os.getenv('NOTIFICATIONS_ENABLED', 'True') == 'True'
+# Alertes internes (vide : email des Paramètres du site)
+NOTIFICATIONS_STAFF_EMAILS = [email for email in os.getenv('NOTIFICATIONS_STAFF_EMAILS', '').split(',') if email]
+# SMS : vide = désactivés ; Home.notifications.HTTPSMSBackend ou ConsoleSMSBackend
+NOTIFICATIONS_SMS_BACKEND = os.getenv('NOTIFICATIONS_SMS_BACKEND', '')
+NOTIFICATIONS_SMS_URL = os.getenv('NOTIFICATIONS_SMS_URL', 'http://127.0.0.1:8025/sms')
+NOTIFICATIONS_SMS_TOKEN = os.getenv('NOTIFICATIONS_SMS_TOKEN', '')
+NOTIFICATIONS_MAX_ATTEMPTS = 5
+# Nouvelle tentative après 1, 2, 4, 8 minutes
+NOTIFICATIONS_RETRY_BASE = 60
+# Réservation d'un lot par un worker (secondes)
+NOTIFICATIONS_LEASE = 300
+NOTIFICATIONS_RETENTION_DAYS = 30
+
+# === Exports CSV / XLSX de l'admin (Home/exports.py) ===
+# Lignes lues par paquets (une requête par paquet) : seul le paquet courant est en mémoire
+EXPORT_CHUNK_SIZE = 2000
+
+# === Filtre anti-robots des formulaires publics (Home/antispam.py) ===
+ANTISPAM_ENABLED = os.getenv('ANTISPAM_ENABLED', 'True') == 'True'
+# Délai minimal (secondes) entre l'affichage et l'envoi du formulaire
+ANTISPAM_MIN_SECONDS = 3
+# Durée de validité du jeton signé (secondes), à usage unique pendant cette durée
+ANTISPAM_TOKEN_MAX_AGE = 7200
+# Un envoi identique à un envoi enregistré depuis moins de ... secondes est un doublon
+ANTISPAM_DUPLICATE_WINDOW = 3600
 
 if DEBUG:
     RATELIMIT_USE_CACHE = 'default'
@@ -278,6 +463,16 @@ JAZZMIN_SETTINGS = {
             "url": "/",
             "icon": "fas fa-globe",
             "new_window": True,
+        }, {
+            "name": "Profils de requêtes",
+            "url": "admin_profiles",
+            "icon": "fas fa-stopwatch",
+            "permissions": ["auth.change_user"],
+        }, {
+            "name": "Requêtes lentes",
+            "url": "admin_slow_queries",
+            "icon": "fas fa-database",
+            "permissions": ["auth.change_user"],
         }]
     },
 
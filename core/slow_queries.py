@@ -0,0 +1,280 @@
+"""
+Capture des requêtes SQL lentes, avec leur origine dans le code
+
+Un wrapper d'exécution (connection.execute_wrapper) est installé sur chaque
+connexion. Toute requête plus longue que SLOW_QUERY_THRESHOLD_MS est
+enregistrée avec :
+- le SQL normalisé (valeurs et listes IN remplacées par ?) ;
+- la durée ;
+- la vue d'origine (SlowQueryMiddleware) ;
+- le template et la balise en cours de rendu, par exemple
+  « Home/team.html:42 {% for service in member.services.all %} » ;
+- la ligne Python du projet qui a déclenché la requête.
+
+Les enregistrements vont dans une liste Redis bornée (LPUSH + LTRIM,
+SLOW_QUERY_BUFFER_SIZE entrées), partagée par les workers. La page d'admin
+« Requêtes lentes » les regroupe par requête et par origine, triés par coût
+total. La pile n'est inspectée que pour les requêtes lentes.
+"""
+
+import collections
+import contextvars
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+
+from core.profiling import superuser_view
+
+logger = logging.getLogger(__name__)
+
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%s|%\(\w+\)s')
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# Code qui n'est pas une origine utile (ORM, ce module...)
+IGNORED_PATHS = (str(Path(__file__).resolve()), '/site-packages/', '/dist-packages/', '/lib/python')
+
+# Requête HTTP en cours (vue d'origine), hérité par les threads de sync_to_async
+_current_request = contextvars.ContextVar('hrae_slow_query_request', default=None)
+
+
+def normalize_sql(sql):
+    """SQL sans valeurs : les requêtes identiques sont regroupées"""
+    sql = _STRINGS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def template_origin(frame):
+    """Template, ligne et balise du nœud le plus profond en cours de rendu"""
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated' and 'self' in frame.f_locals:
+            node = frame.f_locals['self']
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                name = origin.template_name or origin.name
+                if token.token_type.name == 'VAR':
+                    return f'{name}:{token.lineno} {{{{ {token.contents} }}}}'
+                return f'{name}:{token.lineno} {{% {token.contents} %}}'
+        frame = frame.f_back
+    return None
+
+
+def python_origin(frame):
+    """Première ligne du projet (hors Django et dépendances) dans la pile"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and not any(part in filename for part in IGNORED_PATHS):
+            relative = filename[len(PROJECT_DIR) + 1:]
+            return f'{relative}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def view_name():
+    request = _current_request.get()
+    if request is None:
+        # Hors requête HTTP : commande de gestion, thread de fond...
+        return f"command:{sys.argv[1]}" if len(sys.argv) > 1 else None
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    return match.view_name
+
+
+class SlowQueryLog:
+    """Tampon circulaire borné dans Redis (repli en mémoire sans Redis)"""
+
+    KEY = 'slowqueries'
+
+    def __init__(self, cache_alias='default', size=1000):
+        self.cache_alias = cache_alias
+        self.size = size
+        self._local = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def _redis(self):
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection(self.cache_alias)
+        except (ImportError, NotImplementedError):
+            return None
+
+    def _key(self):
+        return caches[self.cache_alias].make_key(self.KEY)
+
+    def add(self, record):
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                self._local.appendleft(record)
+            return
+        pipe = client.pipeline(transaction=False)
+        pipe.lpush(self._key(), json.dumps(record))
+        pipe.ltrim(self._key(), 0, self.size - 1)
+        pipe.execute()
+
+    def records(self):
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                return list(self._local)
+        return [json.loads(raw) for raw in client.lrange(self._key(), 0, -1)]
+
+    def clear(self):
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                self._local.clear()
+            return
+        client.delete(self._key())
+
+    def summary(self):
+        """Regroupement par (SQL, vue, template, ligne Python), trié par coût total"""
+        groups = {}
+        for record in self.records():
+            key = (record['sql'], record['view'], record['template'], record['python'])
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    'sql': record['sql'], 'view': record['view'], 'template': record['template'],
+                    'python': record['python'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'last_seen': record['at'],
+                }
+            group['count'] += 1
+            group['total_ms'] += record['duration_ms']
+            group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+            group['last_seen'] = max(group['last_seen'], record['at'])
+        for group in groups.values():
+            group['avg_ms'] = group['total_ms'] / group['count']
+        return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+
+
+@lru_cache(maxsize=None)
+def get_slow_query_log():
+    return SlowQueryLog(
+        getattr(settings, 'SLOW_QUERY_CACHE', 'default'),
+        getattr(settings, 'SLOW_QUERY_BUFFER_SIZE', 1000),
+    )
+
+
+def capture_slow_queries(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100):
+            record_slow_query(sql, duration_ms, context['connection'].alias)
+
+
+def record_slow_query(sql, duration_ms, alias):
+    frame = sys._getframe(2)
+    record = {
+        'sql': normalize_sql(sql),
+        'duration_ms': round(duration_ms, 2),
+        'db': alias,
+        'view': view_name(),
+        'template': template_origin(frame),
+        'python': python_origin(frame),
+        'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    try:
+        get_slow_query_log().add(record)
+    except Exception:
+        # Jamais d'erreur pour l'utilisateur à cause de l'instrumentation
+        logger.exception("[SLOW QUERY] Recording failed")
+        return
+    logger.warning(
+        "[SLOW QUERY] %.1fms - View: %s - Template: %s - Code: %s",
+        duration_ms, record['view'], record['template'], record['python'],
+        extra={'event': 'slow_query', 'duration_ms': record['duration_ms'], 'view': record['view']},
+    )
+
+
+def install_slow_query_capture(sender=None, connection=None, **kwargs):
+    if capture_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_slow_queries)
+
+
+class SlowQueryMiddleware:
+    """
+    Installe la capture sur les connexions et mémorise la requête en cours
+    (vue d'origine des requêtes lentes)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        connection_created.connect(install_slow_query_capture, dispatch_uid='hrae_slow_queries')
+        for connection in connections.all(initialized_only=True):
+            install_slow_query_capture(connection=connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+
+# ========================================
+# Vue d'administration (core/urls.py)
+# ========================================
+def _slow_query_list(request):
+    log = get_slow_query_log()
+    if request.method == 'POST' and 'clear' in request.POST:
+        log.clear()
+        return redirect('admin_slow_queries')
+
+    groups = log.summary()
+    context = {
+        **admin.site.each_context(request),
+        'title': "Requêtes lentes",
+        'groups': groups,
+        'records_count': sum(group['count'] for group in groups),
+        'buffer_size': log.size,
+        'threshold_ms': getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100),
+    }
+    return TemplateResponse(request, 'admin/slow_queries/slow_query_list.html', context)
+
+
+slow_query_list = superuser_view(_slow_query_list)
@@ -6,11 +6,18 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from django.contrib.sitemaps.views import sitemap
+from core import metrics, profiling, slow_queries
 from Home.sitemaps import (
     StaticViewSitemap, ServiceSitemap, ArticleSitemap,
     CampaignSitemap, StaffSitemap, PageSitemap
 )
 
+
+def ckeditor_upload_file(request, *args, **kwargs):
+    from django_ckeditor_5.views import upload_file
+    return upload_file(request, *args, **kwargs)
+
+
 # Configuration des sitemaps
 sitemaps = {
     'static': StaticViewSitemap,
@@ -28,14 +35,28 @@ urlpatterns = [
     )),
     path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
     path('i18n/', include('django.conf.urls.i18n')),
-    path("ckeditor5/", include('django_ckeditor_5.urls')),
+    # Métriques Prometheus, accès restreint par IP (METRICS_ALLOWED_IPS)
+    path('metrics', metrics.metrics_view, name='metrics'),
+    # Upload d'images CKEditor (admin) : vue importée au premier appel, pour
+    # ne pas charger Pillow au démarrage de chaque worker
+    path("ckeditor5/image_upload/", ckeditor_upload_file, name="ck_editor_5_upload_file"),
 ]
 
 
 urlpatterns += i18n_patterns(
+    # Profils de requêtes (core.profiling), réservés aux superutilisateurs
+    path('admin/profiles/', profiling.profile_list, name='admin_profiles'),
+    path('admin/profiles/<str:name>/', profiling.profile_detail, name='admin_profile_detail'),
+    path('admin/profiles/<str:name>/download/', profiling.profile_download, name='admin_profile_download'),
+    # Requêtes SQL lentes (core.slow_queries), réservées aux superutilisateurs
+    path('admin/slow-queries/', slow_queries.slow_query_list, name='admin_slow_queries'),
     path('admin/', admin.site.urls),
     path('', include('Home.urls')), # Le seul chemin défini en dehors de l'admin
 )
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+# Pages d'erreur pré-rendues (core.error_pages) : ni SQL ni rendu par requête
+handler404 = 'core.error_pages.page_not_found'
+handler500 = 'core.error_pages.server_error'
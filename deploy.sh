@@ -33,9 +33,19 @@ python manage.py tailwind build
 echo "🎨 Collecting static files..."
 python manage.py collectstatic --noinput
 
-# Redémarrer gunicorn et nginx
-echo "🔁 Restarting services..."
-sudo systemctl restart hrae
+# Redémarrer gunicorn, le worker des notifications et nginx
+# HRAE_SERVICE=hrae-asgi : service ASGI (uvicorn), cf. deploy/hrae-asgi.service
+# Worker send_notifications : cf. deploy/hrae-notifications.service
+HRAE_SERVICE=${HRAE_SERVICE:-hrae}
+NOTIFICATIONS_SERVICE=${NOTIFICATIONS_SERVICE:-hrae-notifications}
+echo "🔁 Restarting services ($HRAE_SERVICE, $NOTIFICATIONS_SERVICE)..."
+sudo systemctl restart "$HRAE_SERVICE"
+# Unité non installée : avertissement, le déploiement continue (reload nginx)
+if systemctl cat "$NOTIFICATIONS_SERVICE.service" >/dev/null 2>&1; then
+    sudo systemctl restart "$NOTIFICATIONS_SERVICE"
+else
+    echo "⚠️  $NOTIFICATIONS_SERVICE.service not installed: notifications stay queued (see deploy/hrae-notifications.service)"
+fi
 sudo systemctl reload nginx
 
 echo "✅ Deployment finished successfully!"
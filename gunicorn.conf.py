@@ -0,0 +1,120 @@
+"""
+Configuration gunicorn de HRAE
+
+    gunicorn -c gunicorn.conf.py
+
+Préréglages (variable GUNICORN_PRESET) :
+- gthread : workers à threads (GUNICORN_THREADS par processus), moins de
+            mémoire ; préréglage par défaut (cf. « Délais »)
+- sync    : workers synchrones, 1 requête à la fois par processus
+- asgi    : workers uvicorn sur core.asgi, vues asynchrones (ASYNC_VIEWS_ENABLED)
+
+Le nombre de workers est calculé d'après les CPU et la mémoire disponible
+(GUNICORN_WORKER_MEMORY_MB par worker), sauf si GUNICORN_WORKERS est fourni.
+Voir benchmarks/gunicorn_presets.py pour comparer les préréglages.
+"""
+
+import multiprocessing
+import os
+
+PRESET = os.getenv('GUNICORN_PRESET', 'gthread')
+if PRESET not in ('sync', 'gthread', 'asgi'):
+    raise ValueError(f"GUNICORN_PRESET inconnu : {PRESET!r} (sync, gthread ou asgi)")
+
+
+def _available_memory_mb():
+    """Mémoire disponible (Linux), None si inconnue"""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def _default_workers():
+    cpus = multiprocessing.cpu_count()
+    if PRESET == 'sync':
+        # Processus bloqués sur MySQL/Redis : plus de workers que de CPU
+        workers = 2 * cpus + 1
+    elif PRESET == 'gthread':
+        workers = cpus + 1
+    else:
+        # Une boucle d'événements par CPU
+        workers = cpus
+
+    memory = _available_memory_mb()
+    if memory is not None:
+        per_worker = int(os.getenv('GUNICORN_WORKER_MEMORY_MB', 150))
+        workers = min(workers, memory // per_worker)
+    return max(1, workers)
+
+
+# === Serveur ===
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 0)) or _default_workers()
+backlog = 2048
+
+if PRESET == 'asgi':
+    wsgi_app = 'core.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Pages publiques servies par Home/async_views.py
+    os.environ.setdefault('ASYNC_VIEWS_ENABLED', 'True')
+else:
+    wsgi_app = 'core.wsgi:application'
+    worker_class = PRESET
+    if PRESET == 'gthread':
+        threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# === Délais ===
+# Worker sync : tué si une requête l'occupe au-delà de ce délai (ex. : export
+# XLSX de l'admin, Home/exports.py). Un worker gthread ou asgi signale
+# sa présence depuis sa boucle principale, quelle que soit la durée des
+# requêtes en cours : c'est pourquoi gthread est le préréglage par défaut
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+# Derrière Nginx : connexions keep-alive courtes
+keepalive = 5
+
+# === Recyclage des workers ===
+# Le jitter évite que tous les workers redémarrent en même temps
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+# === Préchargement ===
+# Django et l'application sont importés une seule fois par le master puis
+# partagés (copy-on-write) : démarrage des workers plus rapide, moins de mémoire
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# === Logs ===
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+proc_name = f'hrae-{PRESET}'
+
+
+def post_fork(server, worker):
+    """
+    Les connexions ouvertes par le master pendant le préchargement ne
+    doivent pas être partagées entre workers : on les ferme, chaque worker
+    ouvre les siennes au premier usage.
+    """
+    from django.db import connections
+    connections.close_all()
+
+    # Pools Redis de django-redis (globaux au processus)
+    try:
+        from django_redis.pool import ConnectionFactory
+    except ImportError:
+        return
+    for pool in ConnectionFactory._pools.values():
+        pool.reset()
+
+
+def when_ready(server):
+    server.log.info(
+        f"HRAE gunicorn prêt - preset: {PRESET} - workers: {workers} - "
+        f"preload: {preload_app} - max_requests: {max_requests}±{max_requests_jitter}"
+    )